@@ -3,7 +3,7 @@ eventlet.monkey_patch()  # Esta línea debe ser la primera antes de cualquier ot
 
 # Ahora se importan otros módulos
 import os
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify
 from flask_migrate import Migrate
 from dotenv import load_dotenv
 import logging
@@ -15,25 +15,26 @@ from modules.youtube_man import procesar_audio
 from modules.aws_services import subir_audio_s3, iniciar_transcripcion
 from modules.transcriber import obtener_transcripcion, limpiar_texto
 from modules.bedrock_generator import generar_sugerencias_claude_optimizado
-from modules.utils import limpiar_youtube_url
+from modules.processing import regenerar_sugerencias, sugerencias_guardadas
+from modules.result_cache import cache_sugerencias
+from modules.utils import limpiar_youtube_url, extraer_video_id
 from modules.models import db, Video
+from modules.search import buscar_videos
+from modules.pagination import listar_videos, paginar_busqueda
+from modules.metrics import registro as registro_metricas
+from modules.logging_config import configurar_logging
+from modules.message_queue import ROL_PROCESO, URL_COLA_MENSAJES, opciones_socketio
 
-# Importar el módulo de procesamiento sin circularidad
-from modules.processing import procesar_video_with_context
+# Importar la cola de procesamiento sin circularidad
+from modules.job_queue import ColaTrabajos, estado_lote, estado_trabajo
+from modules.batch import enviar_lote
 
 
 # Cargar las variables de entorno desde .env
 load_dotenv()
 
-# Configuración de Logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("app.log"),
-        logging.StreamHandler()
-    ]
-)
+# Configuración de Logging (LOG_LEVEL, LOG_FORMAT y LOG_FILE)
+configurar_logging()
 logger = logging.getLogger(__name__)
 
 # Configuración de la aplicación Flask
@@ -46,13 +47,18 @@ app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db.init_app(app)
 migrate = Migrate(app, db)
 
-# Inicializar Flask-SocketIO
-socketio = SocketIO(app, async_mode='eventlet')
+# Inicializar Flask-SocketIO; con SOCKETIO_MESSAGE_QUEUE los eventos viajan por la cola de
+# mensajes, así que los procesos web y los workers pueden estar en máquinas distintas
+socketio = SocketIO(app, async_mode='eventlet', **opciones_socketio())
 
 # Crear las tablas de la base de datos si no existen
 with app.app_context():
     db.create_all()
 
+# Cola persistente de trabajos; los workers se lanzan al arrancar el servidor (o en worker.py).
+# Con varios procesos, los trabajos en vuelo se consultan siempre en la base de datos
+cola_trabajos = ColaTrabajos(app, socketio, registro_local=not URL_COLA_MENSAJES)
+
 # Rutas
 @app.route('/')
 def index():
@@ -76,46 +82,122 @@ def procesar_video_endpoint():
         return jsonify({'error': 'La URL proporcionada no es válida.'}), 400
 
     try:
-        existing_video = Video.query.get(url_limpia)
+        video_id = extraer_video_id(url_limpia)
+        # Los videos consultados a menudo se responden desde la caché, sin ir a la base de datos
+        sugerencias = cache_sugerencias.obtener(video_id, lambda: sugerencias_guardadas(video_id))
         session_id = str(uuid4())
         logger.debug(f"Generando nuevo session_id: {session_id}")
 
-        if existing_video:
+        if sugerencias:
             logger.info(f"El video con URL {url_limpia} ya existe en la base de datos.")
-            sugerencias = {
-                'Título Opción 1': existing_video.title1,
-                'Título Opción 2': existing_video.title2,
-                'Título Opción 3': existing_video.title3,
-                'Resumen': existing_video.summary
-            }
             return jsonify({
                 'message': 'Video ya procesado. Mostrando resultados.',
                 'sugerencias': sugerencias,
                 'session_id': session_id
             }), 200
         else:
-            socketio.start_background_task(procesar_video_with_context, app, url_limpia, session_id, socketio)
+            prioridad = data.get('prioridad', 0)
+            if not isinstance(prioridad, int):
+                return jsonify({'error': 'La prioridad debe ser un número entero.'}), 400
+            sala, es_nuevo = cola_trabajos.encolar(url_limpia, session_id, prioridad)
+            if not es_nuevo:
+                logger.info(f"El video {url_limpia} ya se está procesando; sesión {session_id} adjuntada a {sala}.")
+                # Se responde la sala del trabajo para que el cliente pueda unirse desde cualquier nodo web
+                return jsonify({'message': 'El video ya se está procesando. Uniéndose al proceso en curso.', 'session_id': sala}), 200
             return jsonify({'message': 'Procesamiento iniciado.', 'session_id': session_id}), 200
     except Exception as e:
         logger.error(f"Error en procesar_video_endpoint: {e}", exc_info=True)
         return jsonify({'error': str(e)}), 500
 
+@app.route('/procesar_lote', methods=['POST'])
+def procesar_lote_endpoint():
+    data = request.get_json() or {}
+    entradas = data.get('urls') or []
+    if data.get('url'):
+        entradas = [data['url']] + list(entradas)
+    if not isinstance(entradas, list) or not entradas:
+        logger.warning("No se proporcionaron URLs para el lote.")
+        return jsonify({'error': 'Proporciona una lista de URLs o la URL de una playlist o canal.'}), 400
+
+    prioridad = data.get('prioridad', 0)
+    if not isinstance(prioridad, int):
+        return jsonify({'error': 'La prioridad debe ser un número entero.'}), 400
+
+    try:
+        resumen = enviar_lote(cola_trabajos, entradas, prioridad)
+        return jsonify({'message': 'Lote en procesamiento.', **resumen, 'session_id': resumen['batch_id']}), 200
+    except Exception as e:
+        logger.error(f"Error en procesar_lote_endpoint: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/lotes/<batch_id>')
+def estado_lote_endpoint(batch_id):
+    estado = estado_lote(batch_id)
+    if not estado['total']:
+        return jsonify({'error': 'Lote no encontrado.'}), 404
+    return jsonify(estado), 200
+
+@app.route('/lotes/<batch_id>/reintentar', methods=['POST'])
+def reintentar_lote_endpoint(batch_id):
+    if not estado_lote(batch_id)['total']:
+        return jsonify({'error': 'Lote no encontrado.'}), 404
+    reintentados = cola_trabajos.reintentar_lote(batch_id)
+    return jsonify({'message': 'Trabajos fallidos reintentados.', 'reintentados': reintentados,
+                    'session_id': batch_id}), 200
+
+@app.route('/trabajos/<int:job_id>')
+def estado_trabajo_endpoint(job_id):
+    estado = estado_trabajo(job_id)
+    if estado is None:
+        return jsonify({'error': 'Trabajo no encontrado.'}), 404
+    return jsonify(estado), 200
+
+@app.route('/trabajos/<int:job_id>/reintentar', methods=['POST'])
+def reintentar_trabajo_endpoint(job_id):
+    try:
+        resultado = cola_trabajos.reintentar(job_id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 409
+    if resultado is None:
+        return jsonify({'error': 'Trabajo no encontrado.'}), 404
+    sala, es_nuevo = resultado
+    mensaje = 'Trabajo reanudado desde la última etapa completada.' if es_nuevo else \
+        'El video ya se está procesando. Uniéndose al proceso en curso.'
+    return jsonify({'message': mensaje, 'session_id': sala}), 200
+
+@app.route('/videos/<video_id>/regenerar', methods=['POST'])
+def regenerar_endpoint(video_id):
+    try:
+        sugerencias = regenerar_sugerencias(video_id)
+    except Exception as e:
+        logger.error(f"Error al regenerar las sugerencias de {video_id}: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+    if sugerencias is None:
+        return jsonify({'error': 'Video no encontrado.'}), 404
+    return jsonify({'message': 'Sugerencias regeneradas.', 'sugerencias': sugerencias.a_dict()}), 200
+
 @app.route('/database')
 def database():
-    page = request.args.get('page', 1, type=int)
     per_page = 10
     search_query = request.args.get('search', '', type=str)
 
-    if search_query:
-        filter_condition = (Video.title1.ilike(f'%{search_query}%')) | \
-                           (Video.title2.ilike(f'%{search_query}%')) | \
-                           (Video.title3.ilike(f'%{search_query}%')) | \
-                           (Video.url_video.ilike(f'%{search_query}%'))
-        videos_paginados = Video.query.filter(filter_condition).order_by(Video.url_video.desc()).paginate(page=page, per_page=per_page, error_out=False)
-    else:
-        videos_paginados = Video.query.order_by(Video.url_video.desc()).paginate(page=page, per_page=per_page, error_out=False)
+    try:
+        if search_query.strip():
+            consulta, relevancia = buscar_videos(search_query)
+            videos = paginar_busqueda(consulta, relevancia, search_query,
+                                      request.args.get('despues'), request.args.get('antes'), per_page)
+        else:
+            videos = listar_videos(request.args.get('despues'), request.args.get('antes'), per_page)
+    except ValueError as e:
+        logger.warning(f"Parámetros de paginación inválidos: {e}")
+        videos = listar_videos(por_pagina=per_page)
+
+    return render_template('database.html', videos=videos, search_query=search_query)
 
-    return render_template('database.html', videos=videos_paginados, search_query=search_query)
+@app.route('/metrics')
+def metrics():
+    # Formato de texto de Prometheus: duración por etapa, bytes, tokens, colas y greenlets
+    return Response(registro_metricas.exponer(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 @socketio.on('connect')
 def handle_connect():
@@ -131,8 +213,15 @@ def handle_join(data):
     if session_id:
         join_room(session_id)
         logger.info(f'Cliente unido a la sala {session_id}')
+        # Sesiones adjuntadas a un trabajo en curso reciben los eventos de su sala
+        sala = cola_trabajos.en_vuelo.sala_de(session_id)
+        if sala != session_id:
+            join_room(sala)
+            logger.info(f'Cliente {session_id} unido a la sala del trabajo en curso {sala}')
     else:
         logger.warning('No se proporcionó un session_id para unirse a la sala.')
 
 if __name__ == '__main__':
+    if ROL_PROCESO == 'completo':
+        cola_trabajos.iniciar()
     socketio.run(app, host='0.0.0.0', port=5000, debug=False)
@@ -0,0 +1,77 @@
+# backfill.py
+"""
+Este script encola un lote de videos para su procesamiento desde la línea de comandos,
+pensado para las cargas nocturnas del catálogo.
+Acepta URLs de videos, playlists o canales (como argumentos o en un archivo, una por línea),
+las expande sin descargar contenido, descarta las que ya están en la tabla `videos` y registra
+el resto como un único lote en la cola de trabajos.
+Por defecto solo encola: los workers del servidor toman los trabajos. Con `--procesar` el
+script lanza sus propios workers y espera a que el lote termine, mostrando el progreso.
+Dependencias:
+- eventlet
+- Flask
+- Flask-SocketIO
+Uso:
+    python backfill.py https://www.youtube.com/@canal/videos
+    python backfill.py --archivo urls.txt --prioridad -1 --procesar
+"""
+
+import eventlet
+eventlet.monkey_patch()
+
+import sys
+import argparse
+
+try:
+    from app import app, socketio, cola_trabajos
+    from modules.batch import enviar_lote
+    from modules.job_queue import estado_lote
+except ImportError as e:
+    print(f"Error importing app or socketio: {e}")
+    raise
+
+def leer_entradas(args):
+    entradas = list(args.urls)
+    if args.archivo:
+        with open(args.archivo, encoding='utf-8') as archivo:
+            entradas.extend(linea.strip() for linea in archivo if linea.strip() and not linea.startswith('#'))
+    return entradas
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Encola un lote de videos de YouTube para su procesamiento.')
+    parser.add_argument('urls', nargs='*', help='URLs de videos, playlists o canales.')
+    parser.add_argument('--archivo', help='Archivo con una URL por línea.')
+    parser.add_argument('--prioridad', type=int, default=-1,
+                        help='Prioridad del lote (por defecto -1, detrás de las solicitudes interactivas).')
+    parser.add_argument('--procesar', action='store_true',
+                        help='Procesa el lote en este proceso y espera a que termine.')
+    parser.add_argument('--intervalo', type=float, default=10.0,
+                        help='Segundos entre reportes de progreso con --procesar.')
+    args = parser.parse_args(argv)
+
+    entradas = leer_entradas(args)
+    if not entradas:
+        parser.error('Proporciona al menos una URL o un archivo con URLs.')
+
+    with app.app_context():
+        resumen = enviar_lote(cola_trabajos, entradas, args.prioridad)
+    print(f"Lote {resumen['batch_id']}: {resumen['total']} videos, {resumen['encolados']} encolados, "
+          f"{resumen['ya_procesados']} ya procesados, {resumen['en_curso']} en curso.")
+    for entrada in resumen['invalidas']:
+        print(f"No se pudo leer: {entrada}")
+
+    if not args.procesar or not resumen['encolados']:
+        return 0
+
+    cola_trabajos.iniciar()
+    while True:
+        socketio.sleep(args.intervalo)
+        with app.app_context():
+            estado = estado_lote(resumen['batch_id'])
+        print(f"Progreso {estado['porcentaje']}%: {estado['completados']} completados, "
+              f"{estado['fallidos']} fallidos, {estado['pendientes'] + estado['en_proceso']} restantes.")
+        if not estado['pendientes'] and not estado['en_proceso']:
+            return 1 if estado['fallidos'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
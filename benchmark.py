@@ -0,0 +1,663 @@
+# benchmark.py
+"""
+Este script mide el rendimiento del procesamiento de videos de punta a punta sin llamar a
+ningún servicio real, para detectar regresiones antes de desplegar.
+Sustituye los servicios externos por dobles locales:
+- yt-dlp: un `YoutubeDL` falso que escribe un audio fijo (o el archivo de `--audio`).
+- S3: respuestas en memoria con ancho de banda configurable.
+- Transcribe: trabajos que terminan tras `--transcribe-latencia` segundos; el JSON de
+  salida (con sus `items` por palabra, como el real) se sirve por HTTP local o, con
+  `--salida-s3`, desde el S3 en memoria como si se usara un bucket de salida propio.
+- Bedrock: respuestas con latencia inicial y velocidad de tokens configurables.
+Los dobles de AWS se instalan en los clientes compartidos de `modules.aws_clients` mediante
+eventos de botocore, así que la validación de parámetros y el límite de tasa siguen activos.
+Después lanza N sesiones concurrentes que llaman a `/procesar_video`, se unen a su sala de
+Socket.IO y esperan el evento 'resultado'. Al terminar informa el p50/p95 de cada etapa y de
+la sesión completa, el rendimiento (videos por minuto) y la memoria máxima del proceso.
+Con `--salida` guarda el informe en JSON y con `--comparar` lo contrasta con un informe
+anterior, terminando con código 1 si algún p95 o el rendimiento empeoran más que `--tolerancia`.
+Dependencias:
+- eventlet
+- Flask
+- Flask-SocketIO
+- boto3
+Uso:
+    python benchmark.py --sesiones 20
+    python benchmark.py --sesiones 50 --transcribe-latencia 5 --tokens-por-segundo 40 --salida base.json
+    python benchmark.py --sesiones 50 --comparar base.json --tolerancia 0.15
+"""
+
+import eventlet
+eventlet.monkey_patch()
+
+import os
+import io
+import sys
+import json
+import time
+import random
+import shutil
+import string
+import argparse
+import resource
+import tempfile
+import threading
+import tracemalloc
+from datetime import datetime, timezone
+
+# La aplicación se configura con una base de datos temporal antes de importarla
+_DIRECTORIO_TEMPORAL = tempfile.mkdtemp(prefix='benchmark-')
+os.environ['DATABASE_URI'] = f"sqlite:///{os.path.join(_DIRECTORIO_TEMPORAL, 'benchmark.db')}"
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+os.environ['LOG_FILE'] = ''
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'benchmark')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'benchmark')
+os.environ.pop('TRANSCRIBE_OUTPUT_BUCKET', None)
+os.environ.pop('CACHE_SUGERENCIAS_SQLITE', None)
+# El cliente de prueba de Flask-SocketIO no admite cola de mensajes: web y workers en un proceso
+os.environ.pop('SOCKETIO_MESSAGE_QUEUE', None)
+os.environ['ROL_PROCESO'] = 'completo'
+# El yt-dlp falso solo existe en este proceso: la extracción no pasa por los procesos hijos
+os.environ['PROCESOS_MEDIA'] = '0'
+
+import eventlet.wsgi
+from botocore.awsrequest import AWSResponse
+from botocore.response import StreamingBody
+
+try:
+    from app import app, socketio, cola_trabajos
+    from modules import youtube_man
+    from modules.audio_cache import cache_audio
+    from modules.aws_clients import obtener_cliente
+    from modules.metrics import duracion_etapa, tokens_bedrock, bytes_audio
+    from modules.transcribe_poller import sondeo_transcripciones
+except ImportError as e:
+    print(f"Error importing app or socketio: {e}")
+    raise
+
+PALABRAS = ('video', 'canal', 'contenido', 'historia', 'ejemplo', 'idea', 'proyecto', 'tiempo', 'persona',
+            'mundo', 'forma', 'parte', 'ciudad', 'trabajo', 'problema', 'pregunta', 'respuesta', 'camino',
+            'momento', 'cambio', 'resultado', 'equipo', 'sistema', 'proceso', 'experiencia', 'semana')
+
+
+class ErrorServicio(Exception):
+    """
+    Error que el doble responde como un error de AWS (se convierte en `ClientError`).
+    """
+
+    def __init__(self, codigo, estado=400, mensaje=''):
+        super().__init__(mensaje or codigo)
+        self.codigo = codigo
+        self.estado = estado
+        self.mensaje = mensaje or codigo
+
+
+class ServicioFalso:
+    """
+    Base de los dobles de AWS: responde cada operación del cliente con el método del mismo
+    nombre (p. ej. `HeadObject`) en lugar de enviar la petición HTTP.
+    """
+
+    def instalar(self, cliente):
+        """
+        Parámetros:
+        - cliente (botocore.client.BaseClient): Cliente compartido cuyas llamadas se responden localmente.
+        """
+        servicio = cliente.meta.service_model.service_id.hyphenize()
+        cliente.meta.events.register(f'before-parameter-build.{servicio}', self._guardar_parametros)
+        cliente.meta.events.register(f'before-call.{servicio}', self._responder)
+
+    def _guardar_parametros(self, params, context, **kwargs):
+        context['parametros_benchmark'] = dict(params)
+
+    def _responder(self, model, context, **kwargs):
+        try:
+            respuesta = getattr(self, model.name)(context['parametros_benchmark'])
+            return AWSResponse(None, 200, {}, None), dict(respuesta, ResponseMetadata={'HTTPStatusCode': 200})
+        except ErrorServicio as e:
+            return AWSResponse(None, e.estado, {}, None), {
+                'Error': {'Code': e.codigo, 'Message': e.mensaje},
+                'ResponseMetadata': {'HTTPStatusCode': e.estado},
+            }
+
+
+class S3Falso(ServicioFalso):
+    """
+    Objetos en memoria; cada transferencia tarda según `mbps`.
+    """
+
+    def __init__(self, mbps=200.0):
+        self.mbps = mbps
+        self.objetos = {}
+        # (bucket, clave) -> función que retorna el contenido, o None si todavía no existe
+        self.generados = {}
+        self._lock = threading.Lock()
+
+    def _generado(self, clave):
+        generar = self.generados.get(clave)
+        return generar() if generar else None
+
+    def _transferir(self, cuerpo):
+        datos = cuerpo if isinstance(cuerpo, (bytes, bytearray)) else cuerpo.read()
+        if self.mbps:
+            eventlet.sleep(len(datos) * 8 / (self.mbps * 1_000_000))
+        return len(datos)
+
+    def HeadObject(self, parametros):
+        clave = (parametros['Bucket'], parametros['Key'])
+        contenido = self._generado(clave)
+        if contenido is not None:
+            return {'ContentLength': len(contenido)}
+        if clave not in self.objetos:
+            raise ErrorServicio('404', 404, 'Not Found')
+        return {'ContentLength': self.objetos[clave]}
+
+    def GetObject(self, parametros):
+        contenido = self._generado((parametros['Bucket'], parametros['Key']))
+        if contenido is None:
+            raise ErrorServicio('NoSuchKey', 404, 'The specified key does not exist.')
+        return {'Body': StreamingBody(io.BytesIO(contenido), len(contenido)), 'ContentLength': len(contenido)}
+
+    def PutObject(self, parametros):
+        self.objetos[(parametros['Bucket'], parametros['Key'])] = self._transferir(parametros.get('Body', b''))
+        return {'ETag': '"benchmark"'}
+
+    def CreateMultipartUpload(self, parametros):
+        with self._lock:
+            self.objetos.setdefault(('multipart', parametros['Key']), 0)
+        return {'Bucket': parametros['Bucket'], 'Key': parametros['Key'], 'UploadId': parametros['Key']}
+
+    def UploadPart(self, parametros):
+        tamano = self._transferir(parametros['Body'])
+        with self._lock:
+            self.objetos[('multipart', parametros['UploadId'])] += tamano
+        return {'ETag': f'"parte-{parametros["PartNumber"]}"'}
+
+    def CompleteMultipartUpload(self, parametros):
+        with self._lock:
+            tamano = self.objetos.pop(('multipart', parametros['UploadId']), 0)
+            self.objetos[(parametros['Bucket'], parametros['Key'])] = tamano
+        return {'Bucket': parametros['Bucket'], 'Key': parametros['Key'], 'ETag': '"benchmark"'}
+
+    def AbortMultipartUpload(self, parametros):
+        with self._lock:
+            self.objetos.pop(('multipart', parametros['UploadId']), None)
+        return {}
+
+
+class TranscribeFalso(ServicioFalso):
+    """
+    Trabajos de transcripción que se completan `latencia` segundos después de iniciarse.
+    """
+
+    def __init__(self, servidor, latencia=2.0, palabras=1500, s3=None):
+        """
+        Con `s3` (un `S3Falso`), los trabajos con OutputBucketName escriben su salida ahí,
+        como con un bucket de salida propio, y su URI no está firmada.
+        """
+        self.servidor = servidor
+        self.latencia = latencia
+        self.palabras = palabras
+        self.s3 = s3
+        self.trabajos = {}
+
+    def _estado(self, nombre):
+        trabajo = self.trabajos[nombre]
+        completado = time.monotonic() - trabajo['inicio'] >= self.latencia
+        return 'COMPLETED' if completado else 'IN_PROGRESS'
+
+    def _descripcion(self, nombre):
+        trabajo = self.trabajos[nombre]
+        descripcion = {
+            'TranscriptionJobName': nombre,
+            'TranscriptionJobStatus': self._estado(nombre),
+            'CreationTime': trabajo['creado'],
+            'Media': {'MediaFileUri': trabajo['uri']},
+        }
+        if descripcion['TranscriptionJobStatus'] == 'COMPLETED':
+            descripcion['LanguageCode'] = 'es-ES'
+            salida = trabajo.get('salida')
+            uri = f"https://s3.us-east-1.amazonaws.com/{salida[0]}/{salida[1]}" if salida else \
+                self.servidor.url(f'/transcripciones/{nombre}.json')
+            descripcion['Transcript'] = {'TranscriptFileUri': uri}
+        return descripcion
+
+    def StartTranscriptionJob(self, parametros):
+        nombre = parametros['TranscriptionJobName']
+        if nombre in self.trabajos:
+            raise ErrorServicio('ConflictException', 400, 'The requested job name already exists.')
+        self.trabajos[nombre] = {'inicio': time.monotonic(), 'creado': datetime.now(timezone.utc),
+                                 'uri': parametros['Media']['MediaFileUri']}
+        self.servidor.transcripciones[nombre] = lambda: salida_transcribe(nombre, self.palabras)
+        if self.s3 is not None and parametros.get('OutputBucketName'):
+            salida = (parametros['OutputBucketName'], parametros['OutputKey'])
+            self.trabajos[nombre]['salida'] = salida
+
+            def generar():
+                if nombre not in self.trabajos or self._estado(nombre) != 'COMPLETED':
+                    return None
+                return json.dumps(salida_transcribe(nombre, self.palabras)).encode('utf-8')
+            self.s3.generados[salida] = generar
+        return {'TranscriptionJob': self._descripcion(nombre)}
+
+    def GetTranscriptionJob(self, parametros):
+        nombre = parametros['TranscriptionJobName']
+        if nombre not in self.trabajos:
+            raise ErrorServicio('BadRequestException', 400, "The requested job couldn't be found.")
+        return {'TranscriptionJob': self._descripcion(nombre)}
+
+    def ListTranscriptionJobs(self, parametros):
+        resumenes = [
+            {'TranscriptionJobName': nombre, 'CreationTime': trabajo['creado'],
+             'TranscriptionJobStatus': self._estado(nombre)}
+            for nombre, trabajo in self.trabajos.items()
+            if parametros.get('JobNameContains', '') in nombre
+        ]
+        resumenes = [r for r in resumenes if r['TranscriptionJobStatus'] == parametros.get('Status', r['TranscriptionJobStatus'])]
+        resumenes.sort(key=lambda r: r['CreationTime'], reverse=True)
+        return {'TranscriptionJobSummaries': resumenes[:parametros.get('MaxResults', 100)]}
+
+    def DeleteTranscriptionJob(self, parametros):
+        self.trabajos.pop(parametros['TranscriptionJobName'], None)
+        return {}
+
+
+class BedrockFalso(ServicioFalso):
+    """
+    Modelo que responde sugerencias válidas (o un resumen, en la condensación) con una latencia
+    inicial fija y `tokens_por_segundo` de salida.
+    """
+
+    def __init__(self, latencia=0.5, tokens_por_segundo=60.0):
+        self.latencia = latencia
+        self.tokens_por_segundo = tokens_por_segundo
+
+    def _respuesta(self, parametros):
+        sistema = ' '.join(bloque.get('text', '') for bloque in parametros.get('system', []))
+        mensaje = parametros['messages'][0]['content'][0]['text']
+        if '"Título Opción 1"' not in sistema:
+            return mensaje[:800], mensaje
+        aleatorio = random.Random(mensaje)
+        titulo = lambda: ' '.join(aleatorio.choice(PALABRAS) for _ in range(6)).capitalize()
+        texto = json.dumps({
+            'Título Opción 1': titulo(),
+            'Título Opción 2': titulo(),
+            'Título Opción 3': titulo(),
+            'Resumen': ' '.join(aleatorio.choice(PALABRAS) for _ in range(120)),
+        }, ensure_ascii=False)
+        return texto, mensaje
+
+    def _uso(self, texto, mensaje):
+        return {'inputTokens': len(mensaje) // 4, 'outputTokens': len(texto) // 4,
+                'totalTokens': (len(mensaje) + len(texto)) // 4}
+
+    def Converse(self, parametros):
+        texto, mensaje = self._respuesta(parametros)
+        eventlet.sleep(self.latencia + (len(texto) // 4) / self.tokens_por_segundo)
+        return {
+            'output': {'message': {'role': 'assistant', 'content': [{'text': texto}]}},
+            'stopReason': 'end_turn',
+            'usage': self._uso(texto, mensaje),
+            'metrics': {'latencyMs': 0},
+        }
+
+    def ConverseStream(self, parametros):
+        texto, mensaje = self._respuesta(parametros)
+
+        def eventos():
+            eventlet.sleep(self.latencia)
+            yield {'messageStart': {'role': 'assistant'}}
+            for inicio in range(0, len(texto), 40):
+                eventlet.sleep(10 / self.tokens_por_segundo)
+                yield {'contentBlockDelta': {'delta': {'text': texto[inicio:inicio + 40]}, 'contentBlockIndex': 0}}
+            yield {'messageStop': {'stopReason': 'end_turn'}}
+            yield {'metadata': {'usage': self._uso(texto, mensaje), 'metrics': {'latencyMs': 0}}}
+
+        return {'stream': eventos()}
+
+
+def salida_transcribe(nombre, palabras):
+    """
+    Retorna:
+    - dict: JSON de salida de Transcribe con el texto y un elemento por palabra, como el real.
+    """
+    aleatorio = random.Random(nombre)
+    contenido = [aleatorio.choice(PALABRAS) for _ in range(palabras)]
+    items = [{
+        'start_time': f'{i * 0.4:.2f}',
+        'end_time': f'{i * 0.4 + 0.35:.2f}',
+        'alternatives': [{'confidence': '0.98', 'content': palabra}],
+        'type': 'pronunciation',
+    } for i, palabra in enumerate(contenido)]
+    return {
+        'jobName': nombre,
+        'accountId': '000000000000',
+        'status': 'COMPLETED',
+        'results': {'transcripts': [{'transcript': f"{nombre} " + ' '.join(contenido)}], 'items': items},
+    }
+
+
+class ServidorLocal:
+    """
+    Servidor HTTP local (greenlet de eventlet) para los archivos de salida de Transcribe y
+    los streams de audio, con soporte de peticiones por rangos.
+    """
+
+    def __init__(self, audio):
+        self.audio = audio
+        self.transcripciones = {}
+        self._socket = eventlet.listen(('127.0.0.1', 0))
+        eventlet.spawn(eventlet.wsgi.server, self._socket, self._aplicacion, log_output=False)
+
+    def url(self, ruta):
+        return f"http://127.0.0.1:{self._socket.getsockname()[1]}{ruta}"
+
+    def _aplicacion(self, environ, start_response):
+        ruta = environ['PATH_INFO']
+        if ruta.startswith('/transcripciones/'):
+            generar = self.transcripciones.get(ruta.rsplit('/', 1)[-1][:-len('.json')])
+            if generar is None:
+                start_response('404 Not Found', [('Content-Type', 'text/plain')])
+                return [b'']
+            cuerpo = json.dumps(generar()).encode('utf-8')
+            start_response('200 OK', [('Content-Type', 'application/json'), ('Content-Length', str(len(cuerpo)))])
+            return [cuerpo]
+        if ruta.startswith('/audio/'):
+            total = len(self.audio)
+            rango = environ.get('HTTP_RANGE', '')
+            if rango.startswith('bytes='):
+                inicio, _, fin = rango[len('bytes='):].partition('-')
+                inicio, fin = int(inicio), min(int(fin or total - 1), total - 1)
+                if inicio >= total:
+                    start_response('416 Range Not Satisfiable', [('Content-Range', f'bytes */{total}')])
+                    return [b'']
+                start_response('206 Partial Content', [('Content-Range', f'bytes {inicio}-{fin}/{total}'),
+                                                       ('Content-Length', str(fin - inicio + 1))])
+                return [self.audio[inicio:fin + 1]]
+            start_response('200 OK', [('Content-Length', str(total))])
+            return [self.audio]
+        start_response('404 Not Found', [('Content-Type', 'text/plain')])
+        return [b'']
+
+
+def crear_youtube_falso(servidor, duracion, segundos_descarga):
+    """
+    Crea un sustituto de `yt_dlp.YoutubeDL` que extrae metadatos fijos y "descarga" el audio
+    del servidor local escribiéndolo en la plantilla de salida.
+    """
+
+    class YoutubeDLFalso:
+        def __init__(self, opciones=None):
+            self.opciones = opciones or {}
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *args):
+            return False
+
+        def prepare_filename(self, info):
+            return self.opciones['outtmpl'] % {'ext': info['ext']}
+
+        @staticmethod
+        def sanitize_info(info):
+            return info
+
+        def extract_info(self, url, download=True):
+            video_id = url.rsplit('v=', 1)[-1][:11]
+            info = {
+                'id': video_id,
+                'title': f'Video de prueba {video_id}',
+                'duration': duracion,
+                'ext': 'm4a',
+                'url': servidor.url(f'/audio/{video_id}'),
+                'http_headers': {},
+                'filesize': len(servidor.audio),
+            }
+            if download and not self.opciones.get('skip_download'):
+                eventlet.sleep(segundos_descarga)
+                ruta = self.prepare_filename(info)
+                with open(ruta, 'wb') as archivo:
+                    archivo.write(servidor.audio)
+                info['requested_downloads'] = [{'filepath': ruta}]
+            return info
+
+    return YoutubeDLFalso
+
+
+def instalar_dobles(args, directorio_audio):
+    """
+    Sustituye yt-dlp, S3, Transcribe y Bedrock por los dobles locales.
+
+    Retorna:
+    - ServidorLocal: Servidor HTTP de los dobles.
+    """
+    if args.audio:
+        with open(args.audio, 'rb') as archivo:
+            audio = archivo.read()
+    else:
+        audio = os.urandom(int(args.tamano_audio * 1024 * 1024))
+    servidor = ServidorLocal(audio)
+
+    youtube_man.yt_dlp.YoutubeDL = crear_youtube_falso(servidor, args.duracion, args.descarga_segundos)
+    youtube_man.AUDIO_DIR = directorio_audio
+    cache_audio.directorio = directorio_audio
+
+    s3 = S3Falso(args.s3_mbps)
+    s3.instalar(obtener_cliente('s3'))
+    if args.salida_s3:
+        # La salida de Transcribe se lee con GetObject, como con un bucket propio
+        os.environ['TRANSCRIBE_OUTPUT_BUCKET'] = 'benchmark-transcripciones'
+    TranscribeFalso(servidor, args.transcribe_latencia, args.palabras,
+                    s3=s3 if args.salida_s3 else None).instalar(obtener_cliente('transcribe'))
+    BedrockFalso(args.bedrock_latencia, args.tokens_por_segundo).instalar(obtener_cliente('bedrock-runtime'))
+
+    # El sondeo revisa con la frecuencia del benchmark en lugar de la de producción (10-60 s)
+    sondeo_transcripciones.factor_duracion = 0
+    sondeo_transcripciones.intervalo_minimo = args.intervalo_sondeo
+    sondeo_transcripciones.intervalo_maximo = args.intervalo_sondeo
+    return servidor
+
+
+def registrar_muestras():
+    """
+    Guarda también cada observación de duración por etapa para calcular percentiles exactos.
+
+    Retorna:
+    - dict: etapa -> lista de segundos (se llena durante el benchmark).
+    """
+    muestras = {}
+    observar = duracion_etapa.observar
+
+    def observar_y_guardar(valor, **etiquetas):
+        muestras.setdefault(etiquetas.get('etapa', ''), []).append(valor)
+        observar(valor, **etiquetas)
+
+    duracion_etapa.observar = observar_y_guardar
+    return muestras
+
+
+def percentil(valores, p):
+    """
+    Percentil por rango más cercano.
+    """
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    indice = max(0, min(len(ordenados) - 1, int(round(p / 100 * len(ordenados) + 0.5)) - 1))
+    return ordenados[indice]
+
+
+def ejecutar_sesion(url_video, timeout):
+    """
+    Envía un video a `/procesar_video`, se une a su sala y espera el resultado.
+
+    Retorna:
+    - dict: 'ok', 'segundos' y 'error' de la sesión.
+    """
+    inicio = time.monotonic()
+    cliente_socket = socketio.test_client(app)
+    try:
+        respuesta = app.test_client().post('/procesar_video', json={'url_video': url_video})
+        if respuesta.status_code != 200:
+            return {'ok': False, 'segundos': time.monotonic() - inicio, 'error': respuesta.get_json().get('error')}
+        cliente_socket.emit('join', {'session_id': respuesta.get_json()['session_id']})
+        while time.monotonic() - inicio < timeout:
+            for evento in cliente_socket.get_received():
+                if evento['name'] == 'resultado':
+                    return {'ok': True, 'segundos': time.monotonic() - inicio, 'error': None}
+                if evento['name'] == 'error':
+                    return {'ok': False, 'segundos': time.monotonic() - inicio,
+                            'error': evento['args'][0].get('error')}
+            eventlet.sleep(0.05)
+        return {'ok': False, 'segundos': time.monotonic() - inicio, 'error': 'timeout'}
+    finally:
+        cliente_socket.disconnect()
+
+
+def resumen(valores):
+    return {
+        'n': len(valores),
+        'p50': percentil(valores, 50),
+        'p95': percentil(valores, 95),
+        'max': max(valores) if valores else None,
+    }
+
+
+def ejecutar_benchmark(args):
+    """
+    Retorna:
+    - dict: Informe del benchmark.
+    """
+    directorio_audio = os.path.join(_DIRECTORIO_TEMPORAL, 'audios')
+    os.makedirs(directorio_audio, exist_ok=True)
+    instalar_dobles(args, directorio_audio)
+    muestras = registrar_muestras()
+    if args.tracemalloc:
+        tracemalloc.start()
+
+    cola_trabajos.iniciar()
+    prefijo = 'b' + ''.join(random.choices(string.ascii_lowercase + string.digits, k=4))
+    urls = [f'https://www.youtube.com/watch?v={prefijo}{indice:06d}' for indice in range(args.sesiones)]
+
+    inicio = time.monotonic()
+    hilos = []
+    for indice, url_video in enumerate(urls):
+        if args.rampa and indice:
+            eventlet.sleep(args.rampa / args.sesiones)
+        hilos.append(eventlet.spawn(ejecutar_sesion, url_video, args.timeout))
+    sesiones = [hilo.wait() for hilo in hilos]
+    total = time.monotonic() - inicio
+
+    completadas = [s['segundos'] for s in sesiones if s['ok']]
+    errores = {}
+    for sesion in sesiones:
+        if not sesion['ok']:
+            errores[sesion['error']] = errores.get(sesion['error'], 0) + 1
+
+    informe = {
+        'parametros': {clave: valor for clave, valor in vars(args).items() if clave not in ('salida', 'comparar')},
+        'sesiones': {'total': len(sesiones), 'completadas': len(completadas), 'errores': errores},
+        'duracion_total_s': total,
+        'videos_por_minuto': len(completadas) / total * 60 if total else 0,
+        'sesion': resumen(completadas),
+        'etapas': {etapa: resumen(valores) for etapa, valores in sorted(muestras.items())},
+        'tokens_bedrock': {clave[0]: valor for clave, valor in tokens_bedrock.valores().items()},
+        'bytes_audio': {clave[0]: valor for clave, valor in bytes_audio.valores().items()},
+        # ru_maxrss está en KiB en Linux
+        'memoria_maxima_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+    if args.tracemalloc:
+        informe['memoria_python_pico_mb'] = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        tracemalloc.stop()
+    return informe
+
+
+def imprimir_informe(informe):
+    formato = lambda valor: '-' if valor is None else f'{valor:8.3f}'
+    sesiones = informe['sesiones']
+    print(f"\nSesiones: {sesiones['completadas']}/{sesiones['total']} completadas en "
+          f"{informe['duracion_total_s']:.1f} s ({informe['videos_por_minuto']:.1f} videos/min)")
+    for error, cantidad in sesiones['errores'].items():
+        print(f"  error ({cantidad}): {error}")
+    print(f"\n{'etapa':<24}{'n':>6}{'p50 (s)':>10}{'p95 (s)':>10}{'max (s)':>10}")
+    filas = list(informe['etapas'].items()) + [('sesion completa', informe['sesion'])]
+    for etapa, datos in filas:
+        print(f"{etapa:<24}{datos['n']:>6}  {formato(datos['p50'])}  {formato(datos['p95'])}  {formato(datos['max'])}")
+    print(f"\nTokens Bedrock: {informe['tokens_bedrock']}")
+    print(f"Bytes de audio: {informe['bytes_audio']}")
+    print(f"Memoria máxima (RSS): {informe['memoria_maxima_mb']:.1f} MB")
+    if 'memoria_python_pico_mb' in informe:
+        print(f"Memoria Python (pico, tracemalloc): {informe['memoria_python_pico_mb']:.1f} MB")
+
+
+def comparar_informes(actual, base, tolerancia, minimo_segundos=0.05):
+    """
+    Retorna:
+    - list: Descripción de cada métrica que empeoró más que `tolerancia` (fracción) respecto a
+      `base`; las diferencias de p95 menores que `minimo_segundos` se consideran ruido.
+    """
+    regresiones = []
+    pares = [('sesion completa', actual['sesion'], base['sesion'])]
+    pares += [(etapa, datos, base['etapas'][etapa]) for etapa, datos in actual['etapas'].items()
+              if etapa in base['etapas']]
+    for nombre, datos, anterior in pares:
+        if datos['p95'] is None or not anterior['p95'] or datos['p95'] - anterior['p95'] < minimo_segundos:
+            continue
+        if datos['p95'] > anterior['p95'] * (1 + tolerancia):
+            regresiones.append(f"p95 de {nombre}: {anterior['p95']:.3f} s -> {datos['p95']:.3f} s")
+    if actual['videos_por_minuto'] < base['videos_por_minuto'] * (1 - tolerancia):
+        regresiones.append(f"rendimiento: {base['videos_por_minuto']:.1f} -> {actual['videos_por_minuto']:.1f} videos/min")
+    if actual['memoria_maxima_mb'] > base['memoria_maxima_mb'] * (1 + tolerancia):
+        regresiones.append(f"memoria máxima: {base['memoria_maxima_mb']:.1f} -> {actual['memoria_maxima_mb']:.1f} MB")
+    return regresiones
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark del procesamiento de videos con servicios simulados.')
+    parser.add_argument('--sesiones', type=int, default=10, help='Sesiones concurrentes (una por video).')
+    parser.add_argument('--rampa', type=float, default=0.0, help='Segundos durante los que se reparten los inicios.')
+    parser.add_argument('--timeout', type=float, default=600.0, help='Segundos máximos por sesión.')
+    parser.add_argument('--audio', help='Archivo de audio a servir (por defecto bytes aleatorios).')
+    parser.add_argument('--tamano-audio', type=float, default=2.0, help='MiB del audio generado.')
+    parser.add_argument('--duracion', type=float, default=600.0, help='Duración declarada del audio en segundos.')
+    parser.add_argument('--descarga-segundos', type=float, default=0.5, help='Segundos que tarda yt-dlp en descargar.')
+    parser.add_argument('--s3-mbps', type=float, default=200.0, help='Ancho de banda simulado de S3 (0 = sin límite).')
+    parser.add_argument('--transcribe-latencia', type=float, default=2.0, help='Segundos hasta completar cada transcripción.')
+    parser.add_argument('--palabras', type=int, default=1500, help='Palabras de cada transcripción.')
+    parser.add_argument('--salida-s3', action='store_true',
+                        help='Transcribe escribe su salida en un bucket propio (lectura con GetObject).')
+    parser.add_argument('--intervalo-sondeo', type=float, default=0.5, help='Segundos entre revisiones de Transcribe.')
+    parser.add_argument('--bedrock-latencia', type=float, default=0.5, help='Segundos hasta el primer token de Bedrock.')
+    parser.add_argument('--tokens-por-segundo', type=float, default=60.0, help='Tokens de salida por segundo de Bedrock.')
+    parser.add_argument('--tracemalloc', action='store_true', help='Mide también el pico de memoria Python (más lento).')
+    parser.add_argument('--salida', help='Archivo JSON donde guardar el informe.')
+    parser.add_argument('--comparar', help='Informe JSON anterior con el que comparar.')
+    parser.add_argument('--tolerancia', type=float, default=0.15, help='Empeoramiento relativo permitido con --comparar.')
+    args = parser.parse_args(argv)
+
+    try:
+        informe = ejecutar_benchmark(args)
+    finally:
+        shutil.rmtree(_DIRECTORIO_TEMPORAL, ignore_errors=True)
+    imprimir_informe(informe)
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            json.dump(informe, archivo, ensure_ascii=False, indent=2)
+        print(f"\nInforme guardado en {args.salida}")
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as archivo:
+            regresiones = comparar_informes(informe, json.load(archivo), args.tolerancia)
+        if regresiones:
+            print("\nRegresiones respecto al informe base:")
+            for regresion in regresiones:
+                print(f"  - {regresion}")
+            return 1
+        print("\nSin regresiones respecto al informe base.")
+    return 0 if informe['sesiones']['completadas'] == informe['sesiones']['total'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
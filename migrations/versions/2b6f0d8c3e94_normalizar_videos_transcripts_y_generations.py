@@ -0,0 +1,223 @@
+"""Normalizar videos por video_id con tablas transcripts y generations
+
+Revision ID: 2b6f0d8c3e94
+Revises: e7b3f5a92c40
+Create Date: 2024-11-25 10:14:37.552081
+
+"""
+import zlib
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2b6f0d8c3e94'
+down_revision = 'e7b3f5a92c40'
+branch_labels = None
+depends_on = None
+
+TAMANO_LOTE = 500
+
+videos_legacy = sa.table(
+    'videos_legacy',
+    sa.column('url_video', sa.String),
+    sa.column('title1', sa.String),
+    sa.column('title2', sa.String),
+    sa.column('title3', sa.String),
+    sa.column('summary', sa.Text),
+    sa.column('transcription', sa.Text),
+    sa.column('created_at', sa.DateTime),
+)
+videos = sa.table(
+    'videos',
+    sa.column('video_id', sa.String),
+    sa.column('url_video', sa.String),
+    sa.column('title1', sa.String),
+    sa.column('title2', sa.String),
+    sa.column('title3', sa.String),
+    sa.column('summary', sa.Text),
+    sa.column('generation_id', sa.Integer),
+    sa.column('created_at', sa.DateTime),
+)
+transcripts = sa.table(
+    'transcripts',
+    sa.column('video_id', sa.String),
+    sa.column('content', sa.LargeBinary),
+    sa.column('characters', sa.Integer),
+)
+generations = sa.table(
+    'generations',
+    sa.column('id', sa.Integer),
+    sa.column('video_id', sa.String),
+    sa.column('model_id', sa.String),
+    sa.column('prompt_version', sa.String),
+    sa.column('title1', sa.String),
+    sa.column('title2', sa.String),
+    sa.column('title3', sa.String),
+    sa.column('summary', sa.Text),
+    sa.column('cached', sa.Boolean),
+)
+
+
+def _video_id(url_video):
+    # Las URLs guardadas ya están limpias: https://www.youtube.com/watch?v=<ID>
+    return url_video.rsplit('v=', 1)[-1][:11]
+
+
+def upgrade():
+    bind = op.get_bind()
+    postgres = bind.dialect.name == 'postgresql'
+
+    # 1. Apartar la tabla anterior (sus índices y PK conservan el nombre en Postgres)
+    if postgres:
+        op.drop_index('ix_videos_search_vector', table_name='videos', postgresql_using='gin')
+    op.drop_index('ix_videos_created_at_url', table_name='videos')
+    op.rename_table('videos', 'videos_legacy')
+    if postgres:
+        op.execute('ALTER INDEX videos_pkey RENAME TO videos_legacy_pkey')
+
+    # 2. Nuevas tablas
+    op.create_table('videos',
+    sa.Column('video_id', sa.String(length=11), nullable=False),
+    sa.Column('url_video', sa.String(length=255), nullable=False),
+    sa.Column('source_title', sa.String(length=255), nullable=True),
+    sa.Column('duration', sa.Float(), nullable=True),
+    sa.Column('language', sa.String(length=16), nullable=True),
+    sa.Column('title1', sa.String(length=255), nullable=False),
+    sa.Column('title2', sa.String(length=255), nullable=False),
+    sa.Column('title3', sa.String(length=255), nullable=False),
+    sa.Column('summary', sa.Text(), nullable=False),
+    sa.Column('generation_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+    sa.PrimaryKeyConstraint('video_id'),
+    sa.UniqueConstraint('url_video')
+    )
+    op.create_index('ix_videos_created_at_id', 'videos', ['created_at', 'video_id'], unique=False)
+
+    op.create_table('transcripts',
+    sa.Column('video_id', sa.String(length=11), nullable=False),
+    sa.Column('language', sa.String(length=16), nullable=True),
+    sa.Column('content', sa.LargeBinary(), nullable=False),
+    sa.Column('characters', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+    sa.ForeignKeyConstraint(['video_id'], ['videos.video_id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('video_id')
+    )
+
+    op.create_table('generations',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('video_id', sa.String(length=11), nullable=False),
+    sa.Column('model_id', sa.String(length=128), nullable=False),
+    sa.Column('prompt_version', sa.String(length=32), nullable=False),
+    sa.Column('title1', sa.String(length=255), nullable=False),
+    sa.Column('title2', sa.String(length=255), nullable=False),
+    sa.Column('title3', sa.String(length=255), nullable=False),
+    sa.Column('summary', sa.Text(), nullable=False),
+    sa.Column('input_tokens', sa.Integer(), nullable=True),
+    sa.Column('output_tokens', sa.Integer(), nullable=True),
+    sa.Column('cache_read_tokens', sa.Integer(), nullable=True),
+    sa.Column('latency_ms', sa.Integer(), nullable=True),
+    sa.Column('cached', sa.Boolean(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+    sa.ForeignKeyConstraint(['video_id'], ['videos.video_id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_generations_video_id_created_at', 'generations', ['video_id', 'created_at'], unique=False)
+
+    with op.batch_alter_table('video_checkpoints', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('language', sa.String(length=16), nullable=True))
+
+    # 3. Copiar los datos por lotes; cada video conserva su generación como historial
+    vistos = set()
+    legado = bind.execution_options(yield_per=TAMANO_LOTE).execute(sa.select(videos_legacy)).mappings()
+    for filas in legado.partitions():
+        lote_videos, lote_transcripts, lote_generations = [], [], []
+        for fila in filas:
+            video_id = _video_id(fila['url_video'])
+            if video_id in vistos:
+                continue
+            vistos.add(video_id)
+            titulos = {clave: fila[clave] for clave in ('title1', 'title2', 'title3', 'summary')}
+            lote_videos.append({'video_id': video_id, 'url_video': fila['url_video'],
+                                'created_at': fila['created_at'], **titulos})
+            texto = fila['transcription'] or ''
+            lote_transcripts.append({'video_id': video_id, 'content': zlib.compress(texto.encode('utf-8'), 6),
+                                     'characters': len(texto)})
+            lote_generations.append({'video_id': video_id, 'model_id': 'desconocido', 'prompt_version': 'legacy',
+                                     'cached': False, **titulos})
+        if lote_videos:
+            bind.execute(videos.insert(), lote_videos)
+            bind.execute(transcripts.insert(), lote_transcripts)
+            bind.execute(generations.insert(), lote_generations)
+
+    bind.execute(videos.update().values(generation_id=sa.select(sa.func.max(generations.c.id))
+                                        .where(generations.c.video_id == videos.c.video_id)
+                                        .scalar_subquery()))
+
+    # 4. Búsqueda de texto completo: vector normal (ya no generado) que mantiene la aplicación,
+    #    porque la transcripción ahora está comprimida en otra tabla. Se indexan sus primeros
+    #    100.000 caracteres (BUSQUEDA_MAX_TRANSCRIPCION): un tsvector no puede pasar de 1 MB
+    if postgres:
+        op.execute('ALTER TABLE videos ADD COLUMN search_vector tsvector')
+        op.execute("""
+            UPDATE videos v SET search_vector =
+                setweight(to_tsvector('spanish', v.title1 || ' ' || v.title2 || ' ' || v.title3), 'A') ||
+                setweight(to_tsvector('spanish', v.summary), 'B') ||
+                setweight(to_tsvector('spanish', left(coalesce(l.transcription, ''), 100000)), 'C')
+            FROM videos_legacy l WHERE l.url_video = v.url_video
+        """)
+        op.create_index('ix_videos_search_vector', 'videos', ['search_vector'], unique=False, postgresql_using='gin')
+
+    op.drop_table('videos_legacy')
+
+
+def downgrade():
+    bind = op.get_bind()
+    postgres = bind.dialect.name == 'postgresql'
+
+    if postgres:
+        op.drop_index('ix_videos_search_vector', table_name='videos', postgresql_using='gin')
+    op.create_table('videos_legacy',
+    sa.Column('url_video', sa.String(length=255), nullable=False),
+    sa.Column('title1', sa.String(length=255), nullable=False),
+    sa.Column('title2', sa.String(length=255), nullable=False),
+    sa.Column('title3', sa.String(length=255), nullable=False),
+    sa.Column('summary', sa.Text(), nullable=False),
+    sa.Column('transcription', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+    sa.PrimaryKeyConstraint('url_video', name='videos_legacy_pkey')
+    )
+
+    consulta = sa.select(videos, transcripts.c.content).select_from(
+        videos.outerjoin(transcripts, transcripts.c.video_id == videos.c.video_id))
+    for filas in bind.execution_options(yield_per=TAMANO_LOTE).execute(consulta).mappings().partitions():
+        bind.execute(videos_legacy.insert(), [{
+            'url_video': fila['url_video'],
+            'title1': fila['title1'],
+            'title2': fila['title2'],
+            'title3': fila['title3'],
+            'summary': fila['summary'],
+            'transcription': zlib.decompress(fila['content']).decode('utf-8') if fila['content'] else '',
+            'created_at': fila['created_at'],
+        } for fila in filas])
+
+    with op.batch_alter_table('video_checkpoints', schema=None) as batch_op:
+        batch_op.drop_column('language')
+    op.drop_index('ix_generations_video_id_created_at', table_name='generations')
+    op.drop_table('generations')
+    op.drop_table('transcripts')
+    op.drop_index('ix_videos_created_at_id', table_name='videos')
+    op.drop_table('videos')
+    op.rename_table('videos_legacy', 'videos')
+    if postgres:
+        op.execute('ALTER INDEX videos_legacy_pkey RENAME TO videos_pkey')
+        op.execute("""
+            ALTER TABLE videos ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+                setweight(to_tsvector('spanish', coalesce(title1, '') || ' ' || coalesce(title2, '') || ' ' || coalesce(title3, '')), 'A') ||
+                setweight(to_tsvector('spanish', coalesce(summary, '')), 'B') ||
+                setweight(to_tsvector('spanish', left(coalesce(transcription, ''), 100000)), 'C')
+            ) STORED
+        """)
+        op.create_index('ix_videos_search_vector', 'videos', ['search_vector'], unique=False, postgresql_using='gin')
+    op.create_index('ix_videos_created_at_url', 'videos', ['created_at', 'url_video'], unique=False)
@@ -0,0 +1,28 @@
+"""Agregar batch_id a jobs para el procesamiento por lotes
+
+Revision ID: 3f6e9a0b5c21
+Revises: 8b1d4c2e7a10
+Create Date: 2024-11-06 10:41:07.954213
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f6e9a0b5c21'
+down_revision = '8b1d4c2e7a10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('batch_id', sa.String(length=64), nullable=True))
+        batch_op.create_index(batch_op.f('ix_jobs_batch_id'), ['batch_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_jobs_batch_id'))
+        batch_op.drop_column('batch_id')
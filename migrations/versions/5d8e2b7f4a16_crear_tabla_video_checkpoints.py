@@ -0,0 +1,39 @@
+"""Crear tabla video_checkpoints para reanudar videos por etapa
+
+Revision ID: 5d8e2b7f4a16
+Revises: c42a7d9e1f03
+Create Date: 2024-11-15 09:22:41.603127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d8e2b7f4a16'
+down_revision = 'c42a7d9e1f03'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('video_checkpoints',
+    sa.Column('url_video', sa.String(length=255), nullable=False),
+    sa.Column('stage', sa.String(length=32), nullable=False),
+    sa.Column('video_id', sa.String(length=32), nullable=True),
+    sa.Column('title', sa.String(length=255), nullable=True),
+    sa.Column('duration', sa.Float(), nullable=True),
+    sa.Column('audio_path', sa.String(length=512), nullable=True),
+    sa.Column('audio_sha256', sa.String(length=64), nullable=True),
+    sa.Column('audio_uri', sa.String(length=512), nullable=True),
+    sa.Column('transcription_job', sa.String(length=255), nullable=True),
+    sa.Column('transcription_raw', sa.Text(), nullable=True),
+    sa.Column('transcription', sa.Text(), nullable=True),
+    sa.Column('suggestions', sa.Text(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+    sa.PrimaryKeyConstraint('url_video')
+    )
+
+
+def downgrade():
+    op.drop_table('video_checkpoints')
@@ -0,0 +1,39 @@
+"""Crear tabla jobs para la cola de procesamiento persistente
+
+Revision ID: 8b1d4c2e7a10
+Revises: f30a869c35f3
+Create Date: 2024-11-04 18:22:41.310512
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b1d4c2e7a10'
+down_revision = 'f30a869c35f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('url_video', sa.String(length=255), nullable=False),
+    sa.Column('session_id', sa.String(length=64), nullable=False),
+    sa.Column('priority', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=16), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_jobs_status_priority', 'jobs', ['status', 'priority', 'id'], unique=False)
+    op.create_index(op.f('ix_jobs_url_video'), 'jobs', ['url_video'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_jobs_url_video'), table_name='jobs')
+    op.drop_index('ix_jobs_status_priority', table_name='jobs')
+    op.drop_table('jobs')
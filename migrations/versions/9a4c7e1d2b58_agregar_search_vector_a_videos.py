@@ -0,0 +1,39 @@
+"""Agregar search_vector (tsvector en español) con índice GIN a videos
+
+Revision ID: 9a4c7e1d2b58
+Revises: 5d8e2b7f4a16
+Create Date: 2024-11-18 11:47:02.381954
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4c7e1d2b58'
+down_revision = '5d8e2b7f4a16'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Solo Postgres tiene tsvector; en SQLite la búsqueda usa ILIKE
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    # Columna generada: Postgres la mantiene al insertar o actualizar el video. De la transcripción
+    # solo se indexan los primeros 100.000 caracteres: un tsvector no puede pasar de 1 MB
+    op.execute("""
+        ALTER TABLE videos ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('spanish', coalesce(title1, '') || ' ' || coalesce(title2, '') || ' ' || coalesce(title3, '')), 'A') ||
+            setweight(to_tsvector('spanish', coalesce(summary, '')), 'B') ||
+            setweight(to_tsvector('spanish', left(coalesce(transcription, ''), 100000)), 'C')
+        ) STORED
+    """)
+    op.create_index('ix_videos_search_vector', 'videos', ['search_vector'], unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.drop_index('ix_videos_search_vector', table_name='videos', postgresql_using='gin')
+    op.drop_column('videos', 'search_vector')
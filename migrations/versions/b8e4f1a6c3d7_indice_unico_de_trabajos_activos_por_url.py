@@ -0,0 +1,34 @@
+"""Índice único parcial: un solo trabajo activo por url_video
+
+Revision ID: b8e4f1a6c3d7
+Revises: 2b6f0d8c3e94
+Create Date: 2024-11-27 09:31:18.406275
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e4f1a6c3d7'
+down_revision = '2b6f0d8c3e94'
+branch_labels = None
+depends_on = None
+
+ACTIVOS = sa.text("status IN ('pending', 'running')")
+
+
+def upgrade():
+    # Los duplicados activos que ya existan se cierran dejando el más antiguo de cada URL
+    op.execute("""
+        UPDATE jobs SET status = 'failed', error = 'Trabajo duplicado para la misma URL.'
+        WHERE status IN ('pending', 'running') AND id NOT IN (
+            SELECT MIN(id) FROM jobs WHERE status IN ('pending', 'running') GROUP BY url_video
+        )
+    """)
+    op.create_index('ux_jobs_url_video_activo', 'jobs', ['url_video'], unique=True,
+                    postgresql_where=ACTIVOS, sqlite_where=ACTIVOS)
+
+
+def downgrade():
+    op.drop_index('ux_jobs_url_video_activo', table_name='jobs')
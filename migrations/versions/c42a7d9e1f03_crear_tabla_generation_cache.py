@@ -0,0 +1,31 @@
+"""Crear tabla generation_cache para las respuestas de Bedrock
+
+Revision ID: c42a7d9e1f03
+Revises: 3f6e9a0b5c21
+Create Date: 2024-11-12 16:05:33.118406
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c42a7d9e1f03'
+down_revision = '3f6e9a0b5c21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('generation_cache',
+    sa.Column('key', sa.String(length=64), nullable=False),
+    sa.Column('model_id', sa.String(length=128), nullable=False),
+    sa.Column('prompt_version', sa.String(length=32), nullable=False),
+    sa.Column('response', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+
+
+def downgrade():
+    op.drop_table('generation_cache')
@@ -0,0 +1,30 @@
+"""Agregar created_at con índice a videos para la paginación por cursor
+
+Revision ID: e7b3f5a92c40
+Revises: 9a4c7e1d2b58
+Create Date: 2024-11-20 17:08:55.214630
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7b3f5a92c40'
+down_revision = '9a4c7e1d2b58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # SQLite no admite ADD COLUMN con un default no constante; ahí se recrea la tabla
+    recreate = 'always' if op.get_bind().dialect.name == 'sqlite' else 'auto'
+    with op.batch_alter_table('videos', schema=None, recreate=recreate) as batch_op:
+        batch_op.add_column(sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=False))
+        batch_op.create_index('ix_videos_created_at_url', ['created_at', 'url_video'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('videos', schema=None) as batch_op:
+        batch_op.drop_index('ix_videos_created_at_url')
+        batch_op.drop_column('created_at')
@@ -0,0 +1,203 @@
+# modules/audio_cache.py
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Carpeta 'audios' en el directorio principal
+AUDIO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'audios')
+
+class CacheAudio:
+    """
+    Caché local de audios indexada por el ID del video de YouTube.
+
+    Cada audio tiene junto a él un archivo `<video_id>.json` con sus metadatos (archivo,
+    título, duración, tamaño y hash SHA-256). La hora de modificación de ese archivo marca
+    el último acceso, y cuando el total de bytes del directorio supera `max_bytes` se eliminan
+    los audios menos usados. Los audios usados hace menos de `edad_minima` segundos nunca se
+    eliminan, para no borrar archivos que una etapa del pipeline todavía está subiendo.
+    """
+
+    def __init__(self, directorio=AUDIO_DIR, max_bytes=None, edad_minima=600):
+        """
+        Parámetros:
+        - directorio (str): Carpeta donde se guardan los audios.
+        - max_bytes (int): Presupuesto total en bytes (por defecto AUDIO_CACHE_MAX_BYTES o 5 GiB).
+        - edad_minima (float): Segundos desde el último acceso durante los que un audio no se elimina.
+        """
+        self.directorio = directorio
+        self.max_bytes = max_bytes or int(os.getenv('AUDIO_CACHE_MAX_BYTES', str(5 * 1024 ** 3)))
+        self.edad_minima = edad_minima
+        self._lock = threading.Lock()
+        self._bloqueos = {}
+        os.makedirs(self.directorio, exist_ok=True)
+
+    @contextmanager
+    def bloqueo(self, video_id):
+        """
+        Serializa el trabajo sobre un mismo video: si varios workers piden el mismo ID a la vez,
+        el primero lo descarga y los demás lo encuentran en la caché.
+        """
+        with self._lock:
+            bloqueo, usuarios = self._bloqueos.get(video_id, (threading.Lock(), 0))
+            self._bloqueos[video_id] = (bloqueo, usuarios + 1)
+        try:
+            with bloqueo:
+                yield
+        finally:
+            with self._lock:
+                bloqueo, usuarios = self._bloqueos[video_id]
+                if usuarios <= 1:
+                    del self._bloqueos[video_id]
+                else:
+                    self._bloqueos[video_id] = (bloqueo, usuarios - 1)
+
+    def obtener(self, video_id):
+        """
+        Busca un audio válido en la caché y registra el acceso.
+
+        Parámetros:
+        - video_id (str): ID del video.
+
+        Retorna:
+        - dict: Metadatos del audio ('ruta', 'titulo', 'duracion', 'bytes', 'sha256', ...).
+        - None: Si el audio no está en la caché o su archivo no coincide con los metadatos.
+        """
+        entrada = self._leer_metadatos(video_id)
+        if entrada is None:
+            return None
+        ruta = os.path.join(self.directorio, entrada['archivo'])
+        if not os.path.exists(ruta) or os.path.getsize(ruta) != entrada.get('bytes'):
+            logger.warning(f"Audio en caché inválido para {video_id}; se descargará de nuevo.")
+            self._eliminar(video_id, entrada)
+            return None
+        os.utime(self._ruta_metadatos(video_id))
+        logger.info(f"Audio de {video_id} encontrado en caché: {ruta}")
+        return dict(entrada, ruta=ruta)
+
+    def guardar(self, video_id, ruta, titulo, duracion, **extra):
+        """
+        Registra en la caché un audio recién descargado y aplica el presupuesto de bytes.
+
+        Parámetros:
+        - video_id (str): ID del video.
+        - ruta (str): Ruta del audio (dentro del directorio de la caché).
+        - titulo (str): Título del video.
+        - duracion (float): Duración en segundos, si se conoce.
+        - extra: Metadatos adicionales a guardar.
+
+        Retorna:
+        - dict: Metadatos guardados, incluyendo 'ruta'.
+        """
+        entrada = {
+            'video_id': video_id,
+            'archivo': os.path.basename(ruta),
+            'titulo': titulo,
+            'duracion': duracion,
+            'bytes': os.path.getsize(ruta),
+            'sha256': calcular_sha256(ruta),
+            **extra,
+        }
+        ruta_metadatos = self._ruta_metadatos(video_id)
+        temporal = f"{ruta_metadatos}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as archivo:
+            json.dump(entrada, archivo, ensure_ascii=False)
+        os.replace(temporal, ruta_metadatos)
+        self.desalojar()
+        return dict(entrada, ruta=ruta)
+
+    def desalojar(self):
+        """
+        Elimina los audios menos usados hasta quedar dentro del presupuesto de bytes.
+
+        También cuentan los archivos sin metadatos (mp3 anteriores a la caché, audios preparados,
+        restos '.part' de descargas interrumpidas), con su hora de modificación como último
+        acceso, así que el presupuesto abarca todo el directorio.
+
+        Retorna:
+        - int: Bytes liberados.
+        """
+        with self._lock:
+            entradas = []
+            total = 0
+            nombres = [nombre for nombre in os.listdir(self.directorio) if not nombre.startswith('.')]
+            registrados = set()
+            for nombre in nombres:
+                if not nombre.endswith('.json'):
+                    continue
+                video_id = nombre[:-len('.json')]
+                entrada = self._leer_metadatos(video_id)
+                if entrada is None:
+                    continue
+                registrados.update((nombre, entrada['archivo']))
+                acceso = os.path.getmtime(self._ruta_metadatos(video_id))
+                entradas.append((acceso, video_id, entrada, entrada.get('bytes', 0)))
+                total += entrada.get('bytes', 0)
+
+            for nombre in nombres:
+                ruta = os.path.join(self.directorio, nombre)
+                if nombre in registrados or not os.path.isfile(ruta):
+                    continue
+                try:
+                    estado = os.stat(ruta)
+                except FileNotFoundError:
+                    continue
+                entradas.append((estado.st_mtime, None, ruta, estado.st_size))
+                total += estado.st_size
+
+            liberados = 0
+            limite_edad = time.time() - self.edad_minima
+            for acceso, video_id, entrada, tamano in sorted(entradas, key=lambda e: e[0]):
+                if total - liberados <= self.max_bytes:
+                    break
+                if acceso > limite_edad:
+                    continue
+                if video_id is None:
+                    self._eliminar_archivo(entrada)
+                else:
+                    self._eliminar(video_id, entrada)
+                liberados += tamano
+        if liberados:
+            logger.info(f"Caché de audio: {liberados} bytes liberados.")
+        return liberados
+
+    def _ruta_metadatos(self, video_id):
+        return os.path.join(self.directorio, f"{video_id}.json")
+
+    def _leer_metadatos(self, video_id):
+        try:
+            with open(self._ruta_metadatos(video_id), encoding='utf-8') as archivo:
+                return json.load(archivo)
+        except (OSError, ValueError):
+            return None
+
+    def _eliminar(self, video_id, entrada):
+        for ruta in (os.path.join(self.directorio, entrada['archivo']), self._ruta_metadatos(video_id)):
+            self._eliminar_archivo(ruta)
+
+    @staticmethod
+    def _eliminar_archivo(ruta):
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass
+
+def calcular_sha256(ruta, tamano_bloque=1024 * 1024):
+    """
+    Retorna:
+    - str: Hash SHA-256 (hexadecimal) del archivo.
+    """
+    sha256 = hashlib.sha256()
+    with open(ruta, 'rb') as archivo:
+        for bloque in iter(lambda: archivo.read(tamano_bloque), b''):
+            sha256.update(bloque)
+    return sha256.hexdigest()
+
+# Caché compartida por todos los workers del proceso
+cache_audio = CacheAudio()
@@ -0,0 +1,146 @@
+# modules/audio_prep.py
+
+import os
+import hashlib
+import logging
+from modules.media_pool import ejecutar_ffmpeg
+
+logger = logging.getLogger(__name__)
+
+# Elimina los silencios más largos que AUDIO_SILENCIO_MINIMO (deja medio segundo entre frases)
+QUITAR_SILENCIOS = os.getenv('AUDIO_QUITAR_SILENCIOS', 'false').lower() in ('1', 'true', 'si', 'sí', 'yes')
+SILENCIO_MINIMO = float(os.getenv('AUDIO_SILENCIO_MINIMO', '2'))
+UMBRAL_SILENCIO = os.getenv('AUDIO_UMBRAL_SILENCIO', '-40dB')
+# Segundos iniciales que se descartan (intro musical de los videos de un canal)
+OMITIR_INICIO = float(os.getenv('AUDIO_OMITIR_INICIO', '0'))
+# Aceleración de la voz con atempo (1.0 = sin cambios; Transcribe tolera bien hasta ~1.5)
+VELOCIDAD = float(os.getenv('AUDIO_VELOCIDAD', '1.0'))
+# Duración máxima del audio enviado; los videos más largos se muestrean (0 = sin límite)
+DURACION_MAXIMA = float(os.getenv('AUDIO_DURACION_MAXIMA', '0'))
+VENTANA_INICIO = float(os.getenv('AUDIO_VENTANA_INICIO', '300'))
+VENTANA_MUESTRA = float(os.getenv('AUDIO_VENTANA_MUESTRA', '60'))
+BITRATE_PREPARADO = os.getenv('AUDIO_BITRATE_VOZ', '64k')
+
+if not 0.5 <= VELOCIDAD <= 2.0:
+    raise ValueError(f"AUDIO_VELOCIDAD debe estar entre 0.5 y 2.0 (valor actual: {VELOCIDAD}).")
+
+
+def politica_activa():
+    """
+    Retorna:
+    - bool: True si alguna política de preparación cambia el audio.
+    """
+    return QUITAR_SILENCIOS or OMITIR_INICIO > 0 or VELOCIDAD != 1.0 or DURACION_MAXIMA > 0
+
+def calcular_ventanas(duracion, maximo=None, inicio=None, ventana=None, omitir=None):
+    """
+    Elige los tramos del audio que se transcriben: la apertura completa y ventanas
+    repartidas a intervalos regulares por el resto del video, hasta sumar `maximo` segundos.
+
+    Parámetros:
+    - duracion (float): Duración del audio en segundos.
+    - maximo (float): Segundos a conservar (por defecto AUDIO_DURACION_MAXIMA; 0 = todos).
+    - inicio (float): Duración de la ventana de apertura.
+    - ventana (float): Duración aproximada de cada ventana de muestra.
+    - omitir (float): Segundos iniciales descartados antes de la apertura.
+
+    Retorna:
+    - list: Tramos (inicio, fin) en segundos, ordenados.
+    """
+    maximo = DURACION_MAXIMA if maximo is None else maximo
+    inicio = VENTANA_INICIO if inicio is None else inicio
+    ventana = VENTANA_MUESTRA if ventana is None else ventana
+    omitir = OMITIR_INICIO if omitir is None else omitir
+
+    omitir = min(omitir, duracion)
+    restante = duracion - omitir
+    if not maximo or restante <= maximo:
+        return [(omitir, duracion)]
+
+    apertura = min(inicio, maximo)
+    tramos = [(omitir, omitir + apertura)] if apertura > 0 else []
+    presupuesto = maximo - apertura
+    cantidad = int(presupuesto // ventana) if ventana > 0 else 0
+    if cantidad <= 0:
+        return tramos
+    # Una ventana centrada en cada una de `cantidad` franjas iguales del resto del audio
+    desde = omitir + apertura
+    franja = (duracion - desde) / cantidad
+    longitud = presupuesto / cantidad
+    for indice in range(cantidad):
+        comienzo = desde + franja * indice + (franja - longitud) / 2
+        tramos.append((round(comienzo, 3), round(comienzo + longitud, 3)))
+    return tramos
+
+def construir_filtros(tramos):
+    """
+    Parámetros:
+    - tramos (list): Tramos (inicio, fin) a conservar, o None para conservar todo el audio.
+
+    Retorna:
+    - list: Filtros de audio de FFmpeg para los tramos y las políticas configuradas.
+    """
+    filtros = []
+    if tramos and (len(tramos) > 1 or tramos[0][0] > 0):
+        seleccion = '+'.join(f'between(t,{inicio},{fin})' for inicio, fin in tramos)
+        filtros += [f"aselect='{seleccion}'", 'asetpts=N/SR/TB']
+    if QUITAR_SILENCIOS:
+        filtros.append(f'silenceremove=start_periods=1:start_threshold={UMBRAL_SILENCIO}'
+                       f':stop_periods=-1:stop_duration={SILENCIO_MINIMO}'
+                       f':stop_threshold={UMBRAL_SILENCIO}:stop_silence=0.5')
+    if VELOCIDAD != 1.0:
+        filtros.append(f'atempo={VELOCIDAD}')
+    return filtros
+
+def preparar_audio(audio_path, duracion):
+    """
+    Genera la versión del audio que se envía a Transcribe según las políticas configuradas:
+    descarta la intro y los silencios largos, muestrea los videos largos y acelera la voz.
+    El archivo preparado lleva en el nombre una huella de la política, así que se reutiliza
+    mientras la configuración no cambie y nunca se confunde en S3 con otra versión.
+
+    Parámetros:
+    - audio_path (str): Ruta del audio descargado.
+    - duracion (float): Duración del audio en segundos; sin ella no se muestrea.
+
+    Retorna:
+    - dict: 'ruta' del audio preparado y 'duracion' estimada (sin contar los silencios quitados).
+    - None: Si ninguna política cambia el audio; se sube el original.
+
+    Lanza:
+    - Exception: Si FFmpeg no puede procesar el audio.
+    """
+    if not politica_activa():
+        return None
+    if duracion:
+        tramos = calcular_ventanas(duracion)
+        conservado = sum(fin - inicio for inicio, fin in tramos)
+    else:
+        logger.info(f"Duración desconocida para {audio_path}: no se muestrea el audio.")
+        tramos, conservado = None, None
+    filtros = construir_filtros(tramos)
+    # Sin tramos la intro se descarta con -ss antes de decodificar
+    omitir = OMITIR_INICIO if tramos is None and OMITIR_INICIO > 0 else 0
+
+    huella = hashlib.sha1(repr((tramos, omitir, filtros, BITRATE_PREPARADO)).encode('utf-8')).hexdigest()[:8]
+    destino = f"{os.path.splitext(audio_path)[0]}.{huella}.mp3"
+    resultado = {'ruta': destino, 'duracion': conservado / VELOCIDAD if conservado else None}
+    if os.path.exists(destino):
+        return resultado
+
+    comando = ['ffmpeg', '-y', '-loglevel', 'error']
+    if omitir:
+        comando += ['-ss', str(omitir)]
+    comando += ['-i', audio_path, '-vn', '-ac', '1', '-ar', '16000']
+    if filtros:
+        comando += ['-af', ','.join(filtros)]
+    temporal = f"{destino}.part"
+    comando += ['-b:a', BITRATE_PREPARADO, '-f', 'mp3', temporal]
+    proceso = ejecutar_ffmpeg(comando)
+    if proceso.returncode != 0:
+        raise Exception(f"Error al preparar el audio con FFmpeg: {proceso.stderr.strip()}")
+    os.replace(temporal, destino)
+    logger.info(f"Audio preparado {os.path.basename(destino)}: "
+                f"{f'{conservado:.0f} de {duracion:.0f} s en {len(tramos)} tramo(s), ' if tramos else ''}"
+                f"velocidad {VELOCIDAD}, silencios {'quitados' if QUITAR_SILENCIOS else 'intactos'}.")
+    return resultado
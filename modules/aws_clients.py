@@ -0,0 +1,134 @@
+# modules/aws_clients.py
+
+import os
+import time
+import logging
+import threading
+import boto3
+from botocore.config import Config
+
+logger = logging.getLogger(__name__)
+
+REGION_AWS = os.getenv('AWS_REGION', 'us-east-1')
+
+def _entero(variable, por_defecto):
+    return int(os.getenv(variable, str(por_defecto)))
+
+# Conexiones por servicio, dimensionadas según los workers del pipeline que lo usan:
+# - transcribe: workers de transcripción más el sondeo compartido.
+# - s3: workers de subida por los hilos de `upload_file` (10 por defecto en s3transfer).
+# - bedrock-runtime: workers de generación por los fragmentos resumidos en paralelo.
+CONFIG_SERVICIOS = {
+    'transcribe': {
+        'max_pool_connections': _entero('AWS_POOL_TRANSCRIBE', _entero('LIMITE_TRANSCRIPCION', 10) + 2),
+        'read_timeout': _entero('AWS_READ_TIMEOUT_TRANSCRIBE', 30),
+        'tasa': float(os.getenv('AWS_TASA_TRANSCRIBE', '10')),
+    },
+    's3': {
+        'max_pool_connections': _entero('AWS_POOL_S3', _entero('LIMITE_SUBIDA', 4) * 10),
+        'read_timeout': _entero('AWS_READ_TIMEOUT_S3', 60),
+        'tasa': float(os.getenv('AWS_TASA_S3', '100')),
+    },
+    'bedrock-runtime': {
+        'max_pool_connections': _entero('AWS_POOL_BEDROCK',
+                                        _entero('LIMITE_GENERACION', 3) * _entero('BEDROCK_CONCURRENCIA_FRAGMENTOS', 4)),
+        # Las respuestas largas (y el streaming) pueden tardar minutos
+        'read_timeout': _entero('AWS_READ_TIMEOUT_BEDROCK', 300),
+        'tasa': float(os.getenv('AWS_TASA_BEDROCK', '2')),
+    },
+}
+CONNECT_TIMEOUT = _entero('AWS_CONNECT_TIMEOUT', 5)
+MAX_INTENTOS_AWS = _entero('AWS_MAX_INTENTOS', 8)
+
+class LimitadorTasa:
+    """
+    Limitador de tasa por cubeta de fichas, compartido por todos los workers del proceso.
+
+    Permite ráfagas de hasta `rafaga` llamadas y después `tasa` llamadas por segundo. Quien
+    llega sin fichas espera (con `time.sleep`, que bajo eventlet cede el control a los demás
+    greenlets) en lugar de provocar errores de throttling en AWS.
+    """
+
+    def __init__(self, tasa, rafaga=None):
+        """
+        Parámetros:
+        - tasa (float): Llamadas por segundo.
+        - rafaga (float): Fichas máximas acumuladas; por defecto igual a `tasa` (mínimo 1).
+        """
+        self.tasa = tasa
+        self.rafaga = max(1.0, rafaga or tasa)
+        self._fichas = self.rafaga
+        self._ultima = time.monotonic()
+        self._lock = threading.Lock()
+
+    def adquirir(self):
+        """
+        Toma una ficha, esperando si hace falta.
+
+        Retorna:
+        - float: Segundos esperados.
+        """
+        with self._lock:
+            ahora = time.monotonic()
+            self._fichas = min(self.rafaga, self._fichas + (ahora - self._ultima) * self.tasa)
+            self._ultima = ahora
+            # La ficha se reserva ya; si no alcanza, se espera fuera del lock a que se genere
+            self._fichas -= 1
+            espera = -self._fichas / self.tasa if self._fichas < 0 else 0.0
+        if espera:
+            time.sleep(espera)
+        return espera
+
+_clientes = {}
+_limitadores = {}
+_lock = threading.RLock()
+
+def obtener_limitador(servicio):
+    """
+    Retorna:
+    - LimitadorTasa: Limitador compartido del servicio, o None si no tiene tasa configurada.
+    """
+    with _lock:
+        if servicio not in _limitadores:
+            tasa = CONFIG_SERVICIOS.get(servicio, {}).get('tasa')
+            _limitadores[servicio] = LimitadorTasa(tasa) if tasa and tasa > 0 else None
+        return _limitadores[servicio]
+
+def obtener_cliente(servicio):
+    """
+    Retorna el cliente boto3 compartido del servicio, creándolo la primera vez.
+
+    Los clientes de boto3 son seguros entre hilos, así que un solo cliente por servicio sirve
+    a todos los workers. Se configuran con un pool de conexiones del tamaño de los workers,
+    reintentos en modo adaptativo (que también reintenta los errores de throttling), tiempos
+    de espera de conexión y lectura, y un `LimitadorTasa` que se aplica antes de cada llamada.
+
+    Parámetros:
+    - servicio (str): Nombre del servicio ('transcribe', 's3', 'bedrock-runtime').
+
+    Retorna:
+    - botocore.client.BaseClient: Cliente del servicio.
+    """
+    with _lock:
+        cliente = _clientes.get(servicio)
+        if cliente is not None:
+            return cliente
+        config_servicio = CONFIG_SERVICIOS.get(servicio, {})
+        config = Config(
+            region_name=REGION_AWS,
+            max_pool_connections=config_servicio.get('max_pool_connections', 10),
+            connect_timeout=CONNECT_TIMEOUT,
+            read_timeout=config_servicio.get('read_timeout', 60),
+            retries={'mode': 'adaptive', 'max_attempts': MAX_INTENTOS_AWS},
+        )
+        cliente = boto3.session.Session().client(servicio, config=config)
+        limitador = obtener_limitador(servicio)
+        if limitador is not None:
+            def esperar_turno(**kwargs):
+                # Un valor distinto de None en 'before-call' sustituiría la respuesta de AWS
+                limitador.adquirir()
+            cliente.meta.events.register_first('before-call.*.*', esperar_turno)
+        _clientes[servicio] = cliente
+    logger.info(f"Cliente AWS '{servicio}' creado: pool={config.max_pool_connections}, "
+                f"read_timeout={config.read_timeout}s, tasa={config_servicio.get('tasa')}/s.")
+    return cliente
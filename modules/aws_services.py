@@ -1,11 +1,89 @@
 import os
-import boto3
+import queue
 import logging
+import threading
 from botocore.exceptions import ClientError
+from modules.aws_clients import obtener_cliente
+from modules.metrics import bytes_audio
 
-# Configuración de AWS
-transcribe = boto3.client('transcribe', region_name='us-east-1')
-s3 = boto3.client('s3', region_name='us-east-1')
+# Clientes compartidos (pool, reintentos adaptativos y límite de tasa en `aws_clients`)
+transcribe = obtener_cliente('transcribe')
+s3 = obtener_cliente('s3')
+
+# Extensión de archivo -> MediaFormat aceptado por AWS Transcribe
+FORMATOS_TRANSCRIBE = {
+    'mp3': 'mp3',
+    'mp4': 'mp4',
+    'm4a': 'm4a',
+    'wav': 'wav',
+    'flac': 'flac',
+    'ogg': 'ogg',
+    'oga': 'ogg',
+    'opus': 'ogg',
+    'amr': 'amr',
+    'webm': 'webm',
+}
+
+# Idiomas entre los que Transcribe identifica el del audio
+IDIOMAS_TRANSCRIBE = ['en-US', 'es-ES']
+# Con el idioma de los metadatos de YouTube se fija LanguageCode y se omite la identificación
+PISTA_IDIOMA = os.getenv('TRANSCRIBE_PISTA_IDIOMA', 'true').lower() in ('1', 'true', 'si', 'sí', 'yes')
+# Segundos que se espera al hilo lector de `subir_stream_s3` al terminar o fallar la carga
+TIMEOUT_LECTOR_S3 = float(os.getenv('S3_TIMEOUT_LECTOR', '60'))
+
+def codigo_idioma_transcribe(idioma, opciones=IDIOMAS_TRANSCRIBE):
+    """
+    Traduce el idioma que informa YouTube ('es', 'es-419', 'en-US') al código de Transcribe.
+
+    Parámetros:
+    - idioma (str): Idioma de los metadatos del video.
+    - opciones (list): Códigos admitidos.
+
+    Retorna:
+    - str: Código de `opciones` con el mismo idioma base.
+    - None: Si no hay idioma o no es uno de los admitidos.
+    """
+    if not idioma:
+        return None
+    for opcion in opciones:
+        if opcion.lower() == idioma.lower():
+            return opcion
+    base = idioma.split('-')[0].lower()
+    for opcion in opciones:
+        if opcion.split('-')[0].lower() == base:
+            return opcion
+    return None
+
+def ubicacion_salida_transcripcion(job_name):
+    """
+    Bucket y clave del JSON de salida de un trabajo cuando se usa un bucket propio.
+
+    Retorna:
+    - tuple: (bucket, clave) si TRANSCRIBE_OUTPUT_BUCKET está definido.
+    - None: Si la salida queda en el bucket administrado por Transcribe.
+    """
+    bucket_salida = os.getenv('TRANSCRIBE_OUTPUT_BUCKET')
+    if not bucket_salida:
+        return None
+    return bucket_salida, f"{os.getenv('TRANSCRIBE_OUTPUT_PREFIX', 'transcripciones/')}{job_name}.json"
+
+def detectar_formato_media(ruta):
+    """
+    Determina el MediaFormat de Transcribe a partir de la extensión del archivo o URI.
+
+    Parámetros:
+    - ruta (str): Ruta local o URI de S3 del audio.
+
+    Retorna:
+    - str: Valor de MediaFormat.
+
+    Lanza:
+    - ValueError: Si Transcribe no acepta el formato.
+    """
+    extension = os.path.splitext(ruta)[1].lstrip('.').lower()
+    if extension not in FORMATOS_TRANSCRIBE:
+        raise ValueError(f"Formato de audio no compatible con Transcribe: {ruta}")
+    return FORMATOS_TRANSCRIBE[extension]
 
 def subir_audio_s3(audio_path, bucket_name, s3_key):
     """
@@ -31,12 +109,108 @@ def subir_audio_s3(audio_path, bucket_name, s3_key):
 
     try:
         s3.upload_file(audio_path, bucket_name, s3_key)
+        bytes_audio.inc(os.path.getsize(audio_path), direccion='subida')
         logging.info(f"Audio subido a S3: {s3_key}")
         return f"s3://{bucket_name}/{s3_key}"
     except ClientError as e:
         logging.error(f"Error al subir el archivo a S3: {e}")
         raise Exception("Error al subir el archivo a S3.") from e
 
+def subir_stream_s3(bloques, bucket_name, s3_key, tamano_parte=None, partes_en_vuelo=1):
+    """
+    Sube a S3 un flujo de bytes mediante una carga multiparte, sin escribir en disco.
+
+    Un hilo lee los bloques y arma partes de `tamano_parte` bytes mientras el hilo actual sube
+    la parte anterior, así que la descarga y la subida se solapan. La memoria usada por trabajo
+    queda acotada a unas (`partes_en_vuelo` + 2) partes.
+
+    Parámetros:
+    - bloques (iterable): Iterador de bloques de bytes (p. ej. la respuesta HTTP del stream de audio).
+    - bucket_name (str): Nombre del bucket de S3.
+    - s3_key (str): Clave (ruta) en S3 donde se almacenará el archivo.
+    - tamano_parte (int): Bytes por parte (mínimo 5 MiB; por defecto S3_TAMANO_PARTE o 8 MiB).
+    - partes_en_vuelo (int): Partes que pueden esperar listas mientras se sube otra.
+
+    Retorna:
+    - str: URI del archivo en S3.
+
+    Lanza:
+    - Exception: Si ocurre un error al leer el flujo o al subir una parte.
+    """
+    if verificar_audio_s3(bucket_name, s3_key):
+        return f"s3://{bucket_name}/{s3_key}"
+
+    tamano_parte = max(5 * 1024 * 1024, tamano_parte or int(os.getenv('S3_TAMANO_PARTE', str(8 * 1024 * 1024))))
+    partes = queue.Queue(maxsize=max(1, partes_en_vuelo))
+    cancelado = threading.Event()
+    error_lectura = []
+
+    def entregar(parte):
+        # Con la carga cancelada nadie consume la cola: no se bloquea indefinidamente en `put`
+        while not cancelado.is_set():
+            try:
+                partes.put(parte, timeout=1)
+                return
+            except queue.Full:
+                pass
+
+    def leer():
+        buffer = bytearray()
+        producidas = 0
+        try:
+            for bloque in bloques:
+                if cancelado.is_set():
+                    return
+                buffer.extend(bloque)
+                while len(buffer) >= tamano_parte:
+                    entregar(bytes(buffer[:tamano_parte]))
+                    producidas += 1
+                    del buffer[:tamano_parte]
+            if buffer or not producidas:
+                entregar(bytes(buffer))
+        except Exception as e:
+            error_lectura.append(e)
+        finally:
+            entregar(None)
+
+    upload_id = s3.create_multipart_upload(Bucket=bucket_name, Key=s3_key)['UploadId']
+    lector = threading.Thread(target=leer, daemon=True)
+    lector.start()
+    completada = False
+    try:
+        completadas = []
+        while True:
+            parte = partes.get()
+            if parte is None:
+                break
+            numero = len(completadas) + 1
+            respuesta = s3.upload_part(Bucket=bucket_name, Key=s3_key, UploadId=upload_id,
+                                       PartNumber=numero, Body=parte)
+            completadas.append({'ETag': respuesta['ETag'], 'PartNumber': numero})
+            bytes_audio.inc(len(parte), direccion='subida')
+        if error_lectura:
+            raise error_lectura[0]
+        s3.complete_multipart_upload(Bucket=bucket_name, Key=s3_key, UploadId=upload_id,
+                                     MultipartUpload={'Parts': completadas})
+        completada = True
+        logging.info(f"Audio transmitido a S3 en {len(completadas)} partes: {s3_key}")
+        return f"s3://{bucket_name}/{s3_key}"
+    except Exception as e:
+        logging.error(f"Error al transmitir el audio a S3: {e}")
+        raise Exception("Error al transmitir el archivo a S3.") from e
+    finally:
+        # Detener el hilo lector pase lo que pase con la carga; sus esperas en la cola y en la
+        # red están acotadas, así que la espera también, y recién después se aborta
+        cancelado.set()
+        lector.join(TIMEOUT_LECTOR_S3)
+        if lector.is_alive():
+            logging.warning(f"El lector del stream de {s3_key} no terminó en {TIMEOUT_LECTOR_S3} s; se abandona.")
+        if not completada:
+            try:
+                s3.abort_multipart_upload(Bucket=bucket_name, Key=s3_key, UploadId=upload_id)
+            except Exception as e:
+                logging.error(f"No se pudo abortar la carga multiparte de {s3_key}: {e}")
+
 def verificar_audio_s3(bucket_name, s3_key):
     """
     Verifica si un archivo existe en un bucket de S3.
@@ -62,13 +236,16 @@ def verificar_audio_s3(bucket_name, s3_key):
             logging.error(f"Error al verificar en S3: {e}")
             raise Exception("Error al verificar el archivo en S3.") from e
 
-def iniciar_transcripcion(job_name, audio_uri):
+def iniciar_transcripcion(job_name, audio_uri, media_format=None, idioma=None):
     """
     Inicia un trabajo de transcripción en AWS Transcribe si no existe ya.
 
     Parámetros:
     - job_name (str): Nombre del trabajo de transcripción.
     - audio_uri (str): URI del archivo de audio en S3.
+    - media_format (str): MediaFormat del audio; por defecto se detecta de la extensión de `audio_uri`.
+    - idioma (str): Idioma según YouTube; si es uno de `IDIOMAS_TRANSCRIBE` (y TRANSCRIBE_PISTA_IDIOMA
+      está activo) se usa como LanguageCode en lugar de identificar el idioma.
 
     Retorna:
     - dict: Respuesta del servicio Transcribe.
@@ -80,6 +257,7 @@ def iniciar_transcripcion(job_name, audio_uri):
     1. Verifica si ya existe un trabajo de transcripción con el nombre dado.
     2. Si el trabajo ya existe y está completado, retorna la transcripción existente.
     3. Si el trabajo no existe, intenta iniciar un nuevo trabajo de transcripción con los parámetros proporcionados.
+       Si ya existe y sigue en curso se retorna su estado; si falló, se elimina y se inicia de nuevo.
     4. Si ocurre un error al iniciar el trabajo de transcripción, lanza una excepción con un mensaje de error.
     """
     transcripcion_existente = verificar_transcripcion_existente(job_name)
@@ -87,17 +265,34 @@ def iniciar_transcripcion(job_name, audio_uri):
         logging.info(f"El trabajo de transcripción '{job_name}' ya existe y está completado.")
         return transcripcion_existente
     else:
+        parametros = {
+            'TranscriptionJobName': job_name,
+            'Media': {'MediaFileUri': audio_uri},
+            'MediaFormat': media_format or detectar_formato_media(audio_uri),
+        }
+        codigo_idioma = codigo_idioma_transcribe(idioma) if PISTA_IDIOMA else None
+        if codigo_idioma:
+            parametros['LanguageCode'] = codigo_idioma
+        else:
+            parametros.update(IdentifyLanguage=True, LanguageOptions=IDIOMAS_TRANSCRIBE)
+        # Con un bucket de salida propio, el sondeo puede detectar el resultado en S3
+        salida = ubicacion_salida_transcripcion(job_name)
+        if salida:
+            parametros['OutputBucketName'], parametros['OutputKey'] = salida
         try:
-            response = transcribe.start_transcription_job(
-                TranscriptionJobName=job_name,
-                Media={'MediaFileUri': audio_uri},
-                MediaFormat='mp3',
-                IdentifyLanguage=True,
-                LanguageOptions=['en-US', 'es-ES']
-            )
+            response = transcribe.start_transcription_job(**parametros)
             logging.info(f"Trabajo de transcripción iniciado: {job_name}")
             return response
         except ClientError as e:
+            if e.response['Error']['Code'] == 'ConflictException':
+                # Al reanudar un video el trabajo puede seguir en curso o haber fallado
+                estado = transcribe.get_transcription_job(TranscriptionJobName=job_name)
+                if estado['TranscriptionJob']['TranscriptionJobStatus'] != 'FAILED':
+                    logging.info(f"El trabajo de transcripción '{job_name}' ya está en curso; se reanuda la espera.")
+                    return estado
+                logging.info(f"El trabajo de transcripción '{job_name}' falló antes; se inicia de nuevo.")
+                transcribe.delete_transcription_job(TranscriptionJobName=job_name)
+                return transcribe.start_transcription_job(**parametros)
             logging.error(f"Error al iniciar el trabajo de transcripción: {e}")
             raise Exception("Error al iniciar el trabajo de transcripción.") from e
 
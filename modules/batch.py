@@ -0,0 +1,82 @@
+# modules/batch.py
+
+import logging
+from uuid import uuid4
+from modules.models import db, Video
+from modules.youtube_man import expandir_lista
+
+logger = logging.getLogger(__name__)
+
+def expandir_entradas(entradas):
+    """
+    Convierte una lista de URLs de videos, playlists o canales en URLs limpias de videos.
+
+    Parámetros:
+    - entradas (list): URLs proporcionadas por el usuario.
+
+    Retorna:
+    - tuple: (urls, invalidas), con las URLs de videos sin duplicados y las entradas que no se pudieron leer.
+    """
+    urls = []
+    vistas = set()
+    invalidas = []
+    for entrada in entradas:
+        entrada = (entrada or '').strip()
+        if not entrada:
+            continue
+        try:
+            expandidas = expandir_lista(entrada)
+        except Exception as e:
+            logger.warning(f"No se pudo expandir la entrada {entrada}: {e}")
+            invalidas.append(entrada)
+            continue
+        for url in expandidas:
+            if url not in vistas:
+                vistas.add(url)
+                urls.append(url)
+    return urls, invalidas
+
+def filtrar_procesados(urls):
+    """
+    Separa las URLs que ya existen en la tabla `videos` usando una sola consulta.
+
+    Parámetros:
+    - urls (list): URLs limpias de los videos.
+
+    Retorna:
+    - tuple: (nuevas, ya_procesadas).
+    """
+    if not urls:
+        return [], []
+    existentes = {
+        url for (url,) in db.session.query(Video.url_video).filter(Video.url_video.in_(urls)).all()
+    }
+    nuevas = [url for url in urls if url not in existentes]
+    return nuevas, [url for url in urls if url in existentes]
+
+def enviar_lote(cola_trabajos, entradas, prioridad=0):
+    """
+    Expande, filtra y encola un lote de videos como un único batch.
+
+    Parámetros:
+    - cola_trabajos (ColaTrabajos): Cola en la que se registran los trabajos.
+    - entradas (list): URLs de videos, playlists o canales.
+    - prioridad (int): Prioridad de los trabajos del lote.
+
+    Retorna:
+    - dict: Resumen del lote (batch_id, total de videos, encolados, ya procesados, en curso e inválidos).
+    """
+    batch_id = str(uuid4())
+    urls, invalidas = expandir_entradas(entradas)
+    nuevas, ya_procesadas = filtrar_procesados(urls)
+    encolados, en_curso = cola_trabajos.encolar_lote(nuevas, batch_id, prioridad)
+    logger.info(f"Lote {batch_id}: {len(urls)} videos, {encolados} encolados, "
+                f"{len(ya_procesadas)} ya procesados, {len(en_curso)} en curso.")
+    return {
+        'batch_id': batch_id,
+        'total': len(urls),
+        'encolados': encolados,
+        'ya_procesados': len(ya_procesadas),
+        'en_curso': len(en_curso),
+        'invalidas': invalidas,
+    }
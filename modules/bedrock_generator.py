@@ -1,15 +1,100 @@
 # modules/bedrock_generator.py
 
-import boto3
+import os
 import json
+import time
+import hashlib
 import logging
+import threading
+import eventlet
 from botocore.exceptions import ClientError, BotoCoreError
+from modules.models import db, GenerationCache
+from modules.aws_clients import obtener_cliente
+from modules.json_incremental import ExtractorCamposJSON
+from modules.metrics import tokens_bedrock, duracion_bedrock, greenlets_activos
+from modules.structured_output import (
+    MAX_CARACTERES_TITULO, SugerenciasInvalidas, parsear_sugerencias
+)
 
-# Inicializar el cliente de runtime de Bedrock
-bedrock_runtime_client = boto3.client('bedrock-runtime', region_name='us-east-1')
+# Cliente de runtime de Bedrock compartido (pool, reintentos adaptativos y límite de tasa)
+bedrock_runtime_client = obtener_cliente('bedrock-runtime')
 
-def generar_sugerencias_claude_optimizado(transcripcion, titulo_actual):
-    user_message =  f"""
+MODEL_ID = "anthropic.claude-3-5-sonnet-20240620-v1:0"
+MAX_TOKENS = 4096
+TEMPERATURE = 0.7
+# Cambiar la versión al modificar INSTRUCCIONES para no reutilizar respuestas del prompt anterior
+PROMPT_VERSION = "2024-10-v1"
+
+class EstadoCachePrompt:
+    """
+    Estado del prompt caching de Bedrock, compartido por los greenlets del proceso.
+
+    El soporte del cliente se comprueba una sola vez al crearlo: el modelo de servicio de
+    botocore debe conocer el bloque `cachePoint`. Los modelos que rechazan el prefijo
+    cacheable se desactivan uno a uno, sin afectar al resto.
+    """
+
+    def __init__(self, cliente, habilitado):
+        self._lock = threading.Lock()
+        self._sin_soporte = set()
+        self.cliente_admite = habilitado and self._cliente_admite(cliente)
+        if habilitado and not self.cliente_admite:
+            logging.warning("La versión de botocore no admite cachePoint en Converse; prompt caching desactivado.")
+
+    @staticmethod
+    def _cliente_admite(cliente):
+        try:
+            bloque = cliente.meta.service_model.shape_for('SystemContentBlock')
+        except Exception:
+            return False
+        return 'cachePoint' in bloque.members
+
+    def activo(self, model_id):
+        """
+        Indica si las llamadas a `model_id` deben llevar el prefijo cacheable.
+        """
+        with self._lock:
+            return self.cliente_admite and model_id not in self._sin_soporte
+
+    def desactivar(self, model_id):
+        """
+        Marca `model_id` como sin soporte de prompt caching.
+        """
+        with self._lock:
+            self._sin_soporte.add(model_id)
+
+# Prompt caching de Bedrock: las instrucciones fijas se envían como prefijo cacheable
+cache_prompt = EstadoCachePrompt(
+    bedrock_runtime_client,
+    os.getenv('BEDROCK_PROMPT_CACHE', 'true').lower() in ('1', 'true', 'si', 'sí', 'yes'),
+)
+
+# Modo de transcripción larga: por encima del umbral se resume por fragmentos antes de generar
+UMBRAL_TOKENS_LARGO = int(os.getenv('BEDROCK_UMBRAL_TOKENS_LARGO', '30000'))
+TOKENS_POR_FRAGMENTO = int(os.getenv('BEDROCK_TOKENS_POR_FRAGMENTO', '8000'))
+CONCURRENCIA_FRAGMENTOS = int(os.getenv('BEDROCK_CONCURRENCIA_FRAGMENTOS', '4'))
+MAX_TOKENS_RESUMEN_FRAGMENTO = 1024
+
+INSTRUCCIONES_FRAGMENTO = """
+Recibirás un fragmento de la transcripción de un video de YouTube en español. Resume el fragmento en
+español en un máximo de 250 palabras, conservando los personajes, sus relaciones, el conflicto, los
+giros de la trama y el desenlace si aparece. No agregues información que no esté en el fragmento.
+Responde solo con el resumen.
+"""
+
+# Reparaciones de la respuesta cuando no cumple el esquema
+MAX_REPARACIONES = int(os.getenv('BEDROCK_MAX_REPARACIONES', '2'))
+
+INSTRUCCIONES_REPARACION = f"""
+Recibirás una respuesta que debía ser un objeto JSON con exactamente estas cuatro claves de texto:
+"Título Opción 1", "Título Opción 2", "Título Opción 3" y "Resumen". Cada título debe tener como
+máximo {MAX_CARACTERES_TITULO} caracteres. Corrige la respuesta según los problemas indicados,
+conservando su contenido tanto como sea posible, y responde únicamente con el objeto JSON, sin
+texto adicional ni bloques de código.
+"""
+
+# Parte fija del prompt (instrucciones y ejemplos), idéntica en todas las llamadas
+INSTRUCCIONES = """
 Tu tarea es crear tres títulos para un video de YouTube en español, dirigidos a un público latinoamericano (México, Colombia, Perú, etc.), basados en la transcripción y el título actual que te proporciono. Los títulos deben cumplir con las políticas de YouTube y ser atractivos para captar la atención del espectador.
 
 1. **Título 1 (Estructura de éxito)**: El primer título debe seguir la **estructura** de los títulos exitosos proporcionados, manteniendo la idea central del video, pero con un formato similar a los siguientes ejemplos:
@@ -84,39 +169,272 @@ Tu tarea es crear tres títulos para un video de YouTube en español, dirigidos
 
 4. **Resumen**: También proporciona un resumen **detallado** y **atractivo** para el video, que intrigue al espectador sin revelar demasiado de la trama, pero que lo invite a ver el contenido completo. Este resumen debe generar suspense y estar alineado con las políticas de las plataformas. Evita el uso de clickbait o contenido engañoso.
 
-**Título Actual del Video:** {titulo_actual}
-**Transcripción del Video:** {transcripcion}
-
 Proporciona lo siguiente en formato JSON:
 - "Título Opción 1": Un título alineado con la estructura de los ejemplos proporcionados, pero manteniendo la idea central del título actual.
 - "Título Opción 2": Un título intrigante que no revele demasiado pero que evoque emociones fuertes.
 - "Título Opción 3": Un título muy creativo, optimizado para YouTube, cumpliendo con las políticas, breve.
 - "Resumen": Un resumen intrigante, detallado, y atractivo que invite a los espectadores a ver el video completo.
 """
-    # Crear el payload para la solicitud
-    
-    conversation = [
-        {
-            "role": "user",
-            "content": [{"text": user_message}]
-        }
-    ]
-
-    response = bedrock_runtime_client.converse(
-        modelId="anthropic.claude-3-5-sonnet-20240620-v1:0",
-        messages=conversation,
-        inferenceConfig={
-            "maxTokens": 4096,
-            "temperature": 0.7
-        }
-    )
-
-    response_text = response["output"]["message"]["content"][0]["text"]
-
-    # Validar si la respuesta es JSON
+
+def clave_cache(transcripcion, titulo_actual):
+    """
+    Calcula la clave de la caché de respuestas.
+
+    Retorna:
+    - str: SHA-256 de (transcripción, título actual, versión del prompt, modelo, temperatura).
+    """
+    material = json.dumps([transcripcion, titulo_actual, PROMPT_VERSION, MODEL_ID, TEMPERATURE], ensure_ascii=False)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+def invocar_modelo(user_message, instrucciones=INSTRUCCIONES, max_tokens=MAX_TOKENS, temperature=TEMPERATURE, cachear_prefijo=True, al_texto=None, metricas=None):
+    """
+    Llama a Bedrock con las instrucciones fijas como prompt de sistema.
+
+    Si el prompt caching está activo, el prompt de sistema termina en un `cachePoint` para que
+    Bedrock reutilice el prefijo entre llamadas. Si Bedrock rechaza la llamada por validación,
+    se repite sin el `cachePoint`; solo si esa repetición funciona se desactiva el caching
+    para el modelo.
+
+    Parámetros:
+    - user_message (str): Parte variable del prompt.
+    - instrucciones (str): Prompt de sistema.
+    - max_tokens (int): Máximo de tokens de salida.
+    - temperature (float): Temperatura de muestreo.
+    - cachear_prefijo (bool): Si se marca el prompt de sistema como prefijo cacheable.
+    - al_texto (callable): Si se indica, la respuesta se pide con `converse_stream` y la función
+      recibe cada fragmento de texto en cuanto llega.
+    - metricas (dict): Si se indica, se le suman los tokens consumidos ('input_tokens',
+      'output_tokens', 'cache_read_tokens').
+
+    Retorna:
+    - str: Texto completo de la respuesta del modelo.
+    """
+    usar_cache_prefijo = cachear_prefijo and cache_prompt.activo(MODEL_ID)
+    system = [{"text": instrucciones}]
+    if usar_cache_prefijo:
+        system.append({"cachePoint": {"type": "default"}})
+    parametros = {
+        'modelId': MODEL_ID,
+        'system': system,
+        'messages': [{"role": "user", "content": [{"text": user_message}]}],
+        'inferenceConfig': {
+            "maxTokens": max_tokens,
+            "temperature": temperature
+        },
+    }
+
+    inicio = time.monotonic()
     try:
-        sugerencias = json.loads(response_text)
-        formatted_sugerencias = json.dumps(sugerencias, indent=4, ensure_ascii=False)
-        return formatted_sugerencias
-    except json.JSONDecodeError:
-        return response_text
\ No newline at end of file
+        if al_texto is None:
+            response = bedrock_runtime_client.converse(**parametros)
+            response_text = response["output"]["message"]["content"][0]["text"]
+            uso = response.get('usage', {})
+        else:
+            response = bedrock_runtime_client.converse_stream(**parametros)
+            partes = []
+            uso = {}
+            for evento in response['stream']:
+                if 'contentBlockDelta' in evento:
+                    texto = evento['contentBlockDelta']['delta'].get('text', '')
+                    if texto:
+                        partes.append(texto)
+                        al_texto(texto)
+                elif 'metadata' in evento:
+                    uso = evento['metadata'].get('usage', {})
+            response_text = ''.join(partes)
+    except ClientError as e:
+        if not usar_cache_prefijo or e.response['Error']['Code'] != 'ValidationException':
+            raise
+        # Se confirma repitiendo sin cachePoint: si esa llamada también falla, el error no era
+        # del prompt caching y se propaga sin desactivarlo
+        response_text = invocar_modelo(user_message, instrucciones, max_tokens, temperature,
+                                       False, al_texto, metricas)
+        logging.warning(f"El modelo {MODEL_ID} no admite prompt caching, se desactiva: {e}")
+        cache_prompt.desactivar(MODEL_ID)
+        return response_text
+
+    duracion_bedrock.observar(time.monotonic() - inicio, modo='completo' if al_texto is None else 'stream')
+    for tipo, campo in (('entrada', 'inputTokens'), ('salida', 'outputTokens'), ('cache', 'cacheReadInputTokens')):
+        tokens_bedrock.inc(uso.get(campo) or 0, tipo=tipo)
+    logging.info(f"Bedrock: {uso.get('inputTokens')} tokens de entrada "
+                 f"({uso.get('cacheReadInputTokens', 0)} desde caché), {uso.get('outputTokens')} de salida.")
+    if metricas is not None:
+        for clave, campo in (('input_tokens', 'inputTokens'), ('output_tokens', 'outputTokens'),
+                             ('cache_read_tokens', 'cacheReadInputTokens')):
+            metricas[clave] = metricas.get(clave, 0) + (uso.get(campo) or 0)
+    return response_text
+
+def estimar_tokens(texto):
+    """
+    Estima los tokens de un texto en español (aproximadamente 4 caracteres por token).
+    """
+    return len(texto) // 4
+
+def dividir_en_fragmentos(texto, max_tokens=TOKENS_POR_FRAGMENTO):
+    """
+    Divide un texto en fragmentos de como máximo `max_tokens` tokens estimados, sin cortar palabras.
+
+    La transcripción limpia no conserva puntuación, por lo que se corta por palabras.
+
+    Parámetros:
+    - texto (str): Texto a dividir.
+    - max_tokens (int): Tokens estimados por fragmento.
+
+    Retorna:
+    - list: Fragmentos de texto en orden.
+    """
+    max_caracteres = max_tokens * 4
+    fragmentos = []
+    actual = []
+    longitud = 0
+    for palabra in texto.split():
+        if actual and longitud + len(palabra) + 1 > max_caracteres:
+            fragmentos.append(' '.join(actual))
+            actual, longitud = [], 0
+        actual.append(palabra)
+        longitud += len(palabra) + 1
+    if actual:
+        fragmentos.append(' '.join(actual))
+    return fragmentos
+
+def condensar_transcripcion(transcripcion, max_tokens=TOKENS_POR_FRAGMENTO, concurrencia=CONCURRENCIA_FRAGMENTOS, metricas=None):
+    """
+    Resume una transcripción larga por fragmentos en paralelo (fase map) y une los resúmenes
+    en orden para la generación final (fase reduce).
+
+    Parámetros:
+    - transcripcion (str): Transcripción limpia del video.
+    - max_tokens (int): Tokens estimados por fragmento.
+    - concurrencia (int): Fragmentos resumidos a la vez.
+    - metricas (dict): Acumulador de tokens, como en `invocar_modelo`.
+
+    Retorna:
+    - str: Resúmenes de los fragmentos, numerados en orden.
+    """
+    fragmentos = dividir_en_fragmentos(transcripcion, max_tokens)
+    total = len(fragmentos)
+    logging.info(f"Transcripción larga: {estimar_tokens(transcripcion)} tokens estimados en {total} fragmentos.")
+
+    def resumir(indice_fragmento):
+        indice, fragmento = indice_fragmento
+        greenlets_activos.inc(origen='fragmentos')
+        try:
+            return invocar_modelo(
+                f"**Fragmento {indice} de {total}:** {fragmento}",
+                instrucciones=INSTRUCCIONES_FRAGMENTO,
+                max_tokens=MAX_TOKENS_RESUMEN_FRAGMENTO,
+                temperature=0.2,
+                cachear_prefijo=False,
+                metricas=metricas
+            )
+        finally:
+            greenlets_activos.dec(origen='fragmentos')
+
+    pool = eventlet.GreenPool(max(1, concurrencia))
+    resumenes = list(pool.imap(resumir, enumerate(fragmentos, start=1)))
+    return '\n\n'.join(f"Parte {indice}/{total}: {resumen.strip()}" for indice, resumen in enumerate(resumenes, start=1))
+
+def reparar_respuesta(response_text, error, metricas=None):
+    """
+    Pide al modelo que corrija una respuesta que no cumple el esquema, sin repetir la transcripción.
+
+    Parámetros:
+    - response_text (str): Respuesta inválida.
+    - error (SugerenciasInvalidas): Problemas encontrados al validarla.
+    - metricas (dict): Acumulador de tokens, como en `invocar_modelo`.
+
+    Retorna:
+    - str: Nueva respuesta del modelo.
+    """
+    user_message = f"""
+**Problemas encontrados:** {error}
+**Respuesta a corregir:**
+{response_text}
+"""
+    return invocar_modelo(user_message, instrucciones=INSTRUCCIONES_REPARACION, temperature=0.0, cachear_prefijo=False,
+                          metricas=metricas)
+
+def generar_sugerencias_claude_optimizado(transcripcion, titulo_actual, usar_cache=True, al_avanzar=None, metricas=None):
+    """
+    Genera tres títulos y un resumen para el video a partir de su transcripción.
+
+    La respuesta se valida contra el esquema de `modules.structured_output`; si no lo cumple
+    (prosa alrededor del JSON, campos faltantes, títulos demasiado largos) se pide al modelo que
+    la corrija, hasta `MAX_REPARACIONES` veces, sin repetir el resto del pipeline.
+    Las respuestas válidas se guardan en la tabla `generation_cache`, así que repetir la
+    generación con la misma transcripción, título, versión de prompt, modelo y temperatura no
+    llama al modelo. Si la transcripción supera `UMBRAL_TOKENS_LARGO` se resume antes por
+    fragmentos en paralelo (`condensar_transcripcion`).
+
+    Parámetros:
+    - transcripcion (str): Transcripción limpia del video.
+    - titulo_actual (str): Título actual del video.
+    - usar_cache (bool): Si es False, siempre se llama al modelo (la respuesta igual se guarda).
+    - al_avanzar (callable): Si se indica, la respuesta se genera en streaming y la función recibe
+      (campo, valor, completo) cada vez que un campo del JSON avanza o se completa.
+    - metricas (dict): Si se indica, recibe los tokens consumidos, 'latency_ms' (tiempo total en
+      Bedrock) y 'cached' (si la respuesta salió de la caché).
+
+    Retorna:
+    - Sugerencias: Títulos y resumen validados.
+
+    Lanza:
+    - SugerenciasInvalidas: Si la respuesta sigue sin cumplir el esquema tras las reparaciones.
+    """
+    metricas = {} if metricas is None else metricas
+    metricas['cached'] = False
+    clave = clave_cache(transcripcion, titulo_actual)
+    if usar_cache:
+        en_cache = db.session.get(GenerationCache, clave)
+        if en_cache is not None:
+            try:
+                sugerencias = parsear_sugerencias(en_cache.response)
+                logging.info(f"Respuesta de Bedrock encontrada en caché: {clave}")
+                metricas.update(cached=True, latency_ms=0)
+                return sugerencias
+            except SugerenciasInvalidas:
+                logging.warning(f"Respuesta en caché inválida, se genera de nuevo: {clave}")
+
+    inicio = time.monotonic()
+    if estimar_tokens(transcripcion) > UMBRAL_TOKENS_LARGO:
+        user_message = f"""
+**Título Actual del Video:** {titulo_actual}
+**Resumen por partes de la Transcripción del Video (video largo):**
+{condensar_transcripcion(transcripcion, metricas=metricas)}
+"""
+    else:
+        user_message = f"""
+**Título Actual del Video:** {titulo_actual}
+**Transcripción del Video:** {transcripcion}
+"""
+    al_texto = None
+    if al_avanzar is not None:
+        extractor = ExtractorCamposJSON()
+
+        def al_texto(texto):
+            for campo, valor, completo in extractor.alimentar(texto):
+                al_avanzar(campo, valor, completo)
+
+    response_text = invocar_modelo(user_message, al_texto=al_texto, metricas=metricas)
+    for intento in range(MAX_REPARACIONES + 1):
+        try:
+            sugerencias = parsear_sugerencias(response_text)
+            break
+        except SugerenciasInvalidas as e:
+            if intento == MAX_REPARACIONES:
+                logging.error(f"La respuesta de Bedrock no cumple el esquema tras {MAX_REPARACIONES} reparaciones: {e}")
+                raise
+            logging.warning(f"Respuesta de Bedrock inválida ({e}); solicitando reparación {intento + 1}.")
+            response_text = reparar_respuesta(response_text, e, metricas)
+
+    metricas['latency_ms'] = round((time.monotonic() - inicio) * 1000)
+
+    # Solo se guardan respuestas válidas, ya normalizadas
+    db.session.merge(GenerationCache(
+        key=clave,
+        model_id=MODEL_ID,
+        prompt_version=PROMPT_VERSION,
+        response=sugerencias.a_json()
+    ))
+    db.session.commit()
+    return sugerencias
@@ -0,0 +1,136 @@
+# modules/captions.py
+
+import re
+import json
+import html
+import xml.etree.ElementTree as ET
+
+# Anotaciones de sonido de los subtítulos automáticos: [Música], [Aplausos], [Risas]...
+PATRON_ANOTACION = re.compile(r'\[[^\]]*\]')
+PATRON_ETIQUETA = re.compile(r'<[^>]+>')
+PATRON_TIEMPO_VTT = re.compile(r'(?:(\d+):)?(\d{2}):(\d{2})[.,](\d{3})\s+-->\s+(?:(\d+):)?(\d{2}):(\d{2})[.,](\d{3})')
+
+class SubtitulosInvalidos(Exception):
+    """
+    El archivo de subtítulos no se puede interpretar en el formato indicado.
+    """
+
+def _segundos(horas, minutos, segundos, milisegundos):
+    return int(horas or 0) * 3600 + int(minutos) * 60 + int(segundos) + int(milisegundos) / 1000
+
+def parsear_vtt(contenido):
+    """
+    Interpreta un archivo WebVTT.
+
+    Parámetros:
+    - contenido (str): Texto del archivo.
+
+    Retorna:
+    - list: Segmentos (inicio, fin, texto) en segundos.
+    """
+    if not contenido.lstrip('\ufeff').startswith('WEBVTT'):
+        raise SubtitulosInvalidos("El archivo no comienza con 'WEBVTT'.")
+    segmentos = []
+    for bloque in re.split(r'\n\s*\n', contenido.replace('\r\n', '\n')):
+        lineas = bloque.strip().split('\n')
+        for indice, linea in enumerate(lineas):
+            tiempo = PATRON_TIEMPO_VTT.search(linea)
+            if tiempo:
+                inicio = _segundos(*tiempo.groups()[:4])
+                fin = _segundos(*tiempo.groups()[4:])
+                texto = '\n'.join(lineas[indice + 1:])
+                segmentos.append((inicio, fin, html.unescape(PATRON_ETIQUETA.sub('', texto))))
+                break
+    return segmentos
+
+def parsear_srv3(contenido):
+    """
+    Interpreta el formato XML 'srv3' de YouTube (<p t="ms" d="ms">, con palabras en <s>).
+
+    Retorna:
+    - list: Segmentos (inicio, fin, texto) en segundos.
+    """
+    try:
+        raiz = ET.fromstring(contenido)
+    except ET.ParseError as e:
+        raise SubtitulosInvalidos(f"XML de subtítulos inválido: {e}") from e
+    segmentos = []
+    for parrafo in raiz.iter('p'):
+        texto = ''.join(parrafo.itertext())
+        if not texto.strip():
+            continue
+        inicio = int(parrafo.get('t', 0)) / 1000
+        segmentos.append((inicio, inicio + int(parrafo.get('d', 0)) / 1000, texto))
+    return segmentos
+
+def parsear_json3(contenido):
+    """
+    Interpreta el formato 'json3' de YouTube (eventos con fragmentos 'segs').
+
+    Retorna:
+    - list: Segmentos (inicio, fin, texto) en segundos.
+    """
+    try:
+        eventos = json.loads(contenido).get('events', [])
+    except (ValueError, AttributeError) as e:
+        raise SubtitulosInvalidos(f"JSON de subtítulos inválido: {e}") from e
+    segmentos = []
+    for evento in eventos:
+        texto = ''.join(fragmento.get('utf8', '') for fragmento in evento.get('segs') or [])
+        if not texto.strip():
+            continue
+        inicio = evento.get('tStartMs', 0) / 1000
+        segmentos.append((inicio, inicio + evento.get('dDurationMs', 0) / 1000, texto))
+    return segmentos
+
+# Formatos admitidos, en orden de preferencia (json3 y srv3 no repiten líneas como el VTT automático)
+PARSERS = {
+    'json3': parsear_json3,
+    'srv3': parsear_srv3,
+    'vtt': parsear_vtt,
+}
+
+def unir_segmentos(segmentos):
+    """
+    Une los segmentos en texto plano, sin anotaciones de sonido y sin las líneas repetidas
+    de los subtítulos automáticos (cada cue repite la línea anterior mientras se desplaza).
+
+    Parámetros:
+    - segmentos (list): Segmentos (inicio, fin, texto).
+
+    Retorna:
+    - str: Texto de los subtítulos.
+    """
+    lineas = []
+    for _, _, texto in segmentos:
+        for linea in texto.split('\n'):
+            linea = ' '.join(PATRON_ANOTACION.sub(' ', linea).split())
+            if linea and (not lineas or linea != lineas[-1]):
+                lineas.append(linea)
+    return ' '.join(lineas)
+
+def evaluar_subtitulos(segmentos, texto, duracion, min_palabras_minuto, min_cobertura):
+    """
+    Decide si los subtítulos son suficientes para reemplazar a la transcripción.
+
+    Parámetros:
+    - segmentos (list): Segmentos (inicio, fin, texto).
+    - texto (str): Texto unido con `unir_segmentos`.
+    - duracion (float): Duración del video en segundos, si se conoce.
+    - min_palabras_minuto (float): Densidad mínima de palabras por minuto de video.
+    - min_cobertura (float): Fracción mínima del video que deben abarcar los subtítulos.
+
+    Retorna:
+    - str: Motivo por el que se descartan ('vacios', 'cobertura', 'densidad').
+    - None: Si son suficientes.
+    """
+    palabras = len(texto.split())
+    if not palabras:
+        return 'vacios'
+    if duracion:
+        fin = max(fin for _, fin, _ in segmentos)
+        if fin / duracion < min_cobertura:
+            return 'cobertura'
+        if palabras / (duracion / 60) < min_palabras_minuto:
+            return 'densidad'
+    return None
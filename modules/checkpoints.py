@@ -0,0 +1,116 @@
+# modules/checkpoints.py
+
+import os
+import json
+import logging
+from modules.models import db, VideoCheckpoint
+from modules.audio_cache import cache_audio
+from modules.structured_output import SugerenciasInvalidas, validar_sugerencias
+
+logger = logging.getLogger(__name__)
+
+# Etapa con la que termina un video; al completarla el checkpoint ya no hace falta
+ETAPA_FINAL = 'persistencia'
+
+def restaurar_checkpoint(contexto):
+    """
+    Carga en el contexto lo que un intento anterior ya dejó hecho para el video.
+
+    Parámetros:
+    - contexto (dict): Estado del video ('url_video' como mínimo); se actualiza en el lugar.
+
+    Retorna:
+    - str: Nombre de la primera etapa incompleta, desde la que debe continuar el video.
+    """
+    checkpoint = db.session.get(VideoCheckpoint, contexto['url_video'])
+    if checkpoint is None:
+        return 'descarga'
+
+    if checkpoint.video_id:
+        contexto.update(video_id=checkpoint.video_id, titulo_actual=checkpoint.title, duracion=checkpoint.duration)
+    if checkpoint.audio_path:
+        contexto['audio_path'] = checkpoint.audio_path
+    if checkpoint.audio_uri:
+        contexto['audio_uri'] = checkpoint.audio_uri
+    if checkpoint.transcription_job:
+        contexto.update(job_name=checkpoint.transcription_job, idioma=checkpoint.language)
+    if checkpoint.transcription is not None:
+        contexto.update(transcripcion=checkpoint.transcription_raw, transcripcion_limpia=checkpoint.transcription)
+    if checkpoint.suggestions:
+        try:
+            contexto['sugerencias'] = validar_sugerencias(json.loads(checkpoint.suggestions))
+        except (ValueError, SugerenciasInvalidas):
+            logger.warning(f"Sugerencias guardadas inválidas para {contexto['url_video']}; se generarán de nuevo.")
+
+    etapa = primera_etapa_pendiente(contexto)
+    if etapa != 'descarga':
+        logger.info(f"Reanudando {contexto['url_video']} desde la etapa '{etapa}' (última completada: '{checkpoint.stage}').")
+    return etapa
+
+def primera_etapa_pendiente(contexto):
+    """
+    Determina la primera etapa cuyos resultados faltan en el contexto.
+
+    Parámetros:
+    - contexto (dict): Estado del video.
+
+    Retorna:
+    - str: Nombre de la etapa.
+    """
+    if not contexto.get('video_id'):
+        return 'descarga'
+    if contexto.get('transcripcion_limpia') is not None:
+        return ETAPA_FINAL if contexto.get('sugerencias') is not None else 'generacion'
+    if contexto.get('audio_uri'):
+        return 'transcripcion'
+    # El audio local puede haber salido de la caché desde el intento anterior; la versión
+    # preparada no se guarda, se vuelve a generar (o se reutiliza si sigue en disco)
+    if contexto.get('audio_path') and os.path.exists(contexto['audio_path']):
+        return 'preparacion'
+    return 'descarga'
+
+def guardar_checkpoint(contexto, etapa):
+    """
+    Persiste los resultados de una etapa completada. Al completar la última etapa el
+    checkpoint se elimina, porque el video ya está en la tabla `videos`.
+
+    Parámetros:
+    - contexto (dict): Estado del video tras la etapa.
+    - etapa (str): Nombre de la etapa completada.
+    """
+    url_video = contexto['url_video']
+    checkpoint = db.session.get(VideoCheckpoint, url_video)
+    if etapa == ETAPA_FINAL:
+        if checkpoint is not None:
+            db.session.delete(checkpoint)
+            db.session.commit()
+        return
+
+    if checkpoint is None:
+        checkpoint = VideoCheckpoint(url_video=url_video)
+        db.session.add(checkpoint)
+    checkpoint.stage = etapa
+    checkpoint.video_id = contexto.get('video_id')
+    checkpoint.title = contexto.get('titulo_actual')
+    checkpoint.duration = contexto.get('duracion')
+    if contexto.get('audio_path') and contexto['audio_path'] != checkpoint.audio_path:
+        checkpoint.audio_path = contexto['audio_path']
+        entrada = cache_audio.obtener(checkpoint.video_id) if checkpoint.video_id else None
+        checkpoint.audio_sha256 = entrada.get('sha256') if entrada else None
+    checkpoint.audio_uri = contexto.get('audio_uri')
+    checkpoint.transcription_job = contexto.get('job_name')
+    checkpoint.language = contexto.get('idioma')
+    checkpoint.transcription_raw = contexto.get('transcripcion')
+    checkpoint.transcription = contexto.get('transcripcion_limpia')
+    sugerencias = contexto.get('sugerencias')
+    checkpoint.suggestions = sugerencias.a_json() if sugerencias is not None else None
+    db.session.commit()
+
+def etapa_completada(url_video):
+    """
+    Retorna:
+    - str: Última etapa completada del video.
+    - None: Si el video no tiene checkpoint.
+    """
+    checkpoint = db.session.get(VideoCheckpoint, url_video)
+    return checkpoint.stage if checkpoint else None
@@ -0,0 +1,348 @@
+# modules/job_queue.py
+
+import os
+import logging
+import threading
+from uuid import uuid4
+from flask_socketio import SocketIO
+from modules.models import db, Job
+from modules.pipeline import Pipeline
+from modules.singleflight import RegistroEnVuelo
+from modules.checkpoints import restaurar_checkpoint, guardar_checkpoint, etapa_completada
+from modules.metrics import profundidad_etapa, trabajos_pendientes, greenlets_activos
+
+logger = logging.getLogger(__name__)
+
+class ColaTrabajos:
+    """
+    Cola de trabajos persistente que alimenta el pipeline por etapas.
+
+    Los trabajos se guardan en la tabla `jobs`, por lo que sobreviven a un reinicio del
+    proceso: al iniciar, los trabajos que quedaron 'running' vuelven a 'pending'. Un
+    despachador toma el trabajo pendiente de mayor prioridad (y más antiguo) y lo entrega
+    al `Pipeline` cuando la cola de su etapa tiene lugar, así que un trabajo 'running' siempre
+    está dentro del pipeline y las colas acotadas frenan el despacho cuando van saturadas.
+    Las solicitudes repetidas para una URL en proceso se adjuntan al trabajo existente
+    (`en_vuelo`). Cada etapa completada queda guardada (`modules.checkpoints`), así que un
+    trabajo reanudado o reintentado continúa desde su primera etapa incompleta.
+    """
+
+    def __init__(self, app, socketio: SocketIO, max_intentos=None, intervalo_sondeo=2.0, registro_local=True):
+        """
+        Parámetros:
+        - app (Flask): Aplicación Flask, necesaria para el contexto de base de datos.
+        - socketio (SocketIO): Instancia de SocketIO para emitir eventos.
+        - max_intentos (int): Veces que se reanuda un trabajo interrumpido antes de marcarlo como fallido.
+        - intervalo_sondeo (float): Segundos que espera el despachador ocioso antes de volver a consultar la tabla.
+          Es también la demora con la que un worker separado ve los trabajos encolados por los procesos web.
+        - registro_local (bool): Si los trabajos en vuelo se recuerdan en memoria; False cuando varios
+          procesos comparten la tabla `jobs` (ver `RegistroEnVuelo`).
+        """
+        self.app = app
+        self.socketio = socketio
+        self.max_intentos = max_intentos or int(os.getenv('MAX_INTENTOS', '3'))
+        self.intervalo_sondeo = intervalo_sondeo
+        self.pipeline = Pipeline(app, socketio, al_terminar=self._finalizar, al_completar_etapa=guardar_checkpoint)
+        self.en_vuelo = RegistroEnVuelo(local=registro_local)
+        self._aviso = threading.Event()
+        self._iniciada = False
+        # Los medidores de cola se calculan al consultar /metrics
+        profundidad_etapa.funcion = lambda: {(nombre,): profundidad for nombre, profundidad
+                                             in self.pipeline.profundidades().items()}
+        trabajos_pendientes.funcion = self._contar_pendientes
+
+    def iniciar(self):
+        """
+        Reanuda los trabajos interrumpidos y lanza el pipeline y el despachador en segundo plano.
+        """
+        if self._iniciada:
+            return
+        self._iniciada = True
+        with self.app.app_context():
+            self._reanudar_interrumpidos()
+        self.pipeline.iniciar()
+        self.socketio.start_background_task(self._despachador)
+        logger.info("Cola de trabajos iniciada.")
+
+    def encolar(self, url_video, session_id, prioridad=0):
+        """
+        Registra un nuevo trabajo pendiente y despierta a los workers. Si la URL ya tiene un
+        trabajo activo, la sesión se adjunta a él en lugar de crear otro.
+
+        Parámetros:
+        - url_video (str): URL limpia del video.
+        - session_id (str): Sala de SocketIO de la solicitud.
+        - prioridad (int): Prioridad del trabajo; los valores mayores se procesan antes.
+
+        Retorna:
+        - tuple: (sala, es_nuevo), donde `sala` es la sala que emite los eventos del trabajo.
+        """
+        def crear_trabajo():
+            job = Job(url_video=url_video, session_id=session_id, priority=prioridad, status=Job.STATUS_PENDING)
+            db.session.add(job)
+            db.session.commit()
+            logger.info(f"Trabajo {job.id} encolado para {url_video} con prioridad {prioridad}.")
+            return job
+
+        sala, es_nuevo = self.en_vuelo.adquirir(url_video, session_id, crear_trabajo)
+        if es_nuevo:
+            self._aviso.set()
+        elif prioridad:
+            # Una solicitud más urgente adelanta el trabajo que aún espera en la cola
+            Job.query.filter(
+                Job.session_id == sala,
+                Job.status == Job.STATUS_PENDING,
+                Job.priority < prioridad
+            ).update({'priority': prioridad}, synchronize_session=False)
+            db.session.commit()
+        return sala, es_nuevo
+
+    def encolar_lote(self, urls, batch_id, prioridad=0):
+        """
+        Registra en una sola transacción los trabajos de un lote. Las URLs que ya tienen un
+        trabajo activo no se duplican.
+
+        Parámetros:
+        - urls (list): URLs limpias de los videos.
+        - batch_id (str): Identificador (y sala de SocketIO) del lote.
+        - prioridad (int): Prioridad de los trabajos del lote.
+
+        Retorna:
+        - tuple: (numero_encolados, urls_en_curso).
+        """
+        def crear_trabajos(libres):
+            jobs = [Job(url_video=url, session_id=str(uuid4()), batch_id=batch_id,
+                        priority=prioridad, status=Job.STATUS_PENDING) for url in libres]
+            db.session.add_all(jobs)
+            db.session.commit()
+            return jobs
+
+        jobs, en_curso = self.en_vuelo.adquirir_varios(urls, crear_trabajos)
+        logger.info(f"Lote {batch_id}: {len(jobs)} trabajos encolados, {len(en_curso)} ya en curso.")
+        if jobs:
+            self._aviso.set()
+        return len(jobs), en_curso
+
+    def reintentar(self, job_id):
+        """
+        Vuelve a encolar un trabajo fallido. El video continúa desde la primera etapa que no
+        se completó en el intento anterior.
+
+        Parámetros:
+        - job_id (int): ID del trabajo.
+
+        Retorna:
+        - tuple: (sala, es_nuevo); si la URL ya tiene otro trabajo activo, `sala` es la de ese trabajo.
+        - None: Si el trabajo no existe.
+
+        Lanza:
+        - ValueError: Si el trabajo no está fallido.
+        """
+        job = db.session.get(Job, job_id)
+        if job is None:
+            return None
+        if job.status != Job.STATUS_FAILED:
+            raise ValueError(f"Solo se pueden reintentar trabajos fallidos (estado actual: {job.status}).")
+
+        def reactivar_trabajo():
+            job.status = Job.STATUS_PENDING
+            job.attempts = 0
+            job.error = None
+            db.session.commit()
+            logger.info(f"Trabajo {job.id} reintentado para {job.url_video}.")
+            return job
+
+        sala, es_nuevo = self.en_vuelo.adquirir(job.url_video, job.session_id, reactivar_trabajo)
+        if es_nuevo:
+            self._aviso.set()
+        return sala, es_nuevo
+
+    def reintentar_lote(self, batch_id):
+        """
+        Vuelve a encolar los trabajos fallidos de un lote.
+
+        Parámetros:
+        - batch_id (str): Identificador del lote.
+
+        Retorna:
+        - int: Número de trabajos reintentados.
+        """
+        fallidos = [job_id for (job_id,) in db.session.query(Job.id).filter(
+            Job.batch_id == batch_id, Job.status == Job.STATUS_FAILED)]
+        reintentados = 0
+        for job_id in fallidos:
+            # Entre la consulta y el reintento otro proceso pudo borrar o reactivar el trabajo
+            try:
+                resultado = self.reintentar(job_id)
+            except ValueError as e:
+                logger.info(f"Trabajo {job_id} del lote {batch_id} no reintentado: {e}")
+                continue
+            if resultado is None:
+                continue
+            _, es_nuevo = resultado
+            reintentados += es_nuevo
+        return reintentados
+
+    def pendientes(self):
+        """
+        Retorna:
+        - int: Número de trabajos en espera.
+        """
+        return Job.query.filter_by(status=Job.STATUS_PENDING).count()
+
+    def _contar_pendientes(self):
+        with self.app.app_context():
+            return self.pendientes()
+
+    def _reanudar_interrumpidos(self):
+        interrumpidos = Job.query.filter_by(status=Job.STATUS_RUNNING).all()
+        for job in interrumpidos:
+            if job.attempts >= self.max_intentos:
+                job.status = Job.STATUS_FAILED
+                job.error = 'Trabajo interrumpido demasiadas veces.'
+            else:
+                job.status = Job.STATUS_PENDING
+        db.session.commit()
+        if interrumpidos:
+            logger.info(f"Reanudando {len(interrumpidos)} trabajos interrumpidos.")
+
+    def _reclamar_siguiente(self):
+        """
+        Toma de forma atómica el siguiente trabajo pendiente.
+
+        Retorna:
+        - Job: Trabajo reclamado.
+        - None: Si no hay trabajos pendientes.
+        """
+        while True:
+            candidato = Job.query.filter_by(status=Job.STATUS_PENDING) \
+                .order_by(Job.priority.desc(), Job.id.asc()).first()
+            if candidato is None:
+                return None
+            # Solo un worker gana la actualización condicionada al estado
+            reclamados = Job.query.filter_by(id=candidato.id, status=Job.STATUS_PENDING).update({
+                'status': Job.STATUS_RUNNING,
+                'attempts': Job.attempts + 1,
+            }, synchronize_session=False)
+            db.session.commit()
+            if reclamados == 1:
+                return db.session.get(Job, candidato.id)
+
+    def _despachador(self):
+        greenlets_activos.inc(origen='despachador')
+        try:
+            self._despachar()
+        finally:
+            greenlets_activos.dec(origen='despachador')
+
+    def _despachar(self):
+        etapa_esperada = None
+        while True:
+            try:
+                # Un trabajo solo pasa a 'running' si entra en el pipeline: se espera a que la
+                # cola de su etapa tenga lugar antes de reclamarlo
+                if not self.pipeline.esperar_espacio(etapa_esperada, timeout=self.intervalo_sondeo):
+                    continue
+                etapa_esperada = None
+                with self.app.app_context():
+                    job = self._reclamar_siguiente()
+                    contexto = None if job is None else {
+                        'job_id': job.id,
+                        'url_video': job.url_video,
+                        'session_id': job.session_id,
+                        'batch_id': job.batch_id,
+                    }
+                    etapa = None if contexto is None else restaurar_checkpoint(contexto)
+                    # Un trabajo reanudado en una etapa intermedia compite por su cola con los
+                    # workers de la etapa anterior: si se llenó, vuelve a 'pending'
+                    if contexto is not None and not self.pipeline.enviar(contexto, etapa, bloquear=False):
+                        self._devolver(contexto['job_id'])
+                        etapa_esperada = etapa
+                        continue
+                if contexto is None:
+                    self._aviso.wait(self.intervalo_sondeo)
+                    self._aviso.clear()
+                    continue
+
+                logger.info(f"Despachado trabajo {contexto['job_id']}: {contexto['url_video']} (etapa '{etapa}')")
+            except Exception as e:
+                logger.error(f"Error en el despachador de la cola: {e}", exc_info=True)
+                self.socketio.sleep(self.intervalo_sondeo)
+
+    def _devolver(self, job_id):
+        """
+        Deshace el reclamo de un trabajo que no pudo entrar en el pipeline.
+        """
+        Job.query.filter_by(id=job_id, status=Job.STATUS_RUNNING).update({
+            'status': Job.STATUS_PENDING,
+            'attempts': Job.attempts - 1,
+        }, synchronize_session=False)
+        db.session.commit()
+
+    def _finalizar(self, contexto, exito):
+        """
+        Marca el trabajo como terminado o fallido al salir del pipeline.
+        """
+        job = db.session.get(Job, contexto['job_id'])
+        job.status = Job.STATUS_DONE if exito else Job.STATUS_FAILED
+        if not exito:
+            job.error = contexto.get('error', 'El procesamiento del video falló.')
+        db.session.commit()
+        self.en_vuelo.liberar(contexto['url_video'])
+        if contexto.get('batch_id'):
+            self.socketio.emit('progreso_lote', estado_lote(contexto['batch_id']), room=contexto['batch_id'])
+
+
+def estado_trabajo(job_id):
+    """
+    Describe el estado de un trabajo y hasta qué etapa llegó su video.
+
+    Parámetros:
+    - job_id (int): ID del trabajo.
+
+    Retorna:
+    - dict: Estado, intentos, último error y última etapa completada.
+    - None: Si el trabajo no existe.
+    """
+    job = db.session.get(Job, job_id)
+    if job is None:
+        return None
+    return {
+        'job_id': job.id,
+        'url_video': job.url_video,
+        'session_id': job.session_id,
+        'batch_id': job.batch_id,
+        'estado': job.status,
+        'intentos': job.attempts,
+        'error': job.error,
+        'etapa_completada': etapa_completada(job.url_video),
+    }
+
+
+def estado_lote(batch_id):
+    """
+    Calcula el progreso agregado de un lote.
+
+    Parámetros:
+    - batch_id (str): Identificador del lote.
+
+    Retorna:
+    - dict: Conteo de trabajos por estado, total y porcentaje terminado.
+    """
+    conteos = dict(
+        db.session.query(Job.status, db.func.count(Job.id))
+        .filter(Job.batch_id == batch_id)
+        .group_by(Job.status)
+        .all()
+    )
+    total = sum(conteos.values())
+    terminados = conteos.get(Job.STATUS_DONE, 0) + conteos.get(Job.STATUS_FAILED, 0)
+    return {
+        'batch_id': batch_id,
+        'total': total,
+        'pendientes': conteos.get(Job.STATUS_PENDING, 0),
+        'en_proceso': conteos.get(Job.STATUS_RUNNING, 0),
+        'completados': conteos.get(Job.STATUS_DONE, 0),
+        'fallidos': conteos.get(Job.STATUS_FAILED, 0),
+        'porcentaje': round(terminados * 100 / total) if total else 100,
+    }
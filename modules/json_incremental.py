@@ -0,0 +1,117 @@
+# modules/json_incremental.py
+
+import re
+import json
+
+# '\\u' con menos de cuatro dígitos hexadecimales al final del texto
+PATRON_UNICODE_INCOMPLETO = re.compile(r'\\u[0-9a-fA-F]{0,3}$')
+
+def _barras_finales(texto):
+    return len(texto) - len(texto.rstrip('\\'))
+
+class ExtractorCamposJSON:
+    """
+    Parser incremental para un objeto JSON plano de valores de texto, como el que devuelve el
+    modelo con los títulos y el resumen.
+
+    Recibe el texto a medida que llega (`alimentar`) y reporta, por cada campo, el valor parcial
+    acumulado y el valor final en cuanto se cierra su cadena. Ignora cualquier texto antes de la
+    primera llave (prosa, bloques ```json) y los valores que no son cadenas.
+    """
+
+    FUERA, ESPERANDO_CLAVE, EN_CLAVE, ESPERANDO_DOS_PUNTOS, ESPERANDO_VALOR, EN_VALOR, EN_OTRO_VALOR, FIN = range(8)
+
+    def __init__(self):
+        self.estado = self.FUERA
+        self.campos = {}
+        self._clave = []
+        self._valor = []
+        self._escape = False
+        self._clave_actual = None
+
+    def alimentar(self, texto):
+        """
+        Procesa un nuevo fragmento de texto.
+
+        Parámetros:
+        - texto (str): Fragmento recibido del modelo.
+
+        Retorna:
+        - list: Tuplas (campo, valor, completo) con los campos que avanzaron en este fragmento.
+        """
+        eventos = {}
+        for caracter in texto:
+            completado = self._procesar(caracter)
+            if completado is not None:
+                eventos[completado[0]] = completado
+        if self.estado == self.EN_VALOR and self._valor:
+            eventos.setdefault(self._clave_actual, (self._clave_actual, self._decodificar(parcial=True), False))
+        return list(eventos.values())
+
+    def _procesar(self, caracter):
+        if self.estado == self.FUERA:
+            if caracter == '{':
+                self.estado = self.ESPERANDO_CLAVE
+        elif self.estado == self.ESPERANDO_CLAVE:
+            if caracter == '"':
+                self._clave = []
+                self.estado = self.EN_CLAVE
+            elif caracter == '}':
+                self.estado = self.FIN
+        elif self.estado == self.EN_CLAVE:
+            if self._escape:
+                self._clave.append(caracter)
+                self._escape = False
+            elif caracter == '\\':
+                self._clave.append(caracter)
+                self._escape = True
+            elif caracter == '"':
+                self._clave_actual = json.loads('"' + ''.join(self._clave) + '"')
+                self.estado = self.ESPERANDO_DOS_PUNTOS
+            else:
+                self._clave.append(caracter)
+        elif self.estado == self.ESPERANDO_DOS_PUNTOS:
+            if caracter == ':':
+                self.estado = self.ESPERANDO_VALOR
+        elif self.estado == self.ESPERANDO_VALOR:
+            if caracter == '"':
+                self._valor = []
+                self.estado = self.EN_VALOR
+            elif not caracter.isspace():
+                self.estado = self.EN_OTRO_VALOR
+        elif self.estado == self.EN_VALOR:
+            if self._escape:
+                self._valor.append(caracter)
+                self._escape = False
+            elif caracter == '\\':
+                self._valor.append(caracter)
+                self._escape = True
+            elif caracter == '"':
+                valor = self._decodificar()
+                self.campos[self._clave_actual] = valor
+                self.estado = self.ESPERANDO_CLAVE
+                return self._clave_actual, valor, True
+            else:
+                self._valor.append(caracter)
+        elif self.estado == self.EN_OTRO_VALOR:
+            if caracter == ',':
+                self.estado = self.ESPERANDO_CLAVE
+            elif caracter == '}':
+                self.estado = self.FIN
+        return None
+
+    def _decodificar(self, parcial=False):
+        crudo = ''.join(self._valor)
+        if parcial:
+            # Quitar un escape incompleto al final (p. ej. '\\' o '\\u00'). Una barra solo
+            # inicia un escape si la precede un número par de barras: '\\\\' es una barra escapada
+            incompleto = PATRON_UNICODE_INCOMPLETO.search(crudo)
+            if incompleto and _barras_finales(crudo[:incompleto.start() + 1]) % 2 == 1:
+                crudo = crudo[:incompleto.start()]
+            elif _barras_finales(crudo) % 2 == 1:
+                crudo = crudo[:-1]
+        try:
+            # strict=False admite saltos de línea sin escapar dentro de las cadenas
+            return json.loads('"' + crudo + '"', strict=False)
+        except ValueError:
+            return crudo
@@ -0,0 +1,49 @@
+# modules/logging_config.py
+
+import os
+import json
+import logging
+
+# Atributos propios de LogRecord; el resto son campos pasados con `extra=`
+_ATRIBUTOS_REGISTRO = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+class FormatoJSON(logging.Formatter):
+    """
+    Escribe cada registro como una línea JSON con la hora, el nivel, el logger, el mensaje y
+    los campos pasados con `extra=` (p. ej. etapa y duración), para procesarlos con otras herramientas.
+    """
+
+    def format(self, record):
+        entrada = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for clave, valor in vars(record).items():
+            if clave not in _ATRIBUTOS_REGISTRO:
+                entrada[clave] = valor
+        if record.exc_info:
+            entrada['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entrada, ensure_ascii=False, default=str)
+
+def configurar_logging():
+    """
+    Configura el logging de la aplicación según el entorno:
+    - LOG_LEVEL: nivel mínimo (por defecto INFO; DEBUG registra cada etapa y cada sondeo).
+    - LOG_FORMAT: 'json' para registros estructurados; cualquier otro valor usa texto plano.
+    - LOG_FILE: archivo de log (por defecto app.log; vacío para escribir solo en la consola).
+    """
+    nivel = getattr(logging, os.getenv('LOG_LEVEL', 'INFO').upper(), logging.INFO)
+    if os.getenv('LOG_FORMAT', 'texto').lower() == 'json':
+        formato = FormatoJSON()
+    else:
+        formato = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+
+    handlers = [logging.StreamHandler()]
+    archivo = os.getenv('LOG_FILE', 'app.log')
+    if archivo:
+        handlers.append(logging.FileHandler(archivo))
+    for handler in handlers:
+        handler.setFormatter(formato)
+    logging.basicConfig(level=nivel, handlers=handlers, force=True)
@@ -0,0 +1,393 @@
+# modules/media_pool.py
+"""
+Procesos auxiliares para yt-dlp y límite de concurrencia para FFmpeg.
+
+La extracción de yt-dlp (JSON de la página, firmas en JavaScript) es trabajo de CPU que,
+dentro de un greenlet, bloquea el hub de eventlet: mientras dura se congelan los heartbeats
+de Socket.IO, los eventos de progreso y todas las peticiones HTTP. `PoolMedia` la ejecuta en
+procesos hijos persistentes (`python -m modules.media_pool`) con los que se comunica por
+tuberías con una línea JSON por petición y por respuesta; el greenlet que espera solo cede
+el control hasta que llega la respuesta. Si la tarea supera su tiempo límite o el greenlet se
+mata, el hijo se mata (con todo su grupo de procesos, incluido el FFmpeg de yt-dlp) y se
+reemplaza. Del info_dict de yt-dlp solo vuelven los campos que lee la aplicación. Las
+descargas, que duran minutos, tienen sus propios cupos para no dejar sin procesos a las
+extracciones cortas (metadatos, subtítulos, listas).
+
+FFmpeg ya corre en su propio proceso y la espera con el `subprocess` de eventlet no bloquea
+el hub; `ejecutar_ffmpeg` le agrega el tiempo límite, lo mata si se cancela el greenlet y
+acota cuántos corren a la vez.
+"""
+
+import os
+import sys
+import json
+import queue
+import select
+import signal
+import atexit
+import time
+import logging
+import threading
+import subprocess
+import eventlet
+import yt_dlp
+from greenlet import GreenletExit
+from modules.metrics import tareas_media, procesos_media_ocupados
+
+logger = logging.getLogger(__name__)
+
+# Procesos hijos para extracciones de yt-dlp (0 = en el mismo proceso, como antes; útil en el benchmark)
+PROCESOS_MEDIA = int(os.getenv('PROCESOS_MEDIA', str(os.cpu_count() or 2)))
+# Procesos hijos adicionales para descargas, que no compiten con las extracciones
+PROCESOS_MEDIA_DESCARGA = int(os.getenv('PROCESOS_MEDIA_DESCARGA', str(max(1, PROCESOS_MEDIA // 2))))
+# Tareas que atiende un hijo antes de reemplazarlo, para acotar la memoria que acumula yt-dlp
+MAX_TAREAS_PROCESO = int(os.getenv('PROCESOS_MEDIA_MAX_TAREAS', '50'))
+# Tiempos límite en segundos
+TIMEOUT_EXTRACCION = float(os.getenv('TIMEOUT_EXTRACCION', '120'))
+TIMEOUT_DESCARGA = float(os.getenv('TIMEOUT_DESCARGA', '1800'))
+TIMEOUT_FFMPEG = float(os.getenv('TIMEOUT_FFMPEG', '1800'))
+RAIZ_PROYECTO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class ErrorMedia(Exception):
+    """
+    Error de una tarea de yt-dlp o FFmpeg ejecutada fuera del greenlet.
+    """
+
+
+class TiempoAgotadoMedia(ErrorMedia):
+    """
+    La tarea superó su tiempo límite; el proceso se mató.
+    """
+
+
+def extraer_info_local(url, opciones, descargar=False):
+    """
+    Ejecuta `YoutubeDL.extract_info` en el proceso actual.
+
+    Parámetros:
+    - url (str): URL del video, playlist o canal.
+    - opciones (dict): Opciones de `yt_dlp.YoutubeDL` (deben poder serializarse en JSON).
+    - descargar (bool): Si además se descarga el contenido.
+
+    Retorna:
+    - dict: Información del video reducida con `proyectar_info`; con `descargar`, '_archivo'
+      es la ruta descargada.
+    """
+    with yt_dlp.YoutubeDL(opciones) as ydl:
+        info_dict = ydl.extract_info(url, download=descargar)
+        if info_dict is None:
+            return None
+        archivo = None
+        if descargar:
+            descargas = info_dict.get('requested_downloads') or [{}]
+            archivo = descargas[0].get('filepath') or ydl.prepare_filename(info_dict)
+        info_dict = proyectar_info(ydl.sanitize_info(info_dict))
+    if archivo:
+        info_dict['_archivo'] = archivo
+    return info_dict
+
+# Campos del info_dict que usa la aplicación (metadatos, stream elegido, subtítulos y listados)
+CAMPOS_INFO = ('id', 'title', 'duration', 'language', 'ext', 'url', 'http_headers',
+               'filesize', 'filesize_approx', 'webpage_url', 'ie_key')
+CAMPOS_FORMATO = ('ext', 'url', 'http_headers', 'filesize', 'filesize_approx')
+
+def proyectar_info(info_dict):
+    """
+    Reduce un info_dict de yt-dlp a los campos que se leen fuera de este módulo, para no
+    serializar ni copiar entre procesos la lista completa de formatos, miniaturas, etc.
+
+    Parámetros:
+    - info_dict (dict): Información sanitizada de yt-dlp.
+
+    Retorna:
+    - dict: Campos de `CAMPOS_INFO`, 'requested_formats', 'subtitles', 'automatic_captions'
+      y 'entries' (proyectadas de la misma forma).
+    """
+    proyectado = {campo: info_dict[campo] for campo in CAMPOS_INFO if info_dict.get(campo) is not None}
+    if info_dict.get('requested_formats'):
+        proyectado['requested_formats'] = [{campo: formato.get(campo) for campo in CAMPOS_FORMATO}
+                                           for formato in info_dict['requested_formats']]
+    for clave in ('subtitles', 'automatic_captions'):
+        if info_dict.get(clave):
+            proyectado[clave] = {idioma: [{'ext': pista.get('ext'), 'url': pista.get('url')} for pista in pistas]
+                                 for idioma, pistas in info_dict[clave].items()}
+    if info_dict.get('entries') is not None:
+        proyectado['entries'] = [proyectar_info(entrada) if entrada else None for entrada in info_dict['entries']]
+    return proyectado
+
+# Tareas que puede ejecutar un proceso hijo
+TAREAS = {
+    'extraer_info': extraer_info_local,
+}
+
+# Excepciones que se vuelven a lanzar con su tipo original en el proceso principal
+EXCEPCIONES = {
+    'DownloadError': yt_dlp.utils.DownloadError,
+}
+
+
+class ProcesoMedia:
+    """
+    Un proceso hijo persistente que atiende las tareas de una en una.
+    """
+
+    def __init__(self):
+        self.tareas_atendidas = 0
+        self._pendiente = bytearray()
+        self.proceso = subprocess.Popen(
+            [sys.executable, '-m', 'modules.media_pool'],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, cwd=RAIZ_PROYECTO,
+            start_new_session=True,
+        )
+
+    def vivo(self):
+        return self.proceso.poll() is None
+
+    def ejecutar(self, tarea, argumentos, timeout):
+        """
+        Envía una tarea y espera su respuesta cediendo el control a los demás greenlets.
+
+        Retorna:
+        - dict: Respuesta del hijo ('resultado', o 'error' y 'tipo').
+
+        Lanza:
+        - TiempoAgotadoMedia: Si no responde antes de `timeout` segundos.
+        - ErrorMedia: Si el proceso termina sin responder.
+        """
+        peticion = json.dumps({'tarea': tarea, 'argumentos': argumentos}, ensure_ascii=False)
+        self.proceso.stdin.write(peticion.encode('utf-8') + b'\n')
+        self.proceso.stdin.flush()
+        self.tareas_atendidas += 1
+
+        # Se lee por bloques hasta completar la línea: con `readline` una respuesta que llega
+        # a medias bloquearía sin respetar el tiempo límite. Con eventlet `select` es
+        # cooperativo: solo este greenlet espera al hijo
+        limite = time.monotonic() + timeout
+        descriptor = self.proceso.stdout.fileno()
+        while b'\n' not in self._pendiente:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                raise TiempoAgotadoMedia(f"La tarea '{tarea}' superó {timeout:.0f} s.")
+            listos, _, _ = select.select([descriptor], [], [], restante)
+            if not listos:
+                continue
+            try:
+                datos = os.read(descriptor, 65536)
+            except BlockingIOError:
+                continue
+            if not datos:
+                raise ErrorMedia(f"El proceso de medios terminó durante la tarea '{tarea}' "
+                                 f"(código {self.proceso.wait()}).")
+            self._pendiente.extend(datos)
+        linea, _, resto = bytes(self._pendiente).partition(b'\n')
+        self._pendiente = bytearray(resto)
+        return json.loads(linea)
+
+    def terminar(self):
+        """
+        Mata el hijo y su grupo de procesos (yt-dlp puede haber lanzado FFmpeg).
+        """
+        if self.vivo():
+            try:
+                os.killpg(self.proceso.pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                self.proceso.kill()
+        self.proceso.wait()
+
+
+class PoolMedia:
+    """
+    Conjunto acotado de procesos hijos para yt-dlp, creados bajo demanda y reutilizados.
+
+    Las extracciones y las descargas tienen cupos separados: una descarga larga ocupa un cupo
+    de descarga y nunca deja esperando a una extracción de unos segundos. Los procesos libres
+    son intercambiables y los toma cualquiera de los dos tipos de tarea.
+    """
+
+    def __init__(self, procesos=None, max_tareas=None, procesos_descarga=None):
+        """
+        Parámetros:
+        - procesos (int): Procesos hijos para extracciones (por defecto PROCESOS_MEDIA); 0 ejecuta
+          todas las tareas en el proceso actual.
+        - max_tareas (int): Tareas por hijo antes de reemplazarlo (por defecto PROCESOS_MEDIA_MAX_TAREAS).
+        - procesos_descarga (int): Procesos hijos para descargas (por defecto PROCESOS_MEDIA_DESCARGA).
+        """
+        self.procesos = PROCESOS_MEDIA if procesos is None else procesos
+        self.procesos_descarga = PROCESOS_MEDIA_DESCARGA if procesos_descarga is None else procesos_descarga
+        self.max_tareas = max_tareas or MAX_TAREAS_PROCESO
+        self._cupos = {
+            'extraccion': threading.BoundedSemaphore(max(1, self.procesos)),
+            'descarga': threading.BoundedSemaphore(max(1, self.procesos_descarga)),
+        }
+        self._libres = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._activos = set()
+
+    def ejecutar(self, tarea, *argumentos, timeout=None, tipo='extraccion'):
+        """
+        Ejecuta una tarea de `TAREAS` en un proceso hijo.
+
+        Parámetros:
+        - tarea (str): Nombre de la tarea.
+        - argumentos: Argumentos de la tarea (deben poder serializarse en JSON).
+        - timeout (float): Segundos máximos de espera (por defecto TIMEOUT_EXTRACCION).
+        - tipo (str): 'extraccion' o 'descarga'; indica de qué cupos toma el proceso.
+
+        Retorna:
+        - El resultado de la tarea.
+
+        Lanza:
+        - La excepción de la tarea (con su tipo original si está en `EXCEPCIONES`, si no `ErrorMedia`).
+        - TiempoAgotadoMedia: Si la tarea no terminó a tiempo.
+
+        Si el greenlet que espera se mata, el proceso hijo se mata con él.
+        """
+        if self.procesos <= 0:
+            try:
+                resultado = TAREAS[tarea](*argumentos)
+            except Exception:
+                tareas_media.inc(tarea=tarea, resultado='error')
+                raise
+            tareas_media.inc(tarea=tarea, resultado='ok')
+            return resultado
+
+        timeout = timeout or TIMEOUT_EXTRACCION
+        with self._cupos[tipo]:
+            proceso = self._tomar()
+            procesos_media_ocupados.inc()
+            try:
+                respuesta = proceso.ejecutar(tarea, list(argumentos), timeout)
+            except BaseException as e:
+                # Timeout, cancelación o greenlet terminado: el hijo queda en un estado desconocido
+                self._descartar(proceso)
+                tareas_media.inc(tarea=tarea, resultado=self._resultado_error(e))
+                raise
+            finally:
+                procesos_media_ocupados.dec()
+            self._devolver(proceso)
+
+        if 'error' in respuesta:
+            tareas_media.inc(tarea=tarea, resultado='error')
+            excepcion = EXCEPCIONES.get(respuesta.get('tipo'), ErrorMedia)
+            raise excepcion(respuesta['error'])
+        tareas_media.inc(tarea=tarea, resultado='ok')
+        return respuesta['resultado']
+
+    def extraer_info(self, url, opciones, descargar=False, timeout=None):
+        """
+        `YoutubeDL.extract_info` en un proceso hijo; ver `extraer_info_local`.
+        """
+        if timeout is None:
+            timeout = TIMEOUT_DESCARGA if descargar else TIMEOUT_EXTRACCION
+        return self.ejecutar('extraer_info', url, opciones, descargar, timeout=timeout,
+                             tipo='descarga' if descargar else 'extraccion')
+
+    def cerrar(self):
+        """
+        Termina todos los procesos hijos.
+        """
+        with self._lock:
+            activos = list(self._activos)
+            self._activos.clear()
+        for proceso in activos:
+            proceso.terminar()
+
+    def _tomar(self):
+        while True:
+            try:
+                proceso = self._libres.get_nowait()
+            except queue.Empty:
+                proceso = ProcesoMedia()
+                with self._lock:
+                    self._activos.add(proceso)
+                logger.debug(f"Proceso de medios iniciado (pid {proceso.proceso.pid}).")
+                return proceso
+            if proceso.vivo():
+                return proceso
+            self._descartar(proceso)
+
+    def _devolver(self, proceso):
+        if proceso.tareas_atendidas >= self.max_tareas:
+            self._descartar(proceso)
+        else:
+            self._libres.put(proceso)
+
+    def _descartar(self, proceso):
+        with self._lock:
+            self._activos.discard(proceso)
+        proceso.terminar()
+
+    @staticmethod
+    def _resultado_error(error):
+        if isinstance(error, TiempoAgotadoMedia):
+            return 'tiempo_agotado'
+        if isinstance(error, GreenletExit):
+            return 'cancelada'
+        return 'error'
+
+
+# FFmpeg simultáneos: tantos como núcleos se dedican a los medios
+_cupos_ffmpeg = threading.BoundedSemaphore(max(1, PROCESOS_MEDIA or os.cpu_count() or 1))
+
+def ejecutar_ffmpeg(comando, timeout=None):
+    """
+    Ejecuta un comando de FFmpeg con tiempo límite, sin superar el número de FFmpeg simultáneos.
+
+    Parámetros:
+    - comando (list): Comando completo ('ffmpeg', ...).
+    - timeout (float): Segundos máximos (por defecto TIMEOUT_FFMPEG).
+
+    Retorna:
+    - subprocess.CompletedProcess: Resultado, con stdout y stderr como texto.
+
+    Lanza:
+    - TiempoAgotadoMedia: Si FFmpeg no terminó a tiempo (el proceso se mata).
+    """
+    timeout = timeout or TIMEOUT_FFMPEG
+    with _cupos_ffmpeg:
+        proceso = subprocess.Popen(comando, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        # Con el `subprocess` de eventlet, `run(timeout=...)` no reconoce su propio TimeoutExpired
+        # y deja vivo el proceso; el tiempo límite se aplica con un Timeout de eventlet
+        try:
+            with eventlet.Timeout(timeout):
+                stdout, stderr = proceso.communicate()
+        except eventlet.Timeout as e:
+            proceso.kill()
+            proceso.wait()
+            tareas_media.inc(tarea='ffmpeg', resultado='tiempo_agotado')
+            raise TiempoAgotadoMedia(f"FFmpeg superó {timeout:.0f} s.") from e
+        except BaseException:
+            # Greenlet cancelado: FFmpeg no debe seguir ocupando un núcleo
+            proceso.kill()
+            proceso.wait()
+            raise
+    tareas_media.inc(tarea='ffmpeg', resultado='ok' if proceso.returncode == 0 else 'error')
+    return subprocess.CompletedProcess(comando, proceso.returncode, stdout, stderr)
+
+pool_media = PoolMedia()
+atexit.register(pool_media.cerrar)
+
+
+def servir():
+    """
+    Bucle del proceso hijo: lee una petición JSON por línea de stdin y escribe la respuesta
+    en una línea de stdout. La salida de yt-dlp se redirige a stderr para no mezclarse con
+    las respuestas. Termina cuando el proceso principal cierra stdin.
+    """
+    canal = os.fdopen(os.dup(sys.stdout.fileno()), 'w', encoding='utf-8')
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    for linea in sys.stdin:
+        if not linea.strip():
+            continue
+        peticion = json.loads(linea)
+        try:
+            respuesta = {'resultado': TAREAS[peticion['tarea']](*peticion['argumentos'])}
+        except Exception as e:
+            respuesta = {'error': str(e), 'tipo': type(e).__name__}
+        canal.write(json.dumps(respuesta, ensure_ascii=False) + '\n')
+        canal.flush()
+
+
+if __name__ == '__main__':
+    servir()
@@ -0,0 +1,111 @@
+# modules/message_queue.py
+
+import os
+import pickle
+import importlib.util
+import queue
+import logging
+import threading
+import socketio
+
+logger = logging.getLogger(__name__)
+
+# URL de la cola de mensajes compartida (redis://, rediss://, kafka://, zmq+tcp://, amqp:// o memory://)
+URL_COLA_MENSAJES = os.getenv('SOCKETIO_MESSAGE_QUEUE', '')
+CANAL_COLA_MENSAJES = os.getenv('SOCKETIO_CHANNEL', 'flask-socketio')
+# 'completo' (web y workers en el mismo proceso), 'web' (solo HTTP y Socket.IO) o 'worker' (solo la cola)
+ROL_PROCESO = os.getenv('ROL_PROCESO', 'completo').lower()
+ROLES = ('completo', 'web', 'worker')
+
+if ROL_PROCESO not in ROLES:
+    raise ValueError(f"ROL_PROCESO debe ser uno de {', '.join(ROLES)} (valor actual: {ROL_PROCESO}).")
+
+# Esquema de la URL -> (gestor de python-socketio, módulo del cliente, paquete en requirements-mq.txt)
+BROKERS = (
+    (('redis://', 'rediss://'), 'RedisManager', 'redis', 'redis'),
+    (('kafka://',), 'KafkaManager', 'kafka', 'kafka-python'),
+    (('zmq',), 'ZmqManager', 'zmq', 'pyzmq'),
+    (('amqp://', 'amqps://', 'sqs://'), 'KombuManager', 'kombu', 'kombu'),
+)
+
+
+class GestorMemoria(socketio.PubSubManager):
+    """
+    Cola de mensajes en memoria para varios servidores Socket.IO de un mismo proceso.
+
+    Sustituye a Redis o RabbitMQ en pruebas y en el benchmark: cada servidor suscrito al canal
+    recibe los mensajes publicados por los demás. Los mensajes se serializan con pickle, como
+    en los gestores reales, para detectar pronto los datos que no se pueden enviar por la cola.
+    """
+    name = 'memoria'
+
+    _suscriptores = {}   # canal -> lista de colas de los servidores suscritos
+    _lock = threading.Lock()
+
+    def __init__(self, url='memory://', channel='flask-socketio', write_only=False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self._buzon = queue.Queue()
+        if not write_only:
+            with self._lock:
+                self._suscriptores.setdefault(channel, []).append(self._buzon)
+
+    def _publish(self, data):
+        mensaje = pickle.dumps(data)
+        with self._lock:
+            buzones = list(self._suscriptores.get(self.channel, []))
+        for buzon in buzones:
+            buzon.put(mensaje)
+
+    def _listen(self):
+        while True:
+            yield self._buzon.get()
+
+
+def crear_gestor_mensajes(url, canal=CANAL_COLA_MENSAJES, write_only=False):
+    """
+    Crea el gestor de clientes de Socket.IO respaldado por una cola de mensajes, para que los
+    eventos emitidos en cualquier proceso lleguen a los clientes conectados a cualquier otro.
+
+    Parámetros:
+    - url (str): URL de la cola; el esquema elige el gestor (memory:// usa `GestorMemoria`).
+    - canal (str): Canal compartido por todos los procesos de la aplicación.
+    - write_only (bool): Si el proceso solo emite (workers) y no atiende clientes.
+
+    Retorna:
+    - socketio.PubSubManager: Gestor de clientes.
+
+    Lanza:
+    - ImportError: Si falta el paquete del broker (ver requirements-mq.txt).
+    """
+    if url.startswith('memory://'):
+        return GestorMemoria(url, channel=canal, write_only=write_only)
+    # Los gestores de python-socketio importan el cliente del broker recién al conectarse;
+    # se comprueba aquí para fallar al arrancar con un mensaje claro
+    gestor, modulo, paquete = next(((gestor, modulo, paquete) for esquemas, gestor, modulo, paquete in BROKERS
+                                    if url.startswith(esquemas)), BROKERS[-1][1:])
+    if importlib.util.find_spec(modulo) is None:
+        raise ImportError(f"SOCKETIO_MESSAGE_QUEUE={url.split('://', 1)[0]}:// requiere el paquete '{paquete}'; "
+                          f"instálalo con `pip install -r requirements-mq.txt`.")
+    return getattr(socketio, gestor)(url, channel=canal, write_only=write_only)
+
+
+def opciones_socketio(url=None, rol=None):
+    """
+    Argumentos adicionales de `SocketIO` según la cola de mensajes configurada.
+
+    Parámetros:
+    - url (str): URL de la cola (por defecto SOCKETIO_MESSAGE_QUEUE); vacía para un solo proceso.
+    - rol (str): Rol del proceso (por defecto ROL_PROCESO); los workers solo publican.
+
+    Retorna:
+    - dict: {} sin cola de mensajes, o {'client_manager': gestor}.
+    """
+    url = URL_COLA_MENSAJES if url is None else url
+    rol = rol or ROL_PROCESO
+    if not url:
+        if rol != 'completo':
+            logger.warning(f"ROL_PROCESO={rol} sin SOCKETIO_MESSAGE_QUEUE: los eventos de los workers "
+                           f"no llegarán a los clientes de otros procesos.")
+        return {}
+    logger.info(f"Socket.IO con cola de mensajes {url.split('://', 1)[0]}:// (canal {CANAL_COLA_MENSAJES}, rol {rol}).")
+    return {'client_manager': crear_gestor_mensajes(url, write_only=rol == 'worker')}
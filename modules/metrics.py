@@ -0,0 +1,234 @@
+# modules/metrics.py
+
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Límites de los histogramas de duración, en segundos (de una llamada corta a una transcripción larga)
+BUCKETS_SEGUNDOS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+
+def _formatear_etiquetas(nombres, valores, extra=None):
+    pares = list(zip(nombres, valores)) + (extra or [])
+    if not pares:
+        return ''
+    contenido = ','.join(f'{nombre}="{_escapar(valor)}"' for nombre, valor in pares)
+    return '{' + contenido + '}'
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _formatear_numero(valor):
+    if valor == float('inf'):
+        return '+Inf'
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Metrica:
+    """
+    Base de las métricas: nombre, descripción y nombres de las etiquetas.
+    """
+    tipo = None
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._lock = threading.Lock()
+
+    def _clave(self, etiquetas):
+        return tuple(str(etiquetas.get(nombre, '')) for nombre in self.etiquetas)
+
+    def muestras(self):
+        """
+        Retorna:
+        - list: Líneas de texto con las muestras de la métrica.
+        """
+        raise NotImplementedError
+
+    def exponer(self):
+        return [f'# HELP {self.nombre} {self.ayuda}', f'# TYPE {self.nombre} {self.tipo}'] + self.muestras()
+
+
+class Contador(Metrica):
+    """
+    Valor que solo aumenta (videos procesados, bytes transferidos, tokens).
+    """
+    tipo = 'counter'
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        super().__init__(nombre, ayuda, etiquetas)
+        self._valores = {}
+
+    def inc(self, valor=1, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + valor
+
+    def valores(self):
+        """
+        Retorna:
+        - dict: Valor acumulado por tupla de etiquetas.
+        """
+        with self._lock:
+            return dict(self._valores)
+
+    def muestras(self):
+        return [f'{self.nombre}{_formatear_etiquetas(self.etiquetas, clave)} {_formatear_numero(valor)}'
+                for clave, valor in sorted(self.valores().items())]
+
+
+class Medidor(Metrica):
+    """
+    Valor que sube y baja. Si se indica `funcion`, el valor se calcula al exponer la métrica:
+    la función retorna un número o un dict {tupla_de_etiquetas: número}.
+    """
+    tipo = 'gauge'
+
+    def __init__(self, nombre, ayuda, etiquetas=(), funcion=None):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.funcion = funcion
+        self._valores = {}
+
+    def set(self, valor, **etiquetas):
+        with self._lock:
+            self._valores[self._clave(etiquetas)] = valor
+
+    def inc(self, valor=1, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + valor
+
+    def dec(self, valor=1, **etiquetas):
+        self.inc(-valor, **etiquetas)
+
+    def muestras(self):
+        if self.funcion is not None:
+            try:
+                resultado = self.funcion()
+            except Exception as e:
+                logger.warning(f"No se pudo calcular la métrica {self.nombre}: {e}")
+                return []
+            valores = resultado if isinstance(resultado, dict) else {(): resultado}
+        else:
+            with self._lock:
+                valores = dict(self._valores)
+        return [f'{self.nombre}{_formatear_etiquetas(self.etiquetas, clave)} {_formatear_numero(valor)}'
+                for clave, valor in sorted(valores.items())]
+
+
+class Histograma(Metrica):
+    """
+    Distribución de valores (duraciones, tamaños) en buckets acumulados, con suma y conteo.
+    """
+    tipo = 'histogram'
+
+    def __init__(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS_SEGUNDOS):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._series = {}
+
+    def observar(self, valor, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._lock:
+            serie = self._series.get(clave)
+            if serie is None:
+                serie = self._series[clave] = {'conteos': [0] * len(self.buckets), 'suma': 0.0, 'total': 0}
+            for indice, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie['conteos'][indice] += 1
+                    break
+            serie['suma'] += valor
+            serie['total'] += 1
+
+    @contextmanager
+    def medir(self, **etiquetas):
+        """
+        Observa la duración del bloque `with`, también si termina con una excepción.
+        """
+        inicio = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observar(time.monotonic() - inicio, **etiquetas)
+
+    def muestras(self):
+        lineas = []
+        with self._lock:
+            series = {clave: dict(serie, conteos=list(serie['conteos'])) for clave, serie in self._series.items()}
+        for clave, serie in sorted(series.items()):
+            acumulado = 0
+            for limite, conteo in zip(self.buckets, serie['conteos']):
+                acumulado += conteo
+                etiquetas = _formatear_etiquetas(self.etiquetas, clave, [('le', _formatear_numero(limite))])
+                lineas.append(f'{self.nombre}_bucket{etiquetas} {acumulado}')
+            etiquetas = _formatear_etiquetas(self.etiquetas, clave)
+            lineas.append(f'{self.nombre}_sum{etiquetas} {_formatear_numero(serie["suma"])}')
+            lineas.append(f'{self.nombre}_count{etiquetas} {serie["total"]}')
+        return lineas
+
+
+class Registro:
+    """
+    Conjunto de métricas que se exponen juntas en formato de texto de Prometheus.
+    """
+
+    def __init__(self):
+        self._metricas = []
+
+    def registrar(self, metrica):
+        self._metricas.append(metrica)
+        return metrica
+
+    def exponer(self):
+        """
+        Retorna:
+        - str: Todas las métricas en el formato de exposición de Prometheus (versión 0.0.4).
+        """
+        lineas = []
+        for metrica in self._metricas:
+            lineas.extend(metrica.exponer())
+        return '\n'.join(lineas) + '\n'
+
+
+registro = Registro()
+
+duracion_etapa = registro.registrar(Histograma(
+    'video_etapa_duracion_segundos', 'Duración de cada etapa del procesamiento de un video.', ('etapa',)))
+errores_etapa = registro.registrar(Contador(
+    'video_etapa_errores_total', 'Etapas que terminaron con error.', ('etapa',)))
+videos_procesados = registro.registrar(Contador(
+    'videos_procesados_total', 'Videos que terminaron el procesamiento.', ('resultado',)))
+bytes_audio = registro.registrar(Contador(
+    'audio_bytes_total', 'Bytes de audio transferidos.', ('direccion',)))
+duracion_audio = registro.registrar(Histograma(
+    'audio_duracion_segundos', 'Duración de los audios procesados.',
+    buckets=(60, 300, 600, 1200, 1800, 3600, 7200, 14400)))
+segundos_transcribe = registro.registrar(Contador(
+    'audio_transcribe_segundos_total', 'Segundos de audio antes y después de la preparación para Transcribe.',
+    ('version',)))
+fuente_transcripcion = registro.registrar(Contador(
+    'transcripciones_total', 'Transcripciones obtenidas, según su fuente.', ('fuente',)))
+subtitulos_descartados = registro.registrar(Contador(
+    'subtitulos_descartados_total', 'Videos cuyos subtítulos no se usaron, según el motivo.', ('motivo',)))
+tokens_bedrock = registro.registrar(Contador(
+    'bedrock_tokens_total', 'Tokens consumidos en Bedrock según `usage`.', ('tipo',)))
+duracion_bedrock = registro.registrar(Histograma(
+    'bedrock_llamada_duracion_segundos', 'Duración de cada llamada a Bedrock.', ('modo',)))
+consultas_cache = registro.registrar(Contador(
+    'cache_sugerencias_consultas_total', 'Consultas a la caché de sugerencias.', ('resultado',)))
+tareas_media = registro.registrar(Contador(
+    'media_tareas_total', 'Tareas de yt-dlp y FFmpeg ejecutadas fuera del greenlet.', ('tarea', 'resultado')))
+procesos_media_ocupados = registro.registrar(Medidor(
+    'media_procesos_ocupados', 'Procesos hijos de yt-dlp atendiendo una tarea.'))
+profundidad_etapa = registro.registrar(Medidor(
+    'pipeline_cola_profundidad', 'Videos esperando en la cola de entrada de cada etapa.', ('etapa',)))
+trabajos_pendientes = registro.registrar(Medidor(
+    'trabajos_pendientes', 'Trabajos en estado pendiente en la tabla `jobs`.'))
+workers_ocupados = registro.registrar(Medidor(
+    'pipeline_workers_ocupados', 'Workers de cada etapa procesando un video.', ('etapa',)))
+greenlets_activos = registro.registrar(Medidor(
+    'eventlet_greenlets_activos', 'Greenlets de la aplicación en ejecución (workers, despachador, sondeo, fragmentos).',
+    ('origen',)))
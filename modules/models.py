@@ -1,30 +1,259 @@
 # modules/models.py
 
+import zlib
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.dialects.postgresql import TSVECTOR
 
 db = SQLAlchemy()
 
 class Video(db.Model):
     """
-    Clase Video que representa un video en la base de datos.
+    Clase Video que representa un video procesado en la base de datos.
     Atributos:
         __tablename__ (str): Nombre de la tabla en la base de datos.
-        url_video (db.Column): URL del video que actúa como ID principal.
-        title1 (db.Column): Primer título del video.
-        title2 (db.Column): Segundo título del video.
-        title3 (db.Column): Tercer título del video.
-        summary (db.Column): Resumen del video.
-        transcription (db.Column): Transcripción completa del video.
+        video_id (db.Column): ID de 11 caracteres del video de YouTube, clave principal.
+        url_video (db.Column): URL limpia del video.
+        source_title (db.Column): Título original del video en YouTube.
+        duration (db.Column): Duración del audio en segundos.
+        language (db.Column): Idioma detectado en la transcripción.
+        title1 (db.Column): Primer título de la generación vigente.
+        title2 (db.Column): Segundo título de la generación vigente.
+        title3 (db.Column): Tercer título de la generación vigente.
+        summary (db.Column): Resumen de la generación vigente.
+        generation_id (db.Column): Generación vigente (ver `Generation`).
+        created_at (db.Column): Fecha de creación, usada para paginar el listado.
+        updated_at (db.Column): Fecha de la última actualización.
+        search_vector (db.Column): tsvector de búsqueda (solo Postgres; ver `modules.search`).
+        transcript (db.relationship): Transcripción del video (tabla aparte, comprimida).
+        generations (db.relationship): Historial de generaciones del video.
     Métodos:
         __repr__: Representación en cadena del objeto Video.
     """
     __tablename__ = 'videos'
-    url_video = db.Column(db.String(255), primary_key=True)  # URL del video como ID
+    __table_args__ = (
+        db.Index('ix_videos_created_at_id', 'created_at', 'video_id'),
+        db.Index('ix_videos_search_vector', 'search_vector', postgresql_using='gin'),
+    )
+    video_id = db.Column(db.String(11), primary_key=True)
+    url_video = db.Column(db.String(255), nullable=False, unique=True)
+    source_title = db.Column(db.String(255), nullable=True)
+    duration = db.Column(db.Float, nullable=True)
+    language = db.Column(db.String(16), nullable=True)
     title1 = db.Column(db.String(255), nullable=False)
     title2 = db.Column(db.String(255), nullable=False)
     title3 = db.Column(db.String(255), nullable=False)
     summary = db.Column(db.Text, nullable=False)
-    transcription = db.Column(db.Text, nullable=False)
+    generation_id = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
+    updated_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now(), onupdate=db.func.now())
+    # Lo mantiene `actualizar_vector_busqueda`; en otras bases queda como texto nulo sin usar.
+    # Diferida: no se carga al leer videos
+    search_vector = db.deferred(db.Column(db.Text().with_variant(TSVECTOR(), 'postgresql'), nullable=True))
+
+    transcript = db.relationship('Transcript', uselist=False, lazy='select', cascade='all, delete-orphan')
+    generations = db.relationship('Generation', lazy='dynamic', order_by='Generation.created_at.desc()',
+                                  cascade='all, delete-orphan')
+
+    @property
+    def transcription(self):
+        """
+        Texto de la transcripción (se descomprime al leerlo).
+        """
+        return self.transcript.texto if self.transcript is not None else None
+
+    def __repr__(self):
+        return f"<Video {self.video_id} - {self.title1}>"
+
+
+class Transcript(db.Model):
+    """
+    Clase Transcript que guarda la transcripción de un video comprimida con zlib, fuera de la
+    tabla `videos` para que el listado no la lea.
+    Atributos:
+        __tablename__ (str): Nombre de la tabla en la base de datos.
+        video_id (db.Column): ID del video.
+        language (db.Column): Idioma de la transcripción.
+        content (db.Column): Texto limpio comprimido con zlib.
+        characters (db.Column): Longitud del texto sin comprimir.
+        created_at (db.Column): Fecha de creación.
+    Métodos:
+        texto: Texto descomprimido (lectura y escritura).
+        __repr__: Representación en cadena del objeto Transcript.
+    """
+    __tablename__ = 'transcripts'
+    video_id = db.Column(db.String(11), db.ForeignKey('videos.video_id', ondelete='CASCADE'), primary_key=True)
+    language = db.Column(db.String(16), nullable=True)
+    content = db.Column(db.LargeBinary, nullable=False)
+    characters = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
+
+    @property
+    def texto(self):
+        return zlib.decompress(self.content).decode('utf-8')
+
+    @texto.setter
+    def texto(self, valor):
+        self.content = zlib.compress(valor.encode('utf-8'), 6)
+        self.characters = len(valor)
+
+    def __repr__(self):
+        return f"<Transcript {self.video_id} - {self.characters} caracteres>"
+
+
+class Generation(db.Model):
+    """
+    Clase Generation que registra cada generación de títulos y resumen de un video.
+    Atributos:
+        __tablename__ (str): Nombre de la tabla en la base de datos.
+        id (db.Column): Identificador autoincremental.
+        video_id (db.Column): ID del video.
+        model_id (db.Column): Modelo de Bedrock usado.
+        prompt_version (db.Column): Versión del prompt usada.
+        title1 (db.Column): Primer título generado.
+        title2 (db.Column): Segundo título generado.
+        title3 (db.Column): Tercer título generado.
+        summary (db.Column): Resumen generado.
+        input_tokens (db.Column): Tokens de entrada consumidos (todas las llamadas de la generación).
+        output_tokens (db.Column): Tokens de salida.
+        cache_read_tokens (db.Column): Tokens de entrada leídos del prompt caching.
+        latency_ms (db.Column): Tiempo total en Bedrock, en milisegundos.
+        cached (db.Column): Si la respuesta salió de `generation_cache` sin llamar al modelo.
+        created_at (db.Column): Fecha de creación.
+    Métodos:
+        __repr__: Representación en cadena del objeto Generation.
+    """
+    __tablename__ = 'generations'
+    __table_args__ = (
+        db.Index('ix_generations_video_id_created_at', 'video_id', 'created_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    video_id = db.Column(db.String(11), db.ForeignKey('videos.video_id', ondelete='CASCADE'), nullable=False)
+    model_id = db.Column(db.String(128), nullable=False)
+    prompt_version = db.Column(db.String(32), nullable=False)
+    title1 = db.Column(db.String(255), nullable=False)
+    title2 = db.Column(db.String(255), nullable=False)
+    title3 = db.Column(db.String(255), nullable=False)
+    summary = db.Column(db.Text, nullable=False)
+    input_tokens = db.Column(db.Integer, nullable=True)
+    output_tokens = db.Column(db.Integer, nullable=True)
+    cache_read_tokens = db.Column(db.Integer, nullable=True)
+    latency_ms = db.Column(db.Integer, nullable=True)
+    cached = db.Column(db.Boolean, nullable=False, default=False)
+    created_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
+
+    def __repr__(self):
+        return f"<Generation {self.id} {self.video_id} - {self.model_id}>"
+
+
+class Job(db.Model):
+    """
+    Clase Job que representa un trabajo de procesamiento persistido en la base de datos.
+    Atributos:
+        __tablename__ (str): Nombre de la tabla en la base de datos.
+        id (db.Column): Identificador autoincremental del trabajo.
+        url_video (db.Column): URL limpia del video a procesar.
+        session_id (db.Column): Sala de SocketIO a la que se emiten los eventos del trabajo.
+        batch_id (db.Column): Lote al que pertenece el trabajo, si se envió en lote.
+        priority (db.Column): Prioridad del trabajo (mayor valor se procesa primero).
+        status (db.Column): Estado del trabajo ('pending', 'running', 'done', 'failed').
+        attempts (db.Column): Número de veces que un worker ha tomado el trabajo.
+        error (db.Column): Último mensaje de error, si lo hubo.
+        created_at (db.Column): Fecha de creación.
+        updated_at (db.Column): Fecha de la última actualización.
+    Métodos:
+        __repr__: Representación en cadena del objeto Job.
+    """
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        db.Index('ix_jobs_status_priority', 'status', 'priority', 'id'),
+        # Un solo trabajo activo por URL, aunque varios procesos web encolen a la vez
+        db.Index('ux_jobs_url_video_activo', 'url_video', unique=True,
+                 postgresql_where=db.text("status IN ('pending', 'running')"),
+                 sqlite_where=db.text("status IN ('pending', 'running')")),
+    )
+
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    id = db.Column(db.Integer, primary_key=True)
+    url_video = db.Column(db.String(255), nullable=False, index=True)
+    session_id = db.Column(db.String(64), nullable=False)
+    batch_id = db.Column(db.String(64), nullable=True, index=True)
+    priority = db.Column(db.Integer, nullable=False, default=0)
+    status = db.Column(db.String(16), nullable=False, default=STATUS_PENDING)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
+    updated_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now(), onupdate=db.func.now())
+
+    def __repr__(self):
+        return f"<Job {self.id} {self.status} - {self.url_video}>"
+
+
+class GenerationCache(db.Model):
+    """
+    Clase GenerationCache que guarda las respuestas de Bedrock para no repetir generaciones.
+    Atributos:
+        __tablename__ (str): Nombre de la tabla en la base de datos.
+        key (db.Column): SHA-256 de (transcripción, título, versión del prompt, modelo, temperatura).
+        model_id (db.Column): Modelo que generó la respuesta.
+        prompt_version (db.Column): Versión del prompt usada.
+        response (db.Column): Texto de la respuesta del modelo.
+        created_at (db.Column): Fecha de creación.
+    Métodos:
+        __repr__: Representación en cadena del objeto GenerationCache.
+    """
+    __tablename__ = 'generation_cache'
+    key = db.Column(db.String(64), primary_key=True)
+    model_id = db.Column(db.String(128), nullable=False)
+    prompt_version = db.Column(db.String(32), nullable=False)
+    response = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
+
+    def __repr__(self):
+        return f"<GenerationCache {self.key[:12]} - {self.model_id}>"
+
+
+class VideoCheckpoint(db.Model):
+    """
+    Clase VideoCheckpoint que guarda el avance de un video por el pipeline para reanudarlo
+    desde la primera etapa incompleta si falla.
+    Atributos:
+        __tablename__ (str): Nombre de la tabla en la base de datos.
+        url_video (db.Column): URL limpia del video.
+        stage (db.Column): Última etapa completada.
+        video_id (db.Column): ID del video de YouTube.
+        title (db.Column): Título actual del video.
+        duration (db.Column): Duración del audio en segundos.
+        audio_path (db.Column): Ruta local del audio descargado.
+        audio_sha256 (db.Column): Hash SHA-256 del audio descargado.
+        audio_uri (db.Column): URI del audio en S3.
+        transcription_job (db.Column): Nombre del trabajo de AWS Transcribe.
+        language (db.Column): Idioma detectado por Transcribe.
+        transcription_raw (db.Column): Transcripción tal como la devuelve Transcribe.
+        transcription (db.Column): Transcripción limpia.
+        suggestions (db.Column): JSON con los títulos y el resumen generados.
+        updated_at (db.Column): Fecha de la última actualización.
+    Métodos:
+        __repr__: Representación en cadena del objeto VideoCheckpoint.
+    """
+    __tablename__ = 'video_checkpoints'
+    url_video = db.Column(db.String(255), primary_key=True)
+    stage = db.Column(db.String(32), nullable=False)
+    video_id = db.Column(db.String(32), nullable=True)
+    title = db.Column(db.String(255), nullable=True)
+    duration = db.Column(db.Float, nullable=True)
+    audio_path = db.Column(db.String(512), nullable=True)
+    audio_sha256 = db.Column(db.String(64), nullable=True)
+    audio_uri = db.Column(db.String(512), nullable=True)
+    transcription_job = db.Column(db.String(255), nullable=True)
+    language = db.Column(db.String(16), nullable=True)
+    transcription_raw = db.Column(db.Text, nullable=True)
+    transcription = db.Column(db.Text, nullable=True)
+    suggestions = db.Column(db.Text, nullable=True)
+    updated_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now(), onupdate=db.func.now())
 
     def __repr__(self):
-        return f"<Video {self.url_video} - {self.title1}>"
+        return f"<VideoCheckpoint {self.url_video} - {self.stage}>"
@@ -0,0 +1,192 @@
+# modules/pagination.py
+
+import os
+import json
+import time
+import base64
+import binascii
+import threading
+from datetime import datetime
+from sqlalchemy import func, text, tuple_
+from sqlalchemy.orm import load_only
+from modules.models import db, Video
+
+# Columnas que muestra el listado; la transcripción nunca se carga
+COLUMNAS_LISTADO = (Video.video_id, Video.url_video, Video.title1, Video.title2, Video.title3, Video.summary, Video.created_at)
+# Segundos que se reutiliza el total de videos mostrado en el listado
+TTL_TOTAL = float(os.getenv('TOTAL_VIDEOS_TTL', '300'))
+
+class Pagina:
+    """
+    Página de resultados del listado de videos.
+
+    Atributos:
+    - items (list): Videos de la página.
+    - anterior (dict): Parámetros de la URL de la página anterior, o None si es la primera.
+    - siguiente (dict): Parámetros de la URL de la página siguiente, o None si es la última.
+    - total_aproximado (int): Total estimado de videos, si se calculó.
+    """
+
+    def __init__(self, items, anterior=None, siguiente=None, total_aproximado=None):
+        self.items = items
+        self.anterior = anterior
+        self.siguiente = siguiente
+        self.total_aproximado = total_aproximado
+
+def codificar_cursor(valores):
+    """
+    Parámetros:
+    - valores (tuple): Posición del video en el orden: ([relevancia,] created_at, video_id).
+
+    Retorna:
+    - str: Cursor opaco con esa posición.
+    """
+    crudo = json.dumps([valor.isoformat() if isinstance(valor, datetime) else valor for valor in valores])
+    return base64.urlsafe_b64encode(crudo.encode('utf-8')).decode('ascii')
+
+def decodificar_cursor(cursor):
+    """
+    Retorna:
+    - tuple: Posición del cursor, ([relevancia,] created_at, video_id).
+
+    Lanza:
+    - ValueError: Si el cursor no es válido.
+    """
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        *previos, fecha, video_id = valores
+        return (*previos, datetime.fromisoformat(fecha), video_id)
+    except (binascii.Error, UnicodeError, TypeError, ValueError) as e:
+        raise ValueError(f"Cursor de paginación inválido: {cursor}") from e
+
+def _clave_orden(relevancia=None):
+    # SQLite guarda CURRENT_TIMESTAMP sin microsegundos y los parámetros con ellos; al comparar
+    # como texto, normalizar ambos lados evita que el video del cursor se repita
+    if db.engine.dialect.name == 'sqlite':
+        fecha, normalizar = func.datetime(Video.created_at), func.datetime
+    else:
+        fecha, normalizar = Video.created_at, lambda valor: valor
+    columnas = (fecha, Video.video_id) if relevancia is None else (relevancia, fecha, Video.video_id)
+    return columnas, normalizar
+
+def _paginar(consulta, relevancia, despues, antes, por_pagina, parametros=None):
+    """
+    Pagina por cursor una consulta de videos ordenada de forma descendente por
+    ([relevancia,] created_at, video_id).
+
+    Retorna:
+    - tuple: (items, anterior, siguiente) como en `Pagina`.
+    """
+    columnas, normalizar = _clave_orden(relevancia)
+    clave = tuple_(*columnas)
+    extra = () if relevancia is None else (relevancia,)
+    consulta = consulta.options(load_only(*COLUMNAS_LISTADO)).add_columns(*extra)
+
+    def posicion(cursor):
+        *previos, fecha, video_id = decodificar_cursor(cursor)
+        if len(previos) != len(extra):
+            raise ValueError(f"Cursor de paginación inválido: {cursor}")
+        return tuple_(*previos, normalizar(fecha), video_id)
+
+    if antes:
+        filas = consulta.filter(clave > posicion(antes)) \
+            .order_by(*(columna.asc() for columna in columnas)).limit(por_pagina + 1).all()
+        hay_mas = len(filas) > por_pagina
+        filas = list(reversed(filas[:por_pagina]))
+        anterior_existe, siguiente_existe = hay_mas, True
+    else:
+        if despues:
+            consulta = consulta.filter(clave < posicion(despues))
+        filas = consulta.order_by(*(columna.desc() for columna in columnas)).limit(por_pagina + 1).all()
+        anterior_existe, siguiente_existe = bool(despues), len(filas) > por_pagina
+        filas = filas[:por_pagina]
+
+    if extra:
+        items = [fila[0] for fila in filas]
+        posiciones = [(*fila[1:], fila[0].created_at, fila[0].video_id) for fila in filas]
+    else:
+        items = filas
+        posiciones = [(video.created_at, video.video_id) for video in filas]
+    parametros = parametros or {}
+    anterior = {**parametros, 'antes': codificar_cursor(posiciones[0])} if items and anterior_existe else None
+    siguiente = {**parametros, 'despues': codificar_cursor(posiciones[-1])} if items and siguiente_existe else None
+    return items, anterior, siguiente
+
+def listar_videos(despues=None, antes=None, por_pagina=10):
+    """
+    Lista los videos del más reciente al más antiguo con paginación por cursor.
+
+    En lugar de OFFSET, cada página empieza después (o antes) del último video visto, usando
+    el índice (created_at, video_id), así que el costo no crece con la profundidad de la página.
+
+    Parámetros:
+    - despues (str): Cursor del último video de la página anterior (avanzar).
+    - antes (str): Cursor del primer video de la página siguiente (retroceder).
+    - por_pagina (int): Videos por página.
+
+    Retorna:
+    - Pagina: Videos de la página y parámetros para navegar.
+
+    Lanza:
+    - ValueError: Si algún cursor no es válido.
+    """
+    items, anterior, siguiente = _paginar(Video.query, None, despues, antes, por_pagina)
+    return Pagina(items, anterior, siguiente, total_aproximado=contar_videos_aproximado())
+
+def paginar_busqueda(consulta, relevancia, termino, despues=None, antes=None, por_pagina=10):
+    """
+    Pagina los resultados de una búsqueda por cursor, sin OFFSET ni COUNT(*): el cursor guarda
+    la relevancia (si la hay), la fecha y el ID del video en el borde de la página.
+
+    Parámetros:
+    - consulta (Query): Consulta filtrada de `modules.search.buscar_videos`.
+    - relevancia: Expresión de relevancia de `buscar_videos`, o None si se ordena por fecha.
+    - termino (str): Término buscado, para las URLs de navegación.
+    - despues (str): Cursor del último video de la página anterior (avanzar).
+    - antes (str): Cursor del primer video de la página siguiente (retroceder).
+    - por_pagina (int): Videos por página.
+
+    Retorna:
+    - Pagina: Videos de la página y parámetros para navegar.
+
+    Lanza:
+    - ValueError: Si algún cursor no es válido.
+    """
+    items, anterior, siguiente = _paginar(consulta, relevancia, despues, antes, por_pagina,
+                                          parametros={'search': termino})
+    return Pagina(items, anterior, siguiente)
+
+# Total de videos por base de datos: (valor, expiración)
+_total_videos = {}
+_lock_total = threading.Lock()
+
+def contar_videos_aproximado():
+    """
+    Estima el número de videos. En Postgres usa la estadística `reltuples` (sin recorrer la
+    tabla); si aún no hay estadística (o la tabla está vacía), o en otras bases, hace un COUNT(*).
+    El resultado se reutiliza durante TOTAL_VIDEOS_TTL segundos, así que el COUNT(*) no se
+    repite en cada página.
+
+    Retorna:
+    - int: Número de videos.
+    """
+    motor = db.engine
+    ahora = time.monotonic()
+    with _lock_total:
+        guardado = _total_videos.get(motor.url)
+    if guardado is not None and guardado[1] > ahora:
+        return guardado[0]
+
+    total = None
+    if motor.dialect.name == 'postgresql':
+        estimado = db.session.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE relname = :tabla"),
+            {'tabla': Video.__tablename__}
+        ).scalar()
+        if estimado and estimado > 0:
+            total = estimado
+    if total is None:
+        total = db.session.query(func.count(Video.video_id)).scalar()
+    with _lock_total:
+        _total_videos[motor.url] = (total, ahora + TTL_TOTAL)
+    return total
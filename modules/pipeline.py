@@ -0,0 +1,159 @@
+# modules/pipeline.py
+
+import os
+import queue
+import logging
+import threading
+from flask_socketio import SocketIO
+from modules.processing import ETAPAS, ejecutar_etapa, notificar_error
+from modules.metrics import workers_ocupados, videos_procesados, greenlets_activos
+
+logger = logging.getLogger(__name__)
+
+# Workers por etapa; cada etapa avanza de forma independiente de las demás
+LIMITES_ETAPA = {
+    'descarga': int(os.getenv('LIMITE_DESCARGA', '2')),
+    'preparacion': int(os.getenv('LIMITE_PREPARACION', '2')),
+    'subida': int(os.getenv('LIMITE_SUBIDA', '4')),
+    'transcripcion': int(os.getenv('LIMITE_TRANSCRIPCION', '10')),
+    'generacion': int(os.getenv('LIMITE_GENERACION', '3')),
+    'persistencia': int(os.getenv('LIMITE_PERSISTENCIA', '1')),
+}
+# Videos que pueden esperar en la cola de entrada de cada etapa
+CAPACIDAD_COLA_ETAPA = int(os.getenv('CAPACIDAD_COLA_ETAPA', '4'))
+
+class Pipeline:
+    """
+    Pipeline por etapas conectadas con colas acotadas.
+
+    Cada etapa de `modules.processing.ETAPAS` tiene su propia cola de entrada y su propio
+    grupo de workers, así que mientras un video espera a Transcribe los siguientes ya se
+    descargan y suben. Cuando la cola de una etapa se llena, la anterior se detiene
+    (backpressure), lo que mantiene acotado el número de videos en memoria.
+    """
+
+    def __init__(self, app, socketio: SocketIO, al_terminar=None, etapas=None, limites=None, capacidad=None,
+                 al_completar_etapa=None):
+        """
+        Parámetros:
+        - app (Flask): Aplicación Flask, necesaria para el contexto de base de datos.
+        - socketio (SocketIO): Instancia de SocketIO para emitir eventos.
+        - al_terminar (callable): Función (contexto, exito) llamada al terminar o fallar un video.
+        - etapas (list): Lista de (nombre, funcion); por defecto `ETAPAS`.
+        - limites (dict): Workers por etapa; por defecto `LIMITES_ETAPA`.
+        - capacidad (int): Tamaño de la cola de entrada de cada etapa.
+        - al_completar_etapa (callable): Función (contexto, nombre) llamada tras cada etapa exitosa,
+          p. ej. para guardar un checkpoint.
+        """
+        self.app = app
+        self.socketio = socketio
+        self.al_terminar = al_terminar
+        self.al_completar_etapa = al_completar_etapa
+        self.etapas = etapas or ETAPAS
+        self.limites = limites or LIMITES_ETAPA
+        capacidad = capacidad or CAPACIDAD_COLA_ETAPA
+        self.colas = [queue.Queue(maxsize=max(1, capacidad)) for _ in self.etapas]
+        # Se notifica cada vez que un worker saca un video de su cola (ver `esperar_espacio`)
+        self._lugar = threading.Condition()
+        self._iniciado = False
+
+    def iniciar(self):
+        """
+        Lanza los workers de todas las etapas en segundo plano.
+        """
+        if self._iniciado:
+            return
+        self._iniciado = True
+        for indice, (nombre, _) in enumerate(self.etapas):
+            for numero in range(max(1, self.limites.get(nombre, 1))):
+                self.socketio.start_background_task(self._worker, indice, numero)
+        logger.info("Pipeline iniciado: " + ", ".join(
+            f"{nombre}={self.limites.get(nombre, 1)}" for nombre, _ in self.etapas))
+
+    def enviar(self, contexto, etapa=None, bloquear=True):
+        """
+        Pone un video en la cola de una etapa.
+
+        Parámetros:
+        - contexto (dict): Estado del video ('url_video' y 'session_id' como mínimo).
+        - etapa (str): Etapa desde la que continúa el video; por defecto la primera.
+        - bloquear (bool): Si espera a que la cola tenga lugar; con False no espera.
+
+        Retorna:
+        - bool: True si el video quedó en la cola; False si estaba llena y `bloquear` es False.
+        """
+        try:
+            self._cola(etapa).put(contexto, block=bloquear)
+        except queue.Full:
+            return False
+        return True
+
+    def esperar_espacio(self, etapa=None, timeout=None):
+        """
+        Espera a que la cola de una etapa tenga lugar, sin reservarlo.
+
+        Parámetros:
+        - etapa (str): Etapa cuya cola se observa; por defecto la primera.
+        - timeout (float): Segundos máximos de espera.
+
+        Retorna:
+        - bool: True si la cola tiene lugar.
+        """
+        cola = self._cola(etapa)
+        with self._lugar:
+            if cola.full():
+                self._lugar.wait(timeout)
+            return not cola.full()
+
+    def _cola(self, etapa):
+        indice = 0 if etapa is None else [nombre for nombre, _ in self.etapas].index(etapa)
+        return self.colas[indice]
+
+    def profundidades(self):
+        """
+        Retorna:
+        - dict: Número de videos esperando en la cola de cada etapa.
+        """
+        return {nombre: cola.qsize() for (nombre, _), cola in zip(self.etapas, self.colas)}
+
+    def _worker(self, indice, numero):
+        nombre, etapa = self.etapas[indice]
+        cola = self.colas[indice]
+        siguiente = self.colas[indice + 1] if indice + 1 < len(self.colas) else None
+        logger.debug(f"Worker {numero} de la etapa '{nombre}' iniciado.")
+        greenlets_activos.inc(origen='pipeline')
+        try:
+            while True:
+                contexto = cola.get()
+                with self._lugar:
+                    self._lugar.notify_all()
+                workers_ocupados.inc(etapa=nombre)
+                try:
+                    with self.app.app_context():
+                        ejecutar_etapa(nombre, etapa, contexto, self.socketio)
+                        if self.al_completar_etapa is not None:
+                            self.al_completar_etapa(contexto, nombre)
+                except Exception as e:
+                    contexto['error'] = f"{nombre}: {e}"
+                    notificar_error(contexto, self.socketio, e)
+                    self._terminar(contexto, False)
+                    continue
+                finally:
+                    workers_ocupados.dec(etapa=nombre)
+
+                if siguiente is not None:
+                    siguiente.put(contexto)
+                else:
+                    self._terminar(contexto, True)
+        finally:
+            greenlets_activos.dec(origen='pipeline')
+
+    def _terminar(self, contexto, exito):
+        videos_procesados.inc(resultado='ok' if exito else 'error')
+        if self.al_terminar is None:
+            return
+        try:
+            with self.app.app_context():
+                self.al_terminar(contexto, exito)
+        except Exception as e:
+            logger.error(f"Error al cerrar el trabajo de {contexto.get('url_video')}: {e}", exc_info=True)
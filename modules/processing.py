@@ -1,111 +1,387 @@
 import os
 import json
+import time
 import logging
 from flask_socketio import SocketIO
-from modules.models import db, Video
-from modules.youtube_man import procesar_audio
-from modules.aws_services import subir_audio_s3, iniciar_transcripcion
+from modules.models import db, Video, Transcript, Generation
+from modules.youtube_man import (
+    SUBTITULOS_PRIMERO, procesar_audio, resolver_stream_audio, abrir_stream_audio, obtener_subtitulos
+)
+from modules.aws_services import FORMATOS_TRANSCRIBE, subir_audio_s3, subir_stream_s3, iniciar_transcripcion
+from modules.audio_prep import politica_activa, preparar_audio
+from modules.audio_cache import cache_audio
 from modules.transcriber import obtener_transcripcion, limpiar_texto
-from modules.bedrock_generator import generar_sugerencias_claude_optimizado
+from modules.bedrock_generator import MODEL_ID, PROMPT_VERSION, generar_sugerencias_claude_optimizado
+from modules.checkpoints import restaurar_checkpoint, guardar_checkpoint
+from modules.utils import extraer_video_id
+from modules.search import actualizar_vector_busqueda
+from modules.result_cache import cache_sugerencias
+from modules.structured_output import Sugerencias
+from modules.metrics import (
+    duracion_etapa, errores_etapa, duracion_audio, videos_procesados, fuente_transcripcion, segundos_transcribe
+)
 
 logger = logging.getLogger(__name__)
 
-def procesar_video(url_video, session_id, socketio: SocketIO):
+TOTAL_STEPS = 6
+BUCKET_NAME = 'ia-libretos'
+# Transmite el audio de YouTube directo a S3 en lugar de descargarlo a 'audios/'
+STREAMING_S3 = os.getenv('AUDIO_STREAMING_S3', 'false').lower() in ('1', 'true', 'si', 'sí', 'yes')
+
+def emitir_progreso(socketio: SocketIO, contexto, step, mensaje):
     """
-    Función para procesar el video en segundo plano.
+    Emite un evento 'progreso' a la sala del trabajo.
+
+    Parámetros:
+    - socketio (SocketIO): Instancia de SocketIO para emitir eventos.
+    - contexto (dict): Estado del video en proceso (debe incluir 'session_id').
+    - step (int): Paso actual.
+    - mensaje (str): Texto a mostrar al usuario.
     """
-    total_steps = 5
-    current_step = 0
+    socketio.emit('progreso', {
+        'data': f'Paso {step}/{TOTAL_STEPS}: {mensaje}',
+        'step': step,
+        'total_steps': TOTAL_STEPS
+    }, room=contexto['session_id'])
 
-    try:
-        logger.debug(f"Iniciando procesamiento del video con session_id: {session_id}")
-
-        # Paso 1: Descargar el audio
-        current_step += 1
-        socketio.emit('progreso', {
-            'data': 'Paso 1/5: Descargando audio...',
-            'step': current_step,
-            'total_steps': total_steps
-        }, room=session_id)
-        logger.info(f"Paso {current_step}/{total_steps}: Descargando audio para session_id: {session_id}")
-
-        # Descargar el audio
-        audio_path, video_id, titulo_actual = procesar_audio(url_video)
-        logger.info(f"Audio descargado: {audio_path}, Video ID: {video_id}, Título: {titulo_actual}")
-
-        # Paso 2: Subir el audio a S3
-        current_step += 1
-        socketio.emit('progreso', {
-            'data': 'Paso 2/5: Subiendo audio a S3...',
-            'step': current_step,
-            'total_steps': total_steps
-        }, room=session_id)
-        bucket_name = 'ia-libretos'
-        s3_key = f'audios/{os.path.basename(audio_path)}'
-        audio_uri = subir_audio_s3(audio_path, bucket_name, s3_key)
-        logger.info(f"Audio subido a S3: {audio_uri}")
-
-        # Paso 3: Iniciar transcripción
-        current_step += 1
-        socketio.emit('progreso', {
-            'data': 'Paso 3/5: Iniciando transcripción...',
-            'step': current_step,
-            'total_steps': total_steps
-        }, room=session_id)
-        job_name = f"transcripcion-{video_id}"
-        iniciar_transcripcion(job_name, audio_uri)
-
-        # Paso 4: Obtener transcripción
-        current_step += 1
-        socketio.emit('progreso', {
-            'data': 'Paso 4/5: Obteniendo transcripción...',
-            'step': current_step,
-            'total_steps': total_steps
-        }, room=session_id)
-        transcripcion = obtener_transcripcion(job_name, session_id, socketio)
-        transcripcion_limpia = limpiar_texto(transcripcion)
-
-        # Paso 5: Generar sugerencias
-        current_step += 1
-        socketio.emit('progreso', {
-            'data': 'Paso 5/5: Generando sugerencias...',
-            'step': current_step,
-            'total_steps': total_steps
-        }, room=session_id)
-        sugerencias = generar_sugerencias_claude_optimizado(transcripcion_limpia, titulo_actual)
-
-        # Verificar si el video ya existe
-        existing_video = Video.query.get(url_video)
-        if existing_video:
-            existing_video.title1 = sugerencias.get('Título Opción 1', 'N/A')
-            existing_video.title2 = sugerencias.get('Título Opción 2', 'N/A')
-            existing_video.title3 = sugerencias.get('Título Opción 3', 'N/A')
-            existing_video.summary = sugerencias.get('Resumen', 'N/A')
-            existing_video.transcription = transcripcion_limpia
+def usar_subtitulos(contexto, socketio: SocketIO, sondeo):
+    """
+    Intenta obtener la transcripción de los subtítulos de YouTube.
+
+    Parámetros:
+    - sondeo (dict): Recibe 'stream' con el stream de audio elegido en la misma consulta.
+
+    Retorna:
+    - bool: True si el contexto ya tiene la transcripción; las etapas de subida y
+      transcripción no hacen nada y el video pasa directo a la generación.
+    """
+    emitir_progreso(socketio, contexto, 1, 'Buscando subtítulos...')
+    subtitulos = obtener_subtitulos(contexto['url_video'], sondeo=sondeo)
+    if subtitulos is None:
+        return False
+    logger.info(f"Usando subtítulos {subtitulos['tipo']} ({subtitulos['idioma']}, {subtitulos['formato']}) "
+                f"de {contexto['url_video']}: se omiten la descarga y Transcribe.")
+    contexto.update(video_id=subtitulos['video_id'], titulo_actual=subtitulos['titulo'],
+                    duracion=subtitulos['duracion'], idioma=subtitulos['idioma'],
+                    transcripcion=subtitulos['texto'], transcripcion_limpia=limpiar_texto(subtitulos['texto']))
+    fuente_transcripcion.inc(fuente=f"subtitulos_{subtitulos['tipo']}")
+    emitir_progreso(socketio, contexto, 5, 'Transcripción obtenida de los subtítulos.')
+    return True
+
+def usar_transcripcion_guardada(contexto, socketio: SocketIO, video_id):
+    """
+    Reutiliza la transcripción de un video ya procesado, sin consultar a YouTube ni a Transcribe.
+
+    Retorna:
+    - bool: True si el contexto ya tiene la transcripción.
+    """
+    video = db.session.get(Video, video_id) if video_id else None
+    if video is None or video.transcript is None:
+        return False
+    logger.info(f"Usando la transcripción guardada de {video_id}: se omiten subtítulos, descarga y Transcribe.")
+    texto = video.transcript.texto
+    contexto.update(video_id=video_id, titulo_actual=video.source_title or video.title1, duracion=video.duration,
+                    idioma=video.transcript.language, transcripcion=texto, transcripcion_limpia=texto)
+    fuente_transcripcion.inc(fuente='guardada')
+    emitir_progreso(socketio, contexto, 5, 'Transcripción recuperada de la base de datos.')
+    return True
+
+def etapa_descarga(contexto, socketio: SocketIO):
+    """
+    Paso 1: reutiliza la transcripción guardada o el audio en caché si existen; si no, obtiene
+    la transcripción de los subtítulos (SUBTITULOS_PRIMERO) o, si no son aceptables, descarga
+    el audio del video con yt-dlp.
+    """
+    video_id = extraer_video_id(contexto['url_video'])
+    if usar_transcripcion_guardada(contexto, socketio, video_id):
+        return
+    # Con el audio ya en la caché local, la consulta de subtítulos sería una extracción de más
+    en_cache = cache_audio.obtener(video_id) is not None
+    sondeo = {}
+    if SUBTITULOS_PRIMERO and not en_cache and usar_subtitulos(contexto, socketio, sondeo):
+        return
+    # El stream elegido al buscar subtítulos evita una segunda extracción con yt-dlp
+    stream = sondeo.get('stream')
+    emitir_progreso(socketio, contexto, 1, 'Descargando audio...')
+    logger.info(f"Paso 1/{TOTAL_STEPS}: Descargando audio para session_id: {contexto['session_id']}")
+    if STREAMING_S3 and not en_cache:
+        # Solo se resuelve el stream; la etapa de subida lo transmite a S3
+        if not stream or stream['ext'] not in FORMATOS_TRANSCRIBE:
+            stream = resolver_stream_audio(contexto['url_video'])
+        logger.info(f"Stream de audio resuelto: {stream['video_id']} ({stream['ext']}), Título: {stream['titulo']}")
+        contexto.update(stream=stream, video_id=stream['video_id'], titulo_actual=stream['titulo'],
+                        duracion=stream['duracion'], idioma_video=stream['idioma'])
+        if stream['duracion']:
+            duracion_audio.observar(stream['duracion'])
+        return
+    detalles = {}
+    audio_path, video_id, titulo_actual, duracion = procesar_audio(contexto['url_video'], detalles=detalles, stream=stream)
+    logger.info(f"Audio descargado: {audio_path}, Video ID: {video_id}, Título: {titulo_actual}")
+    contexto.update(audio_path=audio_path, video_id=video_id, titulo_actual=titulo_actual, duracion=duracion,
+                    idioma_video=detalles.get('idioma'))
+    if duracion:
+        duracion_audio.observar(duracion)
+
+def etapa_preparacion(contexto, socketio: SocketIO):
+    """
+    Paso 2: recorta, muestrea y acelera el audio descargado según las políticas de
+    `modules.audio_prep`, para que Transcribe procese menos minutos. No aplica al audio
+    que se transmite directo a S3.
+    """
+    if contexto.get('transcripcion_limpia') is not None or 'stream' in contexto or not politica_activa():
+        return
+    emitir_progreso(socketio, contexto, 2, 'Preparando audio...')
+    preparado = preparar_audio(contexto['audio_path'], contexto.get('duracion'))
+    if preparado:
+        contexto.update(audio_preparado=preparado['ruta'], duracion_preparada=preparado['duracion'])
+        if contexto.get('duracion') and preparado['duracion']:
+            segundos_transcribe.inc(contexto['duracion'], version='original')
+            segundos_transcribe.inc(preparado['duracion'], version='preparado')
+
+def etapa_subida(contexto, socketio: SocketIO):
+    """
+    Paso 3: sube el audio a S3, desde el archivo local (o su versión preparada) o
+    transmitiendo el stream de YouTube.
+    """
+    if contexto.get('transcripcion_limpia') is not None:
+        return
+    emitir_progreso(socketio, contexto, 3, 'Subiendo audio a S3...')
+    stream = contexto.pop('stream', None)
+    if stream:
+        s3_key = f"audios/{stream['video_id']}.{stream['ext']}"
+        contexto['audio_uri'] = subir_stream_s3(abrir_stream_audio(stream), BUCKET_NAME, s3_key)
+    else:
+        audio_path = contexto.get('audio_preparado') or contexto['audio_path']
+        s3_key = f"audios/{os.path.basename(audio_path)}"
+        contexto['audio_uri'] = subir_audio_s3(audio_path, BUCKET_NAME, s3_key)
+        # La versión preparada no entra en la caché de audio: ya está en S3
+        if contexto.pop('audio_preparado', None):
+            os.remove(audio_path)
+    logger.info(f"Audio subido a S3: {contexto['audio_uri']}")
+
+def etapa_transcripcion(contexto, socketio: SocketIO):
+    """
+    Pasos 4 y 5: inicia el trabajo en AWS Transcribe y espera su resultado. El inicio y la
+    espera se miden por separado ('transcripcion_inicio' y 'transcripcion_espera').
+    """
+    if contexto.get('transcripcion_limpia') is not None:
+        return
+    emitir_progreso(socketio, contexto, 4, 'Iniciando transcripción...')
+    job_name = f"transcripcion-{contexto['video_id']}"
+    with duracion_etapa.medir(etapa='transcripcion_inicio'):
+        respuesta = iniciar_transcripcion(job_name, contexto['audio_uri'], idioma=contexto.get('idioma_video'))
+
+    emitir_progreso(socketio, contexto, 5, 'Obteniendo transcripción...')
+    detalles = {}
+    with duracion_etapa.medir(etapa='transcripcion_espera'):
+        transcripcion = obtener_transcripcion(job_name, contexto['session_id'], socketio,
+                                              duracion_audio=contexto.get('duracion_preparada') or contexto.get('duracion'),
+                                              estado_inicial=respuesta,
+                                              detalles=detalles)
+    contexto.update(job_name=job_name, idioma=detalles.get('idioma'), transcripcion=transcripcion,
+                    transcripcion_limpia=limpiar_texto(transcripcion))
+    fuente_transcripcion.inc(fuente='transcribe')
+
+def etapa_generacion(contexto, socketio: SocketIO):
+    """
+    Paso 6: genera los títulos y el resumen validados (`Sugerencias`) con Bedrock, enviando
+    cada campo a la sala (evento 'sugerencia_parcial') a medida que el modelo lo escribe.
+    """
+    emitir_progreso(socketio, contexto, 6, 'Generando sugerencias...')
+    enviados = {}
+
+    def al_avanzar(campo, valor, completo):
+        # Solo se envía el texto nuevo de cada campo; el valor completo va al cerrarse el campo
+        # o si el parcial no extiende lo ya enviado (un escape que se terminó de decodificar)
+        previo = enviados.get(campo, '')
+        evento = {'campo': campo, 'completo': completo}
+        if completo or not valor.startswith(previo):
+            evento['valor'] = valor
+        elif len(valor) > len(previo):
+            evento['delta'] = valor[len(previo):]
         else:
-            video = Video(
-                url_video=url_video,
-                title1=sugerencias.get('Título Opción 1', 'N/A'),
-                title2=sugerencias.get('Título Opción 2', 'N/A'),
-                title3=sugerencias.get('Título Opción 3', 'N/A'),
-                summary=sugerencias.get('Resumen', 'N/A'),
-                transcription=transcripcion_limpia
-            )
-            db.session.add(video)
-
-        db.session.commit()
-
-        socketio.emit('resultado', {
-            'sugerencias': sugerencias
-        }, room=session_id)
+            return
+        enviados[campo] = valor
+        socketio.emit('sugerencia_parcial', evento, room=contexto['session_id'])
+
+    contexto['metricas_generacion'] = {}
+    contexto['sugerencias'] = generar_sugerencias_claude_optimizado(
+        contexto['transcripcion_limpia'], contexto['titulo_actual'], al_avanzar=al_avanzar,
+        metricas=contexto['metricas_generacion'])
+
+def registrar_generacion(video, sugerencias, metricas=None):
+    """
+    Agrega una generación al historial del video y la deja como vigente. No hace commit.
+
+    Parámetros:
+    - video (Video): Video al que pertenece la generación.
+    - sugerencias (Sugerencias): Títulos y resumen generados.
+    - metricas (dict): Métricas de `generar_sugerencias_claude_optimizado`.
 
+    Retorna:
+    - Generation: Generación registrada.
+    """
+    metricas = metricas or {}
+    video.title1 = sugerencias.titulo1
+    video.title2 = sugerencias.titulo2
+    video.title3 = sugerencias.titulo3
+    video.summary = sugerencias.resumen
+    generacion = Generation(
+        video_id=video.video_id,
+        model_id=MODEL_ID,
+        prompt_version=PROMPT_VERSION,
+        title1=sugerencias.titulo1,
+        title2=sugerencias.titulo2,
+        title3=sugerencias.titulo3,
+        summary=sugerencias.resumen,
+        input_tokens=metricas.get('input_tokens'),
+        output_tokens=metricas.get('output_tokens'),
+        cache_read_tokens=metricas.get('cache_read_tokens'),
+        latency_ms=metricas.get('latency_ms'),
+        cached=bool(metricas.get('cached')),
+    )
+    db.session.add(generacion)
+    db.session.flush()
+    video.generation_id = generacion.id
+    return generacion
+
+def etapa_persistencia(contexto, socketio: SocketIO):
+    """
+    Guarda el video, su transcripción (comprimida) y la generación, y emite el resultado.
+    """
+    sugerencias = contexto['sugerencias']
+    video_id = contexto.get('video_id') or extraer_video_id(contexto['url_video'])
+
+    # Verificar si el video ya existe
+    video = db.session.get(Video, video_id)
+    if video is None:
+        video = Video(video_id=video_id, url_video=contexto['url_video'])
+        db.session.add(video)
+    video.source_title = contexto.get('titulo_actual') or video.source_title
+    video.duration = contexto.get('duracion') or video.duration
+    video.language = contexto.get('idioma') or video.language
+
+    if video.transcript is None:
+        video.transcript = Transcript(video_id=video_id)
+    video.transcript.texto = contexto['transcripcion_limpia']
+    video.transcript.language = video.language
+
+    registrar_generacion(video, sugerencias, contexto.get('metricas_generacion'))
+    actualizar_vector_busqueda(video, contexto['transcripcion_limpia'])
+    db.session.commit()
+    cache_sugerencias.guardar(video_id, sugerencias.a_dict())
+
+    socketio.emit('resultado', {
+        'sugerencias': sugerencias.a_dict()
+    }, room=contexto['session_id'])
+
+def sugerencias_guardadas(video_id):
+    """
+    Lee de la base de datos las sugerencias vigentes de un video (solo las cuatro columnas).
+
+    Parámetros:
+    - video_id (str): ID del video.
+
+    Retorna:
+    - dict: Sugerencias con las claves del frontend.
+    - None: Si el video no está procesado.
+    """
+    fila = db.session.query(Video.title1, Video.title2, Video.title3, Video.summary) \
+        .filter(Video.video_id == video_id).first()
+    return Sugerencias(*fila).a_dict() if fila else None
+
+def regenerar_sugerencias(video_id):
+    """
+    Genera de nuevo los títulos y el resumen de un video ya procesado a partir de su
+    transcripción guardada, sin descargar ni transcribir otra vez.
+
+    Parámetros:
+    - video_id (str): ID del video.
+
+    Retorna:
+    - Sugerencias: Nuevas sugerencias, ya guardadas como generación vigente.
+    - None: Si el video o su transcripción no existen.
+    """
+    video = db.session.get(Video, video_id)
+    if video is None or video.transcript is None:
+        return None
+    metricas = {}
+    transcripcion = video.transcript.texto
+    sugerencias = generar_sugerencias_claude_optimizado(
+        transcripcion, video.source_title or video.title1, usar_cache=False, metricas=metricas)
+    registrar_generacion(video, sugerencias, metricas)
+    actualizar_vector_busqueda(video, transcripcion)
+    db.session.commit()
+    cache_sugerencias.guardar(video_id, sugerencias.a_dict())
+    logger.info(f"Sugerencias regeneradas para {video_id}: generación {video.generation_id}.")
+    return sugerencias
+
+# Etapas del pipeline en orden de ejecución
+ETAPAS = [
+    ('descarga', etapa_descarga),
+    ('preparacion', etapa_preparacion),
+    ('subida', etapa_subida),
+    ('transcripcion', etapa_transcripcion),
+    ('generacion', etapa_generacion),
+    ('persistencia', etapa_persistencia),
+]
+
+def ejecutar_etapa(nombre, etapa, contexto, socketio: SocketIO):
+    """
+    Ejecuta una etapa registrando su duración en `video_etapa_duracion_segundos`; si falla,
+    cuenta el error de la etapa y propaga la excepción.
+
+    Parámetros:
+    - nombre (str): Nombre de la etapa.
+    - etapa (callable): Función (contexto, socketio) de la etapa.
+    - contexto (dict): Estado del video.
+    - socketio (SocketIO): Instancia de SocketIO para emitir eventos.
+    """
+    inicio = time.monotonic()
+    try:
+        etapa(contexto, socketio)
+    except Exception:
+        errores_etapa.inc(etapa=nombre)
+        raise
+    finally:
+        duracion = time.monotonic() - inicio
+        duracion_etapa.observar(duracion, etapa=nombre)
+    logger.debug(f"Etapa '{nombre}' completada en {duracion:.2f} s",
+                 extra={'etapa': nombre, 'duracion_s': round(duracion, 3), 'url_video': contexto.get('url_video')})
+
+def notificar_error(contexto, socketio: SocketIO, error):
+    """
+    Registra el error de un video y lo emite a su sala.
+    """
+    logger.error(f"Error en procesar_video ({contexto['url_video']}): {error}", exc_info=error)
+    socketio.emit('error', {'error': str(error)}, room=contexto['session_id'])
+
+def procesar_video(url_video, session_id, socketio: SocketIO):
+    """
+    Función para procesar el video completo de forma secuencial, sin pasar por el pipeline.
+    Si un intento anterior falló, continúa desde la primera etapa incompleta.
+
+    Retorna:
+    - bool: True si el video se procesó correctamente, False si hubo un error.
+    """
+    contexto = {'url_video': url_video, 'session_id': session_id}
+    logger.debug(f"Iniciando procesamiento del video con session_id: {session_id}")
+    try:
+        nombres = [nombre for nombre, _ in ETAPAS]
+        inicio = nombres.index(restaurar_checkpoint(contexto))
+        for nombre, etapa in ETAPAS[inicio:]:
+            ejecutar_etapa(nombre, etapa, contexto, socketio)
+            guardar_checkpoint(contexto, nombre)
+        videos_procesados.inc(resultado='ok')
+        return True
     except Exception as e:
-        logger.error(f"Error en procesar_video: {e}", exc_info=True)
-        socketio.emit('error', {'error': str(e)}, room=session_id)
+        videos_procesados.inc(resultado='error')
+        notificar_error(contexto, socketio, e)
+        return False
 
 def procesar_video_with_context(app, url_video, session_id, socketio):
     """
     Función envolvente para procesar el video dentro del contexto de la app.
     """
     with app.app_context():
-        procesar_video(url_video, session_id, socketio)
+        return procesar_video(url_video, session_id, socketio)
@@ -0,0 +1,164 @@
+# modules/result_cache.py
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from modules.metrics import consultas_cache
+
+logger = logging.getLogger(__name__)
+
+class AlmacenCompartido:
+    """
+    Almacén local compartido por los workers de una misma máquina: un archivo SQLite con
+    entradas (clave, valor JSON, expiración).
+    """
+
+    def __init__(self, ruta, ttl):
+        """
+        Parámetros:
+        - ruta (str): Archivo SQLite.
+        - ttl (float): Segundos de validez de cada entrada.
+        """
+        self.ruta = ruta
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conexion = sqlite3.connect(ruta, timeout=5, check_same_thread=False, isolation_level=None)
+        self._conexion.execute('PRAGMA journal_mode=WAL')
+        self._conexion.execute(
+            'CREATE TABLE IF NOT EXISTS cache (clave TEXT PRIMARY KEY, valor TEXT NOT NULL, expira REAL NOT NULL)')
+
+    def obtener(self, clave):
+        with self._lock:
+            fila = self._conexion.execute(
+                'SELECT valor FROM cache WHERE clave = ? AND expira > ?', (clave, time.time())).fetchone()
+        return json.loads(fila[0]) if fila else None
+
+    def guardar(self, clave, valor):
+        with self._lock:
+            self._conexion.execute(
+                'INSERT OR REPLACE INTO cache (clave, valor, expira) VALUES (?, ?, ?)',
+                (clave, json.dumps(valor, ensure_ascii=False), time.time() + self.ttl))
+
+    def invalidar(self, clave):
+        with self._lock:
+            self._conexion.execute('DELETE FROM cache WHERE clave = ?', (clave,))
+
+
+class CacheSugerencias:
+    """
+    Caché de lectura de las sugerencias de videos ya procesados, indexada por ID de video.
+
+    Primero busca en memoria (LRU con expiración, sin tocar la base de datos), después en el
+    almacén compartido opcional (`AlmacenCompartido`) y por último llama a la función de carga.
+    Al guardar nuevos resultados del video se actualizan la memoria del proceso y el almacén
+    compartido; las copias en memoria de otros procesos caducan a lo sumo en `ttl` segundos.
+    Los videos no encontrados no se guardan, porque pueden aparecer en cuanto termine su proceso.
+    """
+
+    def __init__(self, max_entradas=None, ttl=None, almacen=None):
+        """
+        Parámetros:
+        - max_entradas (int): Videos guardados en memoria (por defecto CACHE_SUGERENCIAS_MAX o 1024).
+        - ttl (float): Segundos de validez en memoria (por defecto CACHE_SUGERENCIAS_TTL o 60).
+        - almacen (AlmacenCompartido): Almacén compartido entre procesos, opcional.
+        """
+        self.max_entradas = max_entradas or int(os.getenv('CACHE_SUGERENCIAS_MAX', '1024'))
+        self.ttl = ttl or float(os.getenv('CACHE_SUGERENCIAS_TTL', '60'))
+        self.almacen = almacen
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, video_id, cargar):
+        """
+        Busca las sugerencias de un video, cargándolas si no están en caché.
+
+        Parámetros:
+        - video_id (str): ID del video.
+        - cargar (callable): Función sin argumentos que retorna las sugerencias (dict) o None.
+
+        Retorna:
+        - dict: Sugerencias del video.
+        - None: Si el video no está procesado.
+        """
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._entradas.get(video_id)
+            if entrada is not None and entrada[0] > ahora:
+                self._entradas.move_to_end(video_id)
+                self.aciertos += 1
+                consultas_cache.inc(resultado='acierto')
+                return entrada[1]
+        self.fallos += 1
+        consultas_cache.inc(resultado='fallo')
+
+        valor = None
+        if self.almacen is not None:
+            try:
+                valor = self.almacen.obtener(video_id)
+            except sqlite3.Error as e:
+                logger.warning(f"No se pudo leer el almacén compartido de sugerencias: {e}")
+        if valor is None:
+            valor = cargar()
+            if valor is not None and self.almacen is not None:
+                self._guardar_compartido(video_id, valor)
+        if valor is not None:
+            self._guardar_local(video_id, valor)
+        return valor
+
+    def guardar(self, video_id, valor):
+        """
+        Registra las sugerencias recién escritas de un video (reemplaza cualquier copia anterior).
+
+        Parámetros:
+        - video_id (str): ID del video.
+        - valor (dict): Sugerencias vigentes.
+        """
+        self._guardar_local(video_id, valor)
+        if self.almacen is not None:
+            self._guardar_compartido(video_id, valor)
+
+    def invalidar(self, video_id):
+        """
+        Elimina un video de la caché local y del almacén compartido.
+        """
+        with self._lock:
+            self._entradas.pop(video_id, None)
+        if self.almacen is not None:
+            try:
+                self.almacen.invalidar(video_id)
+            except sqlite3.Error as e:
+                logger.warning(f"No se pudo invalidar {video_id} en el almacén compartido: {e}")
+
+    def _guardar_local(self, video_id, valor):
+        with self._lock:
+            self._entradas[video_id] = (time.monotonic() + self.ttl, valor)
+            self._entradas.move_to_end(video_id)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def _guardar_compartido(self, video_id, valor):
+        try:
+            self.almacen.guardar(video_id, valor)
+        except sqlite3.Error as e:
+            logger.warning(f"No se pudo escribir el almacén compartido de sugerencias: {e}")
+
+
+def crear_cache_sugerencias():
+    """
+    Crea la caché según la configuración: con almacén compartido si CACHE_SUGERENCIAS_SQLITE
+    indica la ruta de un archivo (con validez CACHE_SUGERENCIAS_TTL_COMPARTIDO, 1 hora por defecto).
+    """
+    ruta = os.getenv('CACHE_SUGERENCIAS_SQLITE')
+    almacen = None
+    if ruta:
+        almacen = AlmacenCompartido(ruta, float(os.getenv('CACHE_SUGERENCIAS_TTL_COMPARTIDO', '3600')))
+    return CacheSugerencias(almacen=almacen)
+
+# Caché compartida por todas las solicitudes del proceso
+cache_sugerencias = crear_cache_sugerencias()
@@ -0,0 +1,118 @@
+# modules/search.py
+
+import os
+import re
+import logging
+from sqlalchemy import cast, func, inspect, or_, text
+from sqlalchemy.dialects.postgresql import REGCONFIG
+from modules.models import db, Video
+from modules.utils import extraer_video_id
+
+logger = logging.getLogger(__name__)
+
+# Configuración de texto de Postgres usada por la columna `videos.search_vector`
+CONFIG_TEXTO = 'spanish'
+COLUMNA_VECTOR = 'search_vector'
+# Caracteres de la transcripción que entran en el vector: un tsvector no puede pasar de 1 MB y
+# los títulos y el resumen ya describen el video completo
+MAX_TRANSCRIPCION = int(os.getenv('BUSQUEDA_MAX_TRANSCRIPCION', '100000'))
+
+_tiene_vector = {}
+
+def busqueda_texto_completo():
+    """
+    Indica si la búsqueda usa la columna tsvector.
+
+    Retorna:
+    - bool: True en Postgres; False en SQLite u otras bases.
+
+    Lanza:
+    - RuntimeError: Si la base es Postgres y `videos.search_vector` no existe; buscar con ILIKE
+      dejaría fuera la transcripción sin avisar.
+    """
+    motor = db.engine
+    if motor.url not in _tiene_vector:
+        disponible = False
+        if motor.dialect.name == 'postgresql':
+            columnas = {columna['name'] for columna in inspect(motor).get_columns(Video.__tablename__)}
+            if COLUMNA_VECTOR not in columnas:
+                raise RuntimeError("La tabla videos no tiene search_vector; ejecuta las migraciones (flask db upgrade).")
+            disponible = True
+        _tiene_vector[motor.url] = disponible
+    return _tiene_vector[motor.url]
+
+def video_buscado(termino):
+    """
+    Retorna:
+    - str: ID del video si el término es una URL de YouTube o un ID de video.
+    - None: Si el término es texto libre.
+    """
+    if re.fullmatch(r'[a-zA-Z0-9_-]{11}', termino):
+        return termino
+    return extraer_video_id(termino)
+
+def buscar_videos(termino):
+    """
+    Construye la consulta de videos para un término de búsqueda.
+
+    En Postgres busca con `websearch_to_tsquery` sobre la columna `search_vector` (títulos con
+    peso A, resumen B y transcripción C, con índice GIN) y ordena por relevancia. En otras
+    bases (SQLite en pruebas) usa ILIKE sobre títulos, resumen y URL; la transcripción está
+    comprimida en `transcripts` y no se puede buscar ahí. Si el término es una URL o un ID de
+    video, también se busca ese video por su clave.
+
+    Parámetros:
+    - termino (str): Texto escrito por el usuario.
+
+    Retorna:
+    - tuple: (consulta, relevancia): consulta de `Video` filtrada y sin ordenar, y la expresión
+      de relevancia (None en el modo ILIKE). `modules.pagination.paginar_busqueda` ordena por
+      relevancia, fecha e ID de forma descendente.
+    """
+    termino = termino.strip()
+    video_id = video_buscado(termino)
+
+    if busqueda_texto_completo():
+        vector = Video.search_vector
+        consulta_ts = func.websearch_to_tsquery(cast(CONFIG_TEXTO, REGCONFIG), termino)
+        condicion = vector.op('@@')(consulta_ts)
+        if video_id:
+            condicion = or_(condicion, Video.video_id == video_id)
+        return Video.query.filter(condicion), func.ts_rank_cd(vector, consulta_ts)
+
+    patron = f'%{termino}%'
+    condicion = or_(
+        Video.title1.ilike(patron),
+        Video.title2.ilike(patron),
+        Video.title3.ilike(patron),
+        Video.summary.ilike(patron),
+        Video.url_video.ilike(patron),
+    )
+    if video_id:
+        condicion = or_(condicion, Video.video_id == video_id)
+    return Video.query.filter(condicion), None
+
+def actualizar_vector_busqueda(video, transcripcion):
+    """
+    Recalcula `videos.search_vector` con los títulos y el resumen vigentes y los primeros
+    `MAX_TRANSCRIPCION` caracteres de la transcripción. No hace nada fuera de Postgres. No hace commit.
+
+    Parámetros:
+    - video (Video): Video ya guardado en la sesión.
+    - transcripcion (str): Transcripción sin comprimir.
+    """
+    if not busqueda_texto_completo():
+        return
+    db.session.execute(text(f"""
+        UPDATE videos SET {COLUMNA_VECTOR} =
+            setweight(to_tsvector(CAST(:config AS regconfig), :titulos), 'A') ||
+            setweight(to_tsvector(CAST(:config AS regconfig), :resumen), 'B') ||
+            setweight(to_tsvector(CAST(:config AS regconfig), :transcripcion), 'C')
+        WHERE video_id = :video_id
+    """), {
+        'config': CONFIG_TEXTO,
+        'titulos': ' '.join([video.title1, video.title2, video.title3]),
+        'resumen': video.summary,
+        'transcripcion': (transcripcion or '')[:MAX_TRANSCRIPCION],
+        'video_id': video.video_id,
+    })
@@ -0,0 +1,140 @@
+# modules/singleflight.py
+
+import logging
+import threading
+from sqlalchemy.exc import IntegrityError
+from modules.models import db, Job
+
+logger = logging.getLogger(__name__)
+
+class RegistroEnVuelo:
+    """
+    Registro de videos en procesamiento, indexado por la URL limpia.
+
+    Garantiza que solo exista un trabajo activo por URL. Las solicitudes repetidas no lanzan
+    un nuevo pipeline: su session_id queda como alias de la sala del trabajo en curso, de modo
+    que al unirse reciben los mismos eventos 'progreso' y 'resultado'.
+
+    Con `local=False` (procesos web y workers separados) no se recuerdan las URLs en vuelo ni
+    los alias, porque el trabajo termina en otro proceso: cada consulta va a la tabla `jobs` y
+    el cliente se une directamente a la sala que se le responde. Entre procesos, el índice único
+    parcial `ux_jobs_url_video_activo` impide que dos solicitudes simultáneas creen dos trabajos.
+    """
+
+    def __init__(self, local=True):
+        self.local = local
+        self._lock = threading.Lock()
+        self._salas = {}   # url_video -> sala (session_id del trabajo en curso)
+        self._alias = {}   # session_id adjunto -> sala
+
+    def adquirir(self, url_video, session_id, crear_trabajo):
+        """
+        Registra un trabajo para la URL o adjunta la sesión al trabajo que ya está en vuelo.
+
+        Parámetros:
+        - url_video (str): URL limpia del video.
+        - session_id (str): Sala de la solicitud actual.
+        - crear_trabajo (callable): Función sin argumentos que crea y retorna el Job; solo se
+          llama si no hay un trabajo activo para la URL.
+
+        Retorna:
+        - tuple: (sala, es_nuevo).
+        """
+        with self._lock:
+            sala = self._salas.get(url_video) if self.local else None
+            if sala is None:
+                # Tras un reinicio el registro en memoria está vacío; la tabla jobs manda
+                sala = self._sala_activa(url_video)
+
+            if sala is None:
+                try:
+                    job = crear_trabajo()
+                except IntegrityError:
+                    # Otro proceso creó el trabajo entre la consulta y la inserción
+                    db.session.rollback()
+                    sala = self._sala_activa(url_video)
+                    if sala is None:
+                        raise
+                else:
+                    self._recordar(url_video, job.session_id)
+                    return job.session_id, True
+
+            if session_id != sala and self.local:
+                self._alias[session_id] = sala
+            logger.info(f"Sesión {session_id} adjuntada al trabajo en curso de {url_video} (sala {sala}).")
+            return sala, False
+
+    def adquirir_varios(self, urls, crear_trabajos):
+        """
+        Variante por lotes de `adquirir`: registra trabajos solo para las URLs sin trabajo activo.
+
+        Parámetros:
+        - urls (list): URLs limpias de los videos.
+        - crear_trabajos (callable): Función que recibe la lista de URLs libres y retorna los Jobs creados.
+
+        Retorna:
+        - tuple: (jobs_creados, urls_en_curso).
+        """
+        with self._lock:
+            en_curso = {url for url in urls if url in self._salas} if self.local else set()
+            en_curso |= self._urls_activas([url for url in urls if url not in en_curso])
+            while True:
+                libres = [url for url in urls if url not in en_curso]
+                try:
+                    jobs = crear_trabajos(libres) if libres else []
+                    break
+                except IntegrityError:
+                    # Otro proceso encoló alguna de las URLs; se reintenta con las que siguen libres
+                    db.session.rollback()
+                    ocupadas = self._urls_activas(libres)
+                    if not ocupadas:
+                        raise
+                    en_curso |= ocupadas
+            for job in jobs:
+                self._recordar(job.url_video, job.session_id)
+            return jobs, [url for url in urls if url in en_curso]
+
+    def _sala_activa(self, url_video):
+        job = Job.query.filter(
+            Job.url_video == url_video,
+            Job.status.in_([Job.STATUS_PENDING, Job.STATUS_RUNNING])
+        ).order_by(Job.id.asc()).first()
+        if job is None:
+            return None
+        self._recordar(url_video, job.session_id)
+        return job.session_id
+
+    def _urls_activas(self, urls):
+        if not urls:
+            return set()
+        activos = Job.query.filter(
+            Job.url_video.in_(urls),
+            Job.status.in_([Job.STATUS_PENDING, Job.STATUS_RUNNING])
+        ).all()
+        for job in activos:
+            self._recordar(job.url_video, job.session_id)
+        return {job.url_video for job in activos}
+
+    def _recordar(self, url_video, sala):
+        if self.local:
+            self._salas[url_video] = sala
+
+    def sala_de(self, session_id):
+        """
+        Retorna:
+        - str: Sala a la que debe unirse la sesión (la propia si no está adjunta a otro trabajo).
+        """
+        with self._lock:
+            return self._alias.get(session_id, session_id)
+
+    def liberar(self, url_video):
+        """
+        Elimina la URL del registro cuando su trabajo termina, junto con los alias de su sala.
+
+        Parámetros:
+        - url_video (str): URL limpia del video.
+        """
+        with self._lock:
+            sala = self._salas.pop(url_video, None)
+            if sala is not None:
+                self._alias = {alias: destino for alias, destino in self._alias.items() if destino != sala}
@@ -0,0 +1,129 @@
+# modules/structured_output.py
+
+import json
+import unicodedata
+from dataclasses import dataclass
+from modules.json_incremental import ExtractorCamposJSON
+
+# Límites de YouTube para títulos y descripciones
+MAX_CARACTERES_TITULO = 100
+MAX_CARACTERES_RESUMEN = 5000
+
+class SugerenciasInvalidas(Exception):
+    """
+    La respuesta del modelo no contiene un JSON válido con los cuatro campos esperados.
+    """
+
+@dataclass(frozen=True)
+class Sugerencias:
+    """
+    Títulos y resumen generados para un video.
+    """
+    titulo1: str
+    titulo2: str
+    titulo3: str
+    resumen: str
+
+    # Clave del JSON del modelo -> atributo
+    CAMPOS = {
+        'Título Opción 1': 'titulo1',
+        'Título Opción 2': 'titulo2',
+        'Título Opción 3': 'titulo3',
+        'Resumen': 'resumen',
+    }
+
+    def a_dict(self):
+        """
+        Retorna:
+        - dict: Sugerencias con las claves que usan el frontend y la API.
+        """
+        return {clave: getattr(self, atributo) for clave, atributo in self.CAMPOS.items()}
+
+    def a_json(self):
+        return json.dumps(self.a_dict(), indent=4, ensure_ascii=False)
+
+def _normalizar_clave(clave):
+    sin_acentos = unicodedata.normalize('NFD', clave).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(sin_acentos.lower().split())
+
+_CLAVES_NORMALIZADAS = {_normalizar_clave(clave): atributo for clave, atributo in Sugerencias.CAMPOS.items()}
+
+def extraer_json(texto):
+    """
+    Extrae el primer objeto JSON de una respuesta que puede venir envuelta en prosa o en un
+    bloque ```json.
+
+    Parámetros:
+    - texto (str): Respuesta del modelo.
+
+    Retorna:
+    - dict: Objeto encontrado.
+
+    Lanza:
+    - SugerenciasInvalidas: Si no hay ningún objeto JSON legible.
+    """
+    decoder = json.JSONDecoder(strict=False)
+    inicio = texto.find('{')
+    while inicio != -1:
+        try:
+            objeto, _ = decoder.raw_decode(texto, inicio)
+            if isinstance(objeto, dict):
+                return objeto
+        except ValueError:
+            pass
+        inicio = texto.find('{', inicio + 1)
+
+    # Último recurso: recuperar los campos de texto aunque el objeto esté mal cerrado
+    extractor = ExtractorCamposJSON()
+    extractor.alimentar(texto)
+    if extractor.campos:
+        return extractor.campos
+    raise SugerenciasInvalidas("La respuesta no contiene un objeto JSON.")
+
+def validar_sugerencias(datos):
+    """
+    Valida un objeto contra el esquema de sugerencias.
+
+    Acepta claves sin acentos o con otras mayúsculas ('Titulo opcion 1'). Los títulos deben
+    tener como máximo `MAX_CARACTERES_TITULO` caracteres y el resumen `MAX_CARACTERES_RESUMEN`.
+
+    Parámetros:
+    - datos (dict): Objeto extraído de la respuesta.
+
+    Retorna:
+    - Sugerencias: Sugerencias validadas.
+
+    Lanza:
+    - SugerenciasInvalidas: Con la lista de problemas encontrados.
+    """
+    valores = {}
+    for clave, valor in datos.items():
+        atributo = _CLAVES_NORMALIZADAS.get(_normalizar_clave(str(clave)))
+        if atributo:
+            valores[atributo] = valor
+
+    errores = []
+    for clave, atributo in Sugerencias.CAMPOS.items():
+        valor = valores.get(atributo)
+        if not isinstance(valor, str) or not valor.strip():
+            errores.append(f'Falta el campo "{clave}" o no es un texto.')
+            continue
+        valores[atributo] = valor.strip()
+        limite = MAX_CARACTERES_RESUMEN if atributo == 'resumen' else MAX_CARACTERES_TITULO
+        if len(valores[atributo]) > limite:
+            errores.append(f'El campo "{clave}" supera los {limite} caracteres.')
+    if errores:
+        raise SugerenciasInvalidas(' '.join(errores))
+    return Sugerencias(**{atributo: valores[atributo] for atributo in Sugerencias.CAMPOS.values()})
+
+def parsear_sugerencias(texto):
+    """
+    Extrae y valida las sugerencias de la respuesta del modelo.
+
+    Retorna:
+    - Sugerencias: Sugerencias validadas.
+
+    Lanza:
+    - SugerenciasInvalidas: Si la respuesta no se puede interpretar o no cumple el esquema.
+    """
+    return validar_sugerencias(extraer_json(texto))
@@ -0,0 +1,254 @@
+# modules/transcribe_poller.py
+
+import os
+import time
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from botocore.exceptions import ClientError
+
+from .aws_services import transcribe, s3
+from .metrics import greenlets_activos
+
+logger = logging.getLogger(__name__)
+
+PREFIJO_TRABAJOS = 'transcripcion-'
+
+class FuenteListadoTranscribe:
+    """
+    Fuente de finalización que consulta los trabajos terminados con `list_transcription_jobs`.
+
+    Una sola pasada (COMPLETED y FAILED) resuelve todos los trabajos en espera, sin importar
+    cuántos sean. El listado viene ordenado del más reciente al más antiguo, así que se deja
+    de paginar al llegar a trabajos anteriores al más antiguo en espera.
+    """
+
+    def __init__(self, prefijo=PREFIJO_TRABAJOS, max_paginas=5):
+        self.prefijo = prefijo
+        self.max_paginas = max_paginas
+
+    def revisar(self, pendientes):
+        """
+        Parámetros:
+        - pendientes (dict): job_name -> fecha (UTC) desde la que se espera el trabajo.
+
+        Retorna:
+        - dict: job_name -> 'COMPLETED' o 'FAILED' para los trabajos encontrados.
+        """
+        encontrados = {}
+        limite = min(pendientes.values()) - timedelta(minutes=10)
+        for estado in ('COMPLETED', 'FAILED'):
+            kwargs = {'Status': estado, 'JobNameContains': self.prefijo, 'MaxResults': 100}
+            for _ in range(self.max_paginas):
+                respuesta = transcribe.list_transcription_jobs(**kwargs)
+                resumenes = respuesta.get('TranscriptionJobSummaries', [])
+                for resumen in resumenes:
+                    if resumen['TranscriptionJobName'] in pendientes:
+                        encontrados[resumen['TranscriptionJobName']] = estado
+                mas_antiguo = resumenes[-1].get('CreationTime') if resumenes else None
+                if (not respuesta.get('NextToken')
+                        or len(encontrados) == len(pendientes)
+                        or (mas_antiguo is not None and mas_antiguo < limite)):
+                    break
+                kwargs['NextToken'] = respuesta['NextToken']
+        return encontrados
+
+class FuenteSalidaS3:
+    """
+    Fuente de finalización que detecta el JSON de salida de Transcribe en S3.
+
+    Solo aplica cuando los trabajos escriben en un bucket propio (TRANSCRIBE_OUTPUT_BUCKET).
+    Detecta los trabajos completados; los fallidos los sigue resolviendo el listado. Como
+    cuesta una llamada por trabajo, solo recibe los trabajos vencidos.
+    """
+
+    por_trabajo = True
+
+    def __init__(self, bucket_name, prefijo):
+        self.bucket_name = bucket_name
+        self.prefijo = prefijo
+
+    def revisar(self, pendientes):
+        encontrados = {}
+        for job_name in pendientes:
+            try:
+                s3.head_object(Bucket=self.bucket_name, Key=f"{self.prefijo}{job_name}.json")
+                encontrados[job_name] = 'COMPLETED'
+            except ClientError as e:
+                if e.response['Error']['Code'] not in ('404', 'NoSuchKey'):
+                    raise
+        return encontrados
+
+class SondeoTranscripciones:
+    """
+    Sondeo compartido de trabajos de AWS Transcribe.
+
+    Un único greenlet revisa en cada pasada todos los trabajos pendientes a través de las
+    fuentes configuradas, en lugar de que cada video consulte su trabajo cada 5 segundos.
+    La primera revisión de un trabajo se programa según la duración del audio y las
+    siguientes se espacian con backoff exponencial hasta `intervalo_maximo`.
+    """
+
+    def __init__(self, fuentes=None, factor_duracion=0.3, intervalo_minimo=10.0,
+                 intervalo_maximo=60.0, backoff=1.5, rondas_para_consulta_directa=3):
+        """
+        Parámetros:
+        - fuentes (list): Fuentes de finalización, consultadas en orden.
+        - factor_duracion (float): Fracción de la duración del audio antes de la primera revisión.
+        - intervalo_minimo (float): Segundos mínimos entre revisiones de un trabajo.
+        - intervalo_maximo (float): Segundos máximos entre revisiones de un trabajo.
+        - backoff (float): Multiplicador del intervalo tras cada revisión sin resultado.
+        - rondas_para_consulta_directa (int): Revisiones sin resultado tras las que el trabajo
+          se consulta con `get_transcription_job` (p. ej. trabajos antiguos reanudados).
+        """
+        self.fuentes = fuentes if fuentes is not None else fuentes_por_defecto()
+        self.factor_duracion = factor_duracion
+        self.intervalo_minimo = intervalo_minimo
+        self.intervalo_maximo = intervalo_maximo
+        self.backoff = backoff
+        self.rondas_para_consulta_directa = rondas_para_consulta_directa
+        self._lock = threading.Lock()
+        self._trabajos = {}
+        self._despertar = threading.Event()
+        self._activo = False
+
+    def esperar(self, job_name, socketio, duracion_audio=None, timeout=None, al_esperar=None, intervalo_aviso=30.0):
+        """
+        Bloquea el greenlet actual hasta que el trabajo termine.
+
+        Parámetros:
+        - job_name (str): Nombre del trabajo de transcripción.
+        - socketio (SocketIO): Instancia de SocketIO usada para lanzar el greenlet de sondeo.
+        - duracion_audio (float): Duración del audio en segundos, si se conoce.
+        - timeout (float): Segundos máximos de espera.
+        - al_esperar (callable): Función llamada cada `intervalo_aviso` segundos mientras se espera.
+        - intervalo_aviso (float): Segundos entre llamadas a `al_esperar`.
+
+        Retorna:
+        - str: Estado final del trabajo ('COMPLETED' o 'FAILED').
+
+        Lanza:
+        - TimeoutError: Si el trabajo no termina dentro de `timeout`.
+        """
+        espera_inicial = max(self.intervalo_minimo, (duracion_audio or 0) * self.factor_duracion)
+        trabajo = {
+            'evento': threading.Event(),
+            'estado': None,
+            'desde': datetime.now(timezone.utc),
+            'proxima': time.monotonic() + espera_inicial,
+            'intervalo': self.intervalo_minimo,
+            'rondas': 0,
+            'esperando': 0,
+        }
+        with self._lock:
+            trabajo = self._trabajos.setdefault(job_name, trabajo)
+            # Varios greenlets pueden esperar el mismo trabajo (p. ej. un reintento); la
+            # entrada solo se retira cuando se va el último
+            trabajo['esperando'] += 1
+            if not self._activo:
+                self._activo = True
+                socketio.start_background_task(self._bucle)
+        self._despertar.set()
+
+        limite = None if timeout is None else time.monotonic() + timeout
+        proximo_aviso = time.monotonic() + intervalo_aviso
+        while True:
+            ahora = time.monotonic()
+            tramo = proximo_aviso - ahora
+            if limite is not None:
+                tramo = min(tramo, limite - ahora)
+            if trabajo['evento'].wait(max(0, tramo)):
+                break
+            ahora = time.monotonic()
+            if limite is not None and ahora >= limite:
+                with self._lock:
+                    trabajo['esperando'] -= 1
+                    if trabajo['esperando'] <= 0 and self._trabajos.get(job_name) is trabajo:
+                        del self._trabajos[job_name]
+                raise TimeoutError(f"El trabajo de transcripción '{job_name}' no terminó a tiempo.")
+            if ahora >= proximo_aviso:
+                proximo_aviso = ahora + intervalo_aviso
+                if al_esperar:
+                    al_esperar()
+        return trabajo['estado']
+
+    def _bucle(self):
+        greenlets_activos.inc(origen='sondeo_transcribe')
+        try:
+            while True:
+                try:
+                    espera = self._pasada()
+                except Exception as e:
+                    logger.error(f"Error en el sondeo de transcripciones: {e}", exc_info=True)
+                    espera = self.intervalo_maximo
+                self._despertar.wait(espera)
+                self._despertar.clear()
+        finally:
+            greenlets_activos.dec(origen='sondeo_transcribe')
+
+    def _pasada(self):
+        """
+        Revisa los trabajos vencidos y retorna los segundos hasta la siguiente revisión.
+        """
+        ahora = time.monotonic()
+        with self._lock:
+            if not self._trabajos:
+                return self.intervalo_maximo
+            vencidos = {nombre: t for nombre, t in self._trabajos.items() if t['proxima'] <= ahora}
+            if not vencidos:
+                return max(0.5, min(t['proxima'] for t in self._trabajos.values()) - ahora)
+            pendientes = {nombre: t['desde'] for nombre, t in self._trabajos.items()}
+
+        resueltos = {}
+        for fuente in self.fuentes:
+            candidatos = vencidos if getattr(fuente, 'por_trabajo', False) else pendientes
+            restantes = {nombre: pendientes[nombre] for nombre in candidatos if nombre not in resueltos}
+            if restantes:
+                resueltos.update(fuente.revisar(restantes))
+
+        # Consulta directa de los trabajos que el listado no ha encontrado tras varias rondas
+        for nombre, trabajo in vencidos.items():
+            if nombre not in resueltos and trabajo['rondas'] + 1 >= self.rondas_para_consulta_directa:
+                estado = consultar_estado(nombre)
+                if estado in ('COMPLETED', 'FAILED'):
+                    resueltos[nombre] = estado
+
+        with self._lock:
+            for nombre, estado in resueltos.items():
+                trabajo = self._trabajos.pop(nombre, None)
+                if trabajo:
+                    trabajo['estado'] = estado
+                    trabajo['evento'].set()
+            for nombre, trabajo in vencidos.items():
+                if nombre in self._trabajos:
+                    trabajo['rondas'] += 1
+                    trabajo['intervalo'] = min(self.intervalo_maximo, trabajo['intervalo'] * self.backoff)
+                    trabajo['proxima'] = ahora + trabajo['intervalo']
+            if resueltos:
+                logger.info(f"Sondeo de transcripciones: {len(resueltos)} terminados, {len(self._trabajos)} en espera.")
+            if not self._trabajos:
+                return self.intervalo_maximo
+            return max(0.5, min(t['proxima'] for t in self._trabajos.values()) - time.monotonic())
+
+def consultar_estado(job_name):
+    """
+    Retorna:
+    - str: Estado del trabajo según `get_transcription_job`.
+    """
+    status = transcribe.get_transcription_job(TranscriptionJobName=job_name)
+    return status['TranscriptionJob']['TranscriptionJobStatus']
+
+def fuentes_por_defecto():
+    """
+    Fuentes de finalización según la configuración: la salida en S3 (si hay bucket propio)
+    y el listado de Transcribe.
+    """
+    fuentes = []
+    bucket_salida = os.getenv('TRANSCRIBE_OUTPUT_BUCKET')
+    if bucket_salida:
+        fuentes.append(FuenteSalidaS3(bucket_salida, os.getenv('TRANSCRIBE_OUTPUT_PREFIX', 'transcripciones/')))
+    fuentes.append(FuenteListadoTranscribe())
+    return fuentes
+
+# Sondeo compartido por todos los greenlets del proceso
+sondeo_transcripciones = SondeoTranscripciones()
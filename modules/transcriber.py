@@ -1,50 +1,223 @@
 # modules/transcriber.py
 
-import time
+import os
 from flask_socketio import SocketIO
 import requests
 import json
 import re
+import codecs
 import logging
+from contextlib import contextmanager
+from requests.adapters import HTTPAdapter
+from botocore.exceptions import ClientError
 
-from .aws_services import transcribe
+from .aws_services import transcribe, s3, ubicacion_salida_transcripcion
+from .transcribe_poller import sondeo_transcripciones
 
-def obtener_transcripcion(job_name, session_id, socketio: SocketIO):
+# Segundos máximos de espera por un trabajo de transcripción
+TIMEOUT_TRANSCRIPCION = float(os.getenv('TIMEOUT_TRANSCRIPCION', '14400'))
+# (conexión, lectura) en segundos para descargar el JSON de salida de Transcribe
+TIMEOUT_SALIDA = (float(os.getenv('TRANSCRIPCION_TIMEOUT_CONEXION', '5')),
+                  float(os.getenv('TRANSCRIPCION_TIMEOUT_LECTURA', '60')))
+TAMANO_BLOQUE_SALIDA = 64 * 1024
+
+# El texto está en results.transcripts, antes de los 'items' por palabra que ocupan casi todo el archivo
+PATRON_TRANSCRIPTS = re.compile(r'"transcripts"\s*:\s*\[')
+SOLAPE_PATRON = 64
+# Dentro de una cadena solo importan las comillas y los escapes; fuera, la estructura
+PATRON_EN_CADENA = re.compile(r'["\\]')
+PATRON_ESTRUCTURA = re.compile(r'[\[\]{}"]')
+
+def crear_sesion_salida(conexiones=None):
+    """
+    Sesión HTTP compartida para los JSON de salida de Transcribe: reutiliza las conexiones
+    TLS con S3 en lugar de abrir una por transcripción.
+
+    Parámetros:
+    - conexiones (int): Conexiones por host (por defecto los workers de transcripción).
+
+    Retorna:
+    - requests.Session: Sesión configurada.
+    """
+    conexiones = conexiones or int(os.getenv('LIMITE_TRANSCRIPCION', '10'))
+    sesion = requests.Session()
+    adaptador = HTTPAdapter(pool_connections=2, pool_maxsize=conexiones)
+    sesion.mount('https://', adaptador)
+    sesion.mount('http://', adaptador)
+    return sesion
+
+sesion_salida = crear_sesion_salida()
+
+def obtener_transcripcion(job_name, session_id, socketio: SocketIO, duracion_audio=None, estado_inicial=None, detalles=None,
+                          segmentos=False):
     """
     Obtiene la transcripción de un trabajo de transcripción en AWS Transcribe.
 
+    La espera no consulta el trabajo por su cuenta: se registra en el sondeo compartido
+    (`sondeo_transcripciones`), que revisa todos los trabajos pendientes en cada pasada.
+
     Parámetros:
     - job_name (str): Nombre del trabajo de transcripción.
     - session_id (str): ID de sesión para emitir eventos a través de SocketIO.
     - socketio (SocketIO): Instancia de SocketIO para emitir eventos.
+    - duracion_audio (float): Duración del audio en segundos, para programar la primera revisión.
+    - estado_inicial (dict): Respuesta de `iniciar_transcripcion`; si el trabajo ya está
+      completado se omite la espera.
+    - detalles (dict): Si se indica, recibe 'idioma' con el código detectado por Transcribe
+      y, con `segmentos`, 'segmentos' (ver `leer_salida_transcripcion`).
+    - segmentos (bool): Si además se leen los tiempos de los segmentos.
 
     Retorna:
     - str: Texto transcrito.
     """
-    while True:
+    try:
+        trabajo = (estado_inicial or {}).get('TranscriptionJob', {})
+        if trabajo.get('TranscriptionJobStatus') != 'COMPLETED':
+            estado = sondeo_transcripciones.esperar(
+                job_name,
+                socketio,
+                duracion_audio=duracion_audio,
+                timeout=TIMEOUT_TRANSCRIPCION,
+                al_esperar=lambda: socketio.emit('progreso_transcripcion', {'data': 'Transcribiendo... Por favor espera.'}, room=session_id)
+            )
+            if estado == 'FAILED':
+                raise Exception("La transcripción falló.")
+            trabajo = transcribe.get_transcription_job(TranscriptionJobName=job_name)['TranscriptionJob']
+
+        if detalles is not None:
+            detalles['idioma'] = trabajo.get('LanguageCode')
+        with abrir_salida_transcripcion(job_name, trabajo['Transcript']['TranscriptFileUri']) as flujo:
+            salida = leer_salida_transcripcion(flujo, segmentos=segmentos)
+        if segmentos and detalles is not None:
+            detalles['segmentos'] = salida['segmentos']
+        return salida['texto']
+
+    except Exception as e:
+        logging.error(f"Error al obtener la transcripción: {e}")
+        raise e
+
+@contextmanager
+def abrir_salida_transcripcion(job_name, transcript_file_uri):
+    """
+    Abre el JSON de salida de un trabajo como flujo de bytes, sin descargarlo completo.
+
+    Con un bucket de salida propio (TRANSCRIBE_OUTPUT_BUCKET) se lee con GetObject, porque
+    esa URI no está firmada; si no, se descarga la URI firmada con la sesión compartida.
+    El flujo se cierra al salir del bloque `with`, aunque no se haya leído entero.
+
+    Parámetros:
+    - job_name (str): Nombre del trabajo.
+    - transcript_file_uri (str): 'TranscriptFileUri' del trabajo.
+    """
+    salida = ubicacion_salida_transcripcion(job_name)
+    cuerpo = None
+    if salida:
+        bucket, clave = salida
         try:
-            status = transcribe.get_transcription_job(TranscriptionJobName=job_name)
-            job_status = status['TranscriptionJob']['TranscriptionJobStatus']
+            cuerpo = s3.get_object(Bucket=bucket, Key=clave)['Body']
+        except ClientError as e:
+            # Trabajos iniciados antes de configurar el bucket de salida
+            if e.response['Error']['Code'] not in ('404', 'NoSuchKey'):
+                raise
+            logging.info(f"Salida de {job_name} no encontrada en s3://{bucket}/{clave}; se usa su URI.")
+    if cuerpo is not None:
+        try:
+            yield cuerpo
+        finally:
+            cuerpo.close()
+        return
 
-            if job_status == 'COMPLETED':
-                transcript_file_uri = status['TranscriptionJob']['Transcript']['TranscriptFileUri']
-                response = requests.get(transcript_file_uri)
-                transcript_json = response.json()
-                transcripcion = transcript_json['results']['transcripts'][0]['transcript']
-                return transcripcion
+    respuesta = sesion_salida.get(transcript_file_uri, stream=True, timeout=TIMEOUT_SALIDA)
+    try:
+        respuesta.raise_for_status()
+        respuesta.raw.decode_content = True
+        yield respuesta.raw
+    finally:
+        respuesta.close()
 
-            elif job_status == 'FAILED':
-                raise Exception("La transcripción falló.")
+def leer_salida_transcripcion(flujo, segmentos=False, tamano_bloque=TAMANO_BLOQUE_SALIDA):
+    """
+    Lee el texto del JSON de salida de Transcribe de forma incremental, sin construir los
+    'items' por palabra (timestamps y alternativas), que son la mayor parte del archivo.
 
-            else:
-                # Emitir evento de progreso
-                socketio.emit('progreso_transcripcion', {'data': 'Transcribiendo... Por favor espera.'}, room=session_id)
+    Sin `segmentos` la lectura se detiene al terminar `results.transcripts`. Con `segmentos`
+    se decodifica el archivo completo.
+
+    Parámetros:
+    - flujo: Objeto con `read(n)` que entrega bytes.
+    - segmentos (bool): Si además se leen los tiempos de `results.audio_segments`.
+    - tamano_bloque (int): Bytes por lectura.
 
-            socketio.sleep(5)  # Usa socketio.sleep con Gevent
+    Retorna:
+    - dict: 'texto' (el de la primera transcripción) y 'segmentos' (lista de (inicio, fin, texto)
+      en segundos, o None si no se pidieron).
+
+    Lanza:
+    - ValueError: Si el JSON no tiene `results.transcripts`.
+    """
+    if segmentos:
+        resultados = json.load(flujo).get('results', {})
+        textos = [t.get('transcript', '') for t in resultados.get('transcripts', [])]
+        lista = [_segmento(s) for s in resultados.get('audio_segments', [])]
+    else:
+        textos, lista = _leer_transcripts(flujo, tamano_bloque), None
+    if not textos:
+        raise ValueError("La salida de Transcribe no contiene 'results.transcripts'.")
+    return {'texto': textos[0], 'segmentos': lista}
 
-        except Exception as e:
-            logging.error(f"Error al obtener la transcripción: {e}")
-            raise e
+def _segmento(segmento):
+    return float(segmento['start_time']), float(segmento['end_time']), segmento.get('transcript', '')
+
+def _leer_transcripts(flujo, tamano_bloque):
+    """
+    Lee bloques hasta encontrar el cierre del arreglo `transcripts` y solo entonces lo decodifica.
+
+    Cada bloque se examina una sola vez: se sigue la profundidad de corchetes y llaves saltando
+    el contenido de las cadenas, así que el costo es lineal en los bytes leídos.
+    """
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    texto = ''
+    inicio = None
+    posicion = 0
+    profundidad = 0
+    en_cadena = False
+    while True:
+        bloque = flujo.read(tamano_bloque)
+        texto += utf8.decode(bloque or b'', final=not bloque)
+        if inicio is None:
+            # Se repasa solo la cola ya leída que podría contener el comienzo de la clave
+            coincidencia = PATRON_TRANSCRIPTS.search(texto, max(0, posicion - SOLAPE_PATRON))
+            if coincidencia:
+                inicio = posicion = coincidencia.end() - 1
+            else:
+                posicion = len(texto)
+        if inicio is not None:
+            while True:
+                patron = PATRON_EN_CADENA if en_cadena else PATRON_ESTRUCTURA
+                coincidencia = patron.search(texto, posicion)
+                if coincidencia is None:
+                    posicion = len(texto)
+                    break
+                caracter = coincidencia.group()
+                if caracter == '\\':
+                    if coincidencia.end() >= len(texto):
+                        # Escape partido entre bloques: se revisa de nuevo con el siguiente
+                        posicion = coincidencia.start()
+                        break
+                    posicion = coincidencia.end() + 1
+                    continue
+                posicion = coincidencia.end()
+                if caracter == '"':
+                    en_cadena = not en_cadena
+                elif caracter in '[{':
+                    profundidad += 1
+                else:
+                    profundidad -= 1
+                    if profundidad == 0:
+                        transcripts = json.loads(texto[inicio:posicion])
+                        return [t.get('transcript', '') for t in transcripts]
+        if not bloque:
+            return []
 
 def limpiar_texto(texto):
     """
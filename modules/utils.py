@@ -20,3 +20,17 @@ def limpiar_youtube_url(url):
         return f'https://www.youtube.com/watch?v={video_id}'
     else:
         return None
+
+def extraer_video_id(url):
+    """
+    Obtiene el ID de 11 caracteres de un video de YouTube.
+
+    Parámetros:
+    - url (str): URL del video (en cualquier formato aceptado por `limpiar_youtube_url`).
+
+    Retorna:
+    - str: ID del video.
+    - None: Si la URL no es válida.
+    """
+    url_limpia = limpiar_youtube_url(url)
+    return url_limpia.rsplit('=', 1)[-1] if url_limpia else None
@@ -1,17 +1,85 @@
 # modules/youtube_man.py
 
 import os
+import logging
+import requests
 import yt_dlp
+from modules.utils import limpiar_youtube_url, extraer_video_id
+from modules.audio_cache import AUDIO_DIR, cache_audio
+from modules.aws_services import FORMATOS_TRANSCRIBE
+from modules.metrics import bytes_audio, subtitulos_descartados
+from modules.media_pool import pool_media, ejecutar_ffmpeg
+from modules.captions import PARSERS, SubtitulosInvalidos, unir_segmentos, evaluar_subtitulos
 
-# Definir la carpeta de audios
-ROOT_DIR = os.path.dirname(os.path.abspath(__file__))  # Directorio del módulo
-AUDIO_DIR = os.path.join(ROOT_DIR, '..', 'audios')  # Carpeta 'audios' en el directorio principal
+# Sin recodificar se sube el contenedor original (m4a/webm) si Transcribe lo acepta
+SIN_RECODIFICAR = os.getenv('AUDIO_SIN_RECODIFICAR', 'true').lower() in ('1', 'true', 'si', 'sí', 'yes')
+# Prefiere opus de baja tasa (suficiente para voz) y luego m4a
+FORMATO_NATIVO = 'bestaudio[ext=webm][abr<=96]/bestaudio[ext=m4a]/bestaudio[ext=webm]/bestaudio/best'
+# Tasa del mp3 de respaldo cuando el contenedor original no es compatible
+BITRATE_VOZ = os.getenv('AUDIO_BITRATE_VOZ', '64k')
+# Subtítulos de YouTube en lugar de descarga + Transcribe cuando cumplen las reglas de calidad
+SUBTITULOS_PRIMERO = os.getenv('SUBTITULOS_PRIMERO', 'true').lower() in ('1', 'true', 'si', 'sí', 'yes')
+SUBTITULOS_AUTOMATICOS = os.getenv('SUBTITULOS_AUTOMATICOS', 'true').lower() in ('1', 'true', 'si', 'sí', 'yes')
+IDIOMAS_SUBTITULOS = [idioma.strip() for idioma in os.getenv('SUBTITULOS_IDIOMAS', 'es,en').split(',') if idioma.strip()]
+MIN_PALABRAS_MINUTO = float(os.getenv('SUBTITULOS_MIN_PALABRAS_MINUTO', '40'))
+MIN_COBERTURA = float(os.getenv('SUBTITULOS_MIN_COBERTURA', '0.6'))
+# Timeouts (conexión, lectura) de las peticiones por rangos: la lectura acota cada espera de
+# bytes, así un servidor que deja de enviar no bloquea al lector indefinidamente
+TIMEOUT_STREAM = (float(os.getenv('STREAM_TIMEOUT_CONEXION', '10')), float(os.getenv('STREAM_TIMEOUT_LECTURA', '30')))
 
-# Asegurarse de que la carpeta de audios exista
-os.makedirs(AUDIO_DIR, exist_ok=True)
+def procesar_audio(url_video, detalles=None, stream=None):
+    """
+    Obtiene el audio de un video, desde la caché local si ya fue descargado.
+
+    Parámetros:
+    - url_video (str): URL limpia del video.
+    - detalles (dict): Si se indica, recibe 'idioma' con el idioma del video según YouTube.
+    - stream (dict): Stream de audio ya resuelto (ver `obtener_subtitulos`); evita volver a
+      consultar el video a yt-dlp.
+
+    Retorna:
+    - tuple: (audio_path, video_id, titulo_actual, duracion).
+
+    Lanza:
+    - Exception: Si ocurre un error al descargar el audio.
+    """
+    video_id = extraer_video_id(url_video)
+    detalles = {} if detalles is None else detalles
+    with cache_audio.bloqueo(video_id):
+        entrada = cache_audio.obtener(video_id)
+        if entrada:
+            detalles['idioma'] = entrada.get('idioma')
+            return entrada['ruta'], video_id, entrada['titulo'], entrada.get('duracion')
+        audio_path = os.path.join(AUDIO_DIR, f"{video_id}.mp3")
+        if os.path.exists(audio_path):
+            # Audio descargado antes de existir la caché: solo faltan los metadatos
+            titulo_actual, duracion = obtener_metadatos(url_video)
+        else:
+            audio_path, video_id, titulo_actual, duracion = descargar_audio(url_video, video_id, detalles, stream)
+            bytes_audio.inc(os.path.getsize(audio_path), direccion='descarga')
+        cache_audio.guardar(video_id, audio_path, titulo_actual, duracion, idioma=detalles.get('idioma'))
+        return audio_path, video_id, titulo_actual, duracion
+
+def descargar_audio(url_video, video_id, detalles=None, stream=None):
+    """
+    Descarga el audio de un video con yt-dlp.
+
+    Con `SIN_RECODIFICAR` se conserva el contenedor original si AWS Transcribe lo acepta y,
+    si no, se convierte a un mp3 mono de baja tasa. En otro caso se usa la conversión clásica
+    a mp3 de 192 kbps.
+
+    Parámetros:
+    - detalles (dict): Si se indica, recibe 'idioma' con el idioma del video según YouTube.
+    - stream (dict): Stream nativo ya resuelto; con `SIN_RECODIFICAR` se descarga directamente.
+
+    Retorna:
+    - tuple: (audio_path, video_id, titulo_actual, duracion).
+    """
+    if SIN_RECODIFICAR and stream:
+        return descargar_stream_nativo(stream, detalles)
+    if SIN_RECODIFICAR:
+        return descargar_audio_nativo(url_video, video_id, detalles)
 
-def procesar_audio(url_video):
-    video_id = url_video.split('=')[-1]
     ydl_opts = {
         'format': 'bestaudio/best',
         'outtmpl': os.path.join(AUDIO_DIR, f"{video_id}.%(ext)s"),
@@ -24,24 +92,378 @@ def procesar_audio(url_video):
     }
 
     try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info_dict = ydl.extract_info(url_video, download=True)
-            video_id = info_dict.get('id', None)
-            titulo_actual = info_dict.get('title', 'Título Desconocido')
+        info_dict = pool_media.extraer_info(url_video, ydl_opts, descargar=True)
+        video_id = info_dict.get('id', None)
+        titulo_actual = info_dict.get('title', 'Título Desconocido')
+        duracion = info_dict.get('duration')
+        if detalles is not None:
+            detalles['idioma'] = info_dict.get('language')
 
         audio_path = os.path.join(AUDIO_DIR, f"{video_id}.mp3")
 
         if not os.path.exists(audio_path):
             raise FileNotFoundError(f"El archivo de audio no fue creado correctamente: {audio_path}")
 
-        print(f"Audio descargado correctamente: {audio_path}")
-        return audio_path, video_id, titulo_actual
+        logging.info(f"Audio descargado correctamente: {audio_path}")
+        return audio_path, video_id, titulo_actual, duracion
 
     except yt_dlp.utils.DownloadError as e:
-        print(f"Error de descarga con yt-dlp: {e}")
+        logging.error(f"Error de descarga con yt-dlp: {e}")
         raise Exception("Error al descargar el audio.")
 
     except Exception as e:
-        print(f"Error inesperado al descargar el audio: {e}")
+        logging.error(f"Error inesperado al descargar el audio: {e}")
         raise Exception("Error inesperado al descargar el audio.")
-    return audio_path, video_id, titulo_actual
+
+def descargar_audio_nativo(url_video, video_id, detalles=None):
+    """
+    Descarga el mejor stream de solo audio sin pasar por FFmpeg.
+
+    Retorna:
+    - tuple: (audio_path, video_id, titulo_actual, duracion).
+    """
+    ydl_opts = {
+        'format': FORMATO_NATIVO,
+        'outtmpl': os.path.join(AUDIO_DIR, f"{video_id}.%(ext)s"),
+        'no_warnings': True,
+    }
+
+    try:
+        info_dict = pool_media.extraer_info(url_video, ydl_opts, descargar=True)
+        video_id = info_dict.get('id', None)
+        titulo_actual = info_dict.get('title', 'Título Desconocido')
+        duracion = info_dict.get('duration')
+        if detalles is not None:
+            detalles['idioma'] = info_dict.get('language')
+        audio_path = info_dict['_archivo']
+
+        if not os.path.exists(audio_path):
+            raise FileNotFoundError(f"El archivo de audio no fue creado correctamente: {audio_path}")
+
+        extension = os.path.splitext(audio_path)[1].lstrip('.').lower()
+        if extension not in FORMATOS_TRANSCRIBE:
+            audio_path = transcodificar_para_voz(audio_path)
+
+        logging.info(f"Audio descargado correctamente: {audio_path}")
+        return audio_path, video_id, titulo_actual, duracion
+
+    except yt_dlp.utils.DownloadError as e:
+        logging.error(f"Error de descarga con yt-dlp: {e}")
+        raise Exception("Error al descargar el audio.")
+
+    except Exception as e:
+        logging.error(f"Error inesperado al descargar el audio: {e}")
+        raise Exception("Error inesperado al descargar el audio.")
+
+def descargar_stream_nativo(stream, detalles=None):
+    """
+    Descarga a 'audios/' un stream de audio ya resuelto, por rangos HTTP y sin volver a
+    extraer la información del video.
+
+    Parámetros:
+    - stream (dict): Stream de audio (ver `resolver_stream_audio`).
+    - detalles (dict): Si se indica, recibe 'idioma' con el idioma del video según YouTube.
+
+    Retorna:
+    - tuple: (audio_path, video_id, titulo_actual, duracion).
+    """
+    audio_path = os.path.join(AUDIO_DIR, f"{stream['video_id']}.{stream['ext']}")
+    temporal = f"{audio_path}.part"
+    try:
+        with open(temporal, 'wb') as archivo:
+            for bloque in abrir_stream_audio(stream, contar_bytes=False):
+                archivo.write(bloque)
+        os.replace(temporal, audio_path)
+        if stream['ext'] not in FORMATOS_TRANSCRIBE:
+            audio_path = transcodificar_para_voz(audio_path)
+    except Exception as e:
+        logging.error(f"Error al descargar el stream de audio de {stream['video_id']}: {e}")
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise Exception("Error al descargar el audio.")
+    if detalles is not None:
+        detalles['idioma'] = stream['idioma']
+    logging.info(f"Audio descargado correctamente: {audio_path}")
+    return audio_path, stream['video_id'], stream['titulo'], stream['duracion']
+
+def transcodificar_para_voz(audio_path):
+    """
+    Convierte un audio a mp3 mono de baja tasa, suficiente para transcripción, y elimina el original.
+
+    Parámetros:
+    - audio_path (str): Ruta del audio original.
+
+    Retorna:
+    - str: Ruta del mp3 generado.
+    """
+    destino = f"{os.path.splitext(audio_path)[0]}.mp3"
+    comando = ['ffmpeg', '-y', '-loglevel', 'error', '-i', audio_path,
+               '-vn', '-ac', '1', '-ar', '16000', '-b:a', BITRATE_VOZ, destino]
+    resultado = ejecutar_ffmpeg(comando)
+    if resultado.returncode != 0:
+        raise Exception(f"Error al convertir el audio con FFmpeg: {resultado.stderr.strip()}")
+    os.remove(audio_path)
+    return destino
+
+def resolver_stream_audio(url_video):
+    """
+    Elige el stream de audio nativo de un video sin descargarlo.
+
+    Retorna:
+    - dict: 'video_id', 'titulo', 'duracion', 'idioma', 'ext', 'url', 'http_headers' y 'filesize' del stream.
+
+    Lanza:
+    - Exception: Si yt-dlp no encuentra un stream compatible con Transcribe.
+    """
+    ydl_opts = {'format': FORMATO_NATIVO, 'skip_download': True, 'quiet': True, 'no_warnings': True}
+    try:
+        info_dict = pool_media.extraer_info(url_video, ydl_opts)
+    except yt_dlp.utils.DownloadError as e:
+        logging.error(f"Error de descarga con yt-dlp: {e}")
+        raise Exception("Error al obtener el stream de audio.")
+
+    stream = stream_de_info(info_dict)
+    extension = stream['ext'] if stream else ''
+    if not stream or extension not in FORMATOS_TRANSCRIBE:
+        raise Exception(f"El stream de audio ({extension or 'desconocido'}) no es compatible con Transcribe.")
+    return stream
+
+def stream_de_info(info_dict):
+    """
+    Parámetros:
+    - info_dict (dict): Información del video de yt-dlp, extraída con `format` = FORMATO_NATIVO.
+
+    Retorna:
+    - dict: Stream de audio elegido, con las claves de `resolver_stream_audio`.
+    - None: Si yt-dlp no eligió ningún formato con URL.
+    """
+    formato = (info_dict.get('requested_formats') or [info_dict])[0]
+    if not formato.get('url'):
+        return None
+    return {
+        'video_id': info_dict.get('id'),
+        'titulo': info_dict.get('title', 'Título Desconocido'),
+        'duracion': info_dict.get('duration'),
+        'idioma': info_dict.get('language'),
+        'ext': (formato.get('ext') or '').lower(),
+        'url': formato['url'],
+        'http_headers': formato.get('http_headers') or {},
+        'filesize': formato.get('filesize') or formato.get('filesize_approx'),
+    }
+
+def abrir_stream_audio(stream, tamano_rango=10 * 1024 * 1024, tamano_bloque=1024 * 1024, contar_bytes=True):
+    """
+    Itera los bytes de un stream de audio con peticiones HTTP por rangos, como hace yt-dlp para
+    evitar el límite de velocidad de YouTube en descargas de una sola petición.
+
+    Parámetros:
+    - stream (dict): Resultado de `resolver_stream_audio`.
+    - tamano_rango (int): Bytes pedidos en cada petición.
+    - tamano_bloque (int): Bytes entregados en cada iteración.
+    - contar_bytes (bool): Si los bytes se suman a la métrica de descarga (False cuando el
+      llamador mide el archivo resultante).
+
+    Retorna:
+    - generator: Bloques de bytes del audio.
+    """
+    with requests.Session() as session:
+        session.headers.update(stream['http_headers'])
+        inicio = 0
+        while True:
+            fin = inicio + tamano_rango - 1
+            respuesta = session.get(stream['url'], headers={'Range': f'bytes={inicio}-{fin}'}, stream=True, timeout=TIMEOUT_STREAM)
+            if respuesta.status_code == 416:
+                return
+            respuesta.raise_for_status()
+            recibidos = 0
+            for bloque in respuesta.iter_content(chunk_size=tamano_bloque):
+                recibidos += len(bloque)
+                if contar_bytes:
+                    bytes_audio.inc(len(bloque), direccion='descarga')
+                yield bloque
+            total = respuesta.headers.get('Content-Range', '').rpartition('/')[2]
+            inicio += recibidos
+            if respuesta.status_code != 206 or recibidos < tamano_rango or (total.isdigit() and inicio >= int(total)):
+                return
+
+def elegir_pista_subtitulos(info_dict, idiomas=None, automaticos=None):
+    """
+    Elige la pista de subtítulos a usar según el idioma, el tipo y el formato.
+
+    Por cada idioma de `idiomas` (en orden) se prefieren los subtítulos manuales y después los
+    automáticos, pero solo los del idioma original del video: las traducciones automáticas de
+    YouTube no se aceptan. Dentro de una pista se prefiere json3, luego srv3 y luego vtt.
+
+    Parámetros:
+    - info_dict (dict): Información del video de yt-dlp.
+    - idiomas (list): Códigos de idioma aceptados (por defecto SUBTITULOS_IDIOMAS).
+    - automaticos (bool): Si se aceptan subtítulos automáticos (por defecto SUBTITULOS_AUTOMATICOS).
+
+    Retorna:
+    - dict: 'idioma', 'tipo' ('manual' o 'automatico'), 'formato' y 'url' de la pista.
+    - None: Si no hay una pista aceptable.
+    """
+    idiomas = IDIOMAS_SUBTITULOS if idiomas is None else idiomas
+    automaticos = SUBTITULOS_AUTOMATICOS if automaticos is None else automaticos
+    idioma_original = info_dict.get('language')
+
+    def pista(tipo, clave, formatos):
+        for formato in PARSERS:
+            for entrada in formatos:
+                if entrada.get('ext') == formato and entrada.get('url'):
+                    return {'idioma': clave.removesuffix('-orig'), 'tipo': tipo, 'formato': formato, 'url': entrada['url']}
+        return None
+
+    def coincide(clave, idioma):
+        base = clave.removesuffix('-orig')
+        return base == idioma or base.startswith(f'{idioma}-')
+
+    for idioma in idiomas:
+        for clave, formatos in (info_dict.get('subtitles') or {}).items():
+            if coincide(clave, idioma) and (elegida := pista('manual', clave, formatos)):
+                return elegida
+        if not automaticos:
+            continue
+        for clave, formatos in (info_dict.get('automatic_captions') or {}).items():
+            original = clave.endswith('-orig') or (idioma_original and clave == idioma_original)
+            if original and coincide(clave, idioma) and (elegida := pista('automatico', clave, formatos)):
+                return elegida
+    return None
+
+def obtener_subtitulos(url_video, sondeo=None):
+    """
+    Obtiene el texto de los subtítulos de un video con una consulta a yt-dlp y una petición
+    HTTP, sin descargar el audio. La misma consulta elige el stream de audio nativo, que se
+    entrega en `sondeo` para que la descarga no vuelva a extraer el video.
+
+    Cualquier error se registra y retorna None: los subtítulos son solo un atajo.
+
+    Parámetros:
+    - url_video (str): URL limpia del video.
+    - sondeo (dict): Si se indica, recibe 'stream' con el stream de audio elegido (o None).
+
+    Retorna:
+    - dict: 'video_id', 'titulo', 'duracion', 'idioma', 'tipo', 'formato' y 'texto'.
+    - None: Si el video no tiene subtítulos aceptables; se debe usar el audio y Transcribe.
+    """
+    try:
+        return leer_subtitulos(url_video, {} if sondeo is None else sondeo)
+    except Exception as e:
+        logging.warning(f"No se pudo consultar los subtítulos de {url_video}: {e}")
+        subtitulos_descartados.inc(motivo='error')
+        return None
+
+def leer_subtitulos(url_video, sondeo):
+    """
+    Cuerpo de `obtener_subtitulos`; los errores de la consulta a yt-dlp se propagan.
+    """
+    ydl_opts = {'format': FORMATO_NATIVO, 'skip_download': True, 'quiet': True, 'no_warnings': True}
+    info_dict = pool_media.extraer_info(url_video, ydl_opts)
+    sondeo['stream'] = stream_de_info(info_dict)
+
+    pista = elegir_pista_subtitulos(info_dict)
+    if pista is None:
+        logging.info(f"{url_video} no tiene subtítulos aceptables en {', '.join(IDIOMAS_SUBTITULOS)}.")
+        subtitulos_descartados.inc(motivo='sin_pista')
+        return None
+
+    try:
+        respuesta = requests.get(pista['url'], timeout=15)
+        respuesta.raise_for_status()
+        respuesta.encoding = 'utf-8'
+        segmentos = PARSERS[pista['formato']](respuesta.text)
+    except (requests.RequestException, SubtitulosInvalidos) as e:
+        logging.warning(f"No se pudieron leer los subtítulos de {url_video} ({pista['formato']}): {e}")
+        subtitulos_descartados.inc(motivo='error')
+        return None
+
+    texto = unir_segmentos(segmentos)
+    duracion = info_dict.get('duration')
+    motivo = evaluar_subtitulos(segmentos, texto, duracion, MIN_PALABRAS_MINUTO, MIN_COBERTURA)
+    if motivo:
+        logging.info(f"Subtítulos {pista['tipo']} ({pista['idioma']}) de {url_video} descartados: {motivo}.")
+        subtitulos_descartados.inc(motivo=motivo)
+        return None
+
+    return {
+        'video_id': info_dict.get('id'),
+        'titulo': info_dict.get('title', 'Título Desconocido'),
+        'duracion': duracion,
+        'idioma': pista['idioma'],
+        'tipo': pista['tipo'],
+        'formato': pista['formato'],
+        'texto': texto,
+    }
+
+def obtener_metadatos(url_video):
+    """
+    Lee el título y la duración de un video sin descargarlo.
+
+    Retorna:
+    - tuple: (titulo_actual, duracion).
+    """
+    try:
+        info_dict = pool_media.extraer_info(url_video, {'skip_download': True, 'quiet': True, 'no_warnings': True})
+        return info_dict.get('title', 'Título Desconocido'), info_dict.get('duration')
+    except yt_dlp.utils.DownloadError as e:
+        logging.error(f"Error de descarga con yt-dlp: {e}")
+        raise Exception("Error al obtener los datos del video.")
+
+def expandir_lista(url, profundidad_maxima=2):
+    """
+    Expande una URL de playlist o canal en las URLs de sus videos sin descargar contenido.
+
+    Usa la extracción plana de yt-dlp, que solo lee el listado. Los canales devuelven sus
+    pestañas (videos, shorts, etc.) como sublistas, que se expanden hasta `profundidad_maxima`.
+
+    Parámetros:
+    - url (str): URL de la playlist, del canal o de un video.
+    - profundidad_maxima (int): Niveles de sublistas que se siguen.
+
+    Retorna:
+    - list: URLs limpias de los videos, sin duplicados y en el orden del listado.
+
+    Lanza:
+    - Exception: Si yt-dlp no puede leer la URL.
+    """
+    url_limpia = limpiar_youtube_url(url)
+    if url_limpia:
+        return [url_limpia]
+
+    ydl_opts = {
+        'extract_flat': 'in_playlist',
+        'skip_download': True,
+        'quiet': True,
+        'no_warnings': True,
+    }
+    urls = []
+    vistos = set()
+
+    def recorrer(entradas, profundidad):
+        for entrada in entradas or []:
+            if not entrada:
+                continue
+            if entrada.get('entries') is not None:
+                recorrer(entrada['entries'], profundidad)
+                continue
+            destino = entrada.get('url') or entrada.get('webpage_url') or ''
+            video_url = limpiar_youtube_url(destino)
+            if not video_url and entrada.get('ie_key') == 'Youtube' and entrada.get('id'):
+                video_url = limpiar_youtube_url(f"https://www.youtube.com/watch?v={entrada['id']}")
+            if video_url:
+                if video_url not in vistos:
+                    vistos.add(video_url)
+                    urls.append(video_url)
+            elif destino and profundidad < profundidad_maxima:
+                info_sublista = pool_media.extraer_info(destino, ydl_opts)
+                recorrer(info_sublista.get('entries'), profundidad + 1)
+
+    try:
+        info_dict = pool_media.extraer_info(url, ydl_opts)
+        recorrer(info_dict.get('entries'), 0)
+    except yt_dlp.utils.DownloadError as e:
+        logging.error(f"Error al expandir la lista con yt-dlp: {e}")
+        raise Exception(f"No se pudo leer la lista de videos: {url}") from e
+
+    logging.info(f"Lista {url} expandida en {len(urls)} videos.")
+    return urls
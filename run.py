@@ -4,8 +4,9 @@ Este script inicializa y ejecuta una aplicación Flask utilizando SocketIO y Eve
 Importa y aplica el parche de Eventlet para mejorar la concurrencia. Luego, intenta importar
 la aplicación Flask y el objeto SocketIO desde el módulo `app`. Si la importación falla, 
 imprime un mensaje de error y lanza una excepción.
-Si el script se ejecuta directamente (no importado como módulo), inicia el servidor 
-SocketIO en la dirección '0.0.0.0' y el puerto 5000, con el modo de depuración desactivado.
+Si el script se ejecuta directamente (no importado como módulo), inicia los workers de la
+cola de trabajos y el servidor SocketIO en la dirección '0.0.0.0' y el puerto 5000, con el modo de depuración desactivado.
+Con ROL_PROCESO=web solo se inicia el servidor; los trabajos los procesa `worker.py`.
 Dependencias:
 - eventlet
 - Flask
@@ -18,10 +19,13 @@ import eventlet
 eventlet.monkey_patch()
 
 try:
-    from app import app, socketio
+    from app import app, socketio, cola_trabajos
+    from modules.message_queue import ROL_PROCESO
 except ImportError as e:
     print(f"Error importing app or socketio: {e}")
     raise
 
 if __name__ == '__main__':
+    if ROL_PROCESO == 'completo':
+        cola_trabajos.iniciar()
     socketio.run(app, host='0.0.0.0', port=5000, debug=False)
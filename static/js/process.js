@@ -46,6 +46,7 @@ document.addEventListener('DOMContentLoaded', () => {
         // Ocultar la sección de resultados si estaba visible
         resultSection.style.display = 'none';
         sugerenciasContainer.innerHTML = '';
+        tarjetasParciales = {};
 
         // Enviar la solicitud al servidor
         fetch('/procesar_video', {
@@ -91,80 +92,107 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     });
 
+    // Tarjetas de las sugerencias que llegan en streaming, por campo
+    let tarjetasParciales = {};
+
+    // Crea la tarjeta de un título o del resumen; retorna null si la clave no es de ninguno
+    function crearTarjeta(key) {
+        // Normalizar la clave para eliminar acentos
+        const normalizedKey = key.normalize('NFD').replace(/[\u0300-\u036f]/g, "").toLowerCase();
+        let valorActual = '';
+
+        if (normalizedKey.includes('titulo')) {
+            // Crear tarjeta para el título
+            const card = document.createElement('div');
+            card.className = 'card mb-3';
+            const cardBody = document.createElement('div');
+            cardBody.className = 'card-body d-flex justify-content-between align-items-center';
+            
+            const title = document.createElement('h5');
+            title.className = 'card-title mb-0';
+            
+            const copyButton = document.createElement('button');
+            copyButton.className = 'btn btn-outline-primary btn-sm';
+            copyButton.textContent = 'Copiar';
+            copyButton.addEventListener('click', () => {
+                navigator.clipboard.writeText(valorActual)
+                    .then(() => {
+                        toastr.success(`Título copiado: ${valorActual}`);
+                    })
+                    .catch(err => {
+                        toastr.error('Error al copiar el título.');
+                        console.error('Error al copiar:', err);
+                    });
+            });
+
+            cardBody.appendChild(title);
+            cardBody.appendChild(copyButton);
+            card.appendChild(cardBody);
+            return {
+                card,
+                actualizar(value, completo) {
+                    valorActual = value;
+                    title.textContent = `${key}: ${value}`;
+                    copyButton.disabled = !completo;
+                }
+            };
+        } else if (normalizedKey.includes('resumen')) {
+            // Crear tarjeta para el resumen
+            const card = document.createElement('div');
+            card.className = 'card mb-3';
+            const cardBody = document.createElement('div');
+            cardBody.className = 'card-body';
+            
+            const summaryTitle = document.createElement('h5');
+            summaryTitle.className = 'card-title';
+            summaryTitle.textContent = 'Resumen:';
+            
+            const summaryText = document.createElement('p');
+            summaryText.className = 'card-text';
+
+            // Botón para copiar el resumen
+            const copyButton = document.createElement('button');
+            copyButton.className = 'btn btn-outline-primary btn-sm mt-2';
+            copyButton.textContent = 'Copiar Resumen';
+            copyButton.addEventListener('click', () => {
+                navigator.clipboard.writeText(valorActual)
+                    .then(() => {
+                        toastr.success('Resumen copiado al portapapeles.');
+                    })
+                    .catch(err => {
+                        toastr.error('Error al copiar el resumen.');
+                        console.error('Error al copiar:', err);
+                    });
+            });
+
+            cardBody.appendChild(summaryTitle);
+            cardBody.appendChild(summaryText);
+            cardBody.appendChild(copyButton);
+            card.appendChild(cardBody);
+            return {
+                card,
+                actualizar(value, completo) {
+                    valorActual = value;
+                    summaryText.textContent = value;
+                    copyButton.disabled = !completo;
+                }
+            };
+        }
+        return null;
+    }
+
     // Función para mostrar las sugerencias en el frontend
     function mostrarSugerencias(sugerencias) {
         // Limpiar cualquier sugerencia previa
         sugerenciasContainer.innerHTML = '';
+        tarjetasParciales = {};
 
         // Iterar sobre las sugerencias y mostrarlas
         for (const [key, value] of Object.entries(sugerencias)) {
-            // Normalizar la clave para eliminar acentos
-            const normalizedKey = key.normalize('NFD').replace(/[\u0300-\u036f]/g, "").toLowerCase();
-
-            if (normalizedKey.includes('titulo')) {
-                // Crear tarjeta para el título
-                const card = document.createElement('div');
-                card.className = 'card mb-3';
-                const cardBody = document.createElement('div');
-                cardBody.className = 'card-body d-flex justify-content-between align-items-center';
-                
-                const title = document.createElement('h5');
-                title.className = 'card-title mb-0';
-                title.textContent = `${key}: ${value}`;
-                
-                const copyButton = document.createElement('button');
-                copyButton.className = 'btn btn-outline-primary btn-sm';
-                copyButton.textContent = 'Copiar';
-                copyButton.addEventListener('click', () => {
-                    navigator.clipboard.writeText(value)
-                        .then(() => {
-                            toastr.success(`Título copiado: ${value}`);
-                        })
-                        .catch(err => {
-                            toastr.error('Error al copiar el título.');
-                            console.error('Error al copiar:', err);
-                        });
-                });
-
-                cardBody.appendChild(title);
-                cardBody.appendChild(copyButton);
-                card.appendChild(cardBody);
-                sugerenciasContainer.appendChild(card);
-            } else if (normalizedKey.includes('resumen')) {
-                // Crear tarjeta para el resumen
-                const card = document.createElement('div');
-                card.className = 'card mb-3';
-                const cardBody = document.createElement('div');
-                cardBody.className = 'card-body';
-                
-                const summaryTitle = document.createElement('h5');
-                summaryTitle.className = 'card-title';
-                summaryTitle.textContent = 'Resumen:';
-                
-                const summaryText = document.createElement('p');
-                summaryText.className = 'card-text';
-                summaryText.textContent = value;
-
-                // Botón para copiar el resumen
-                const copyButton = document.createElement('button');
-                copyButton.className = 'btn btn-outline-primary btn-sm mt-2';
-                copyButton.textContent = 'Copiar Resumen';
-                copyButton.addEventListener('click', () => {
-                    navigator.clipboard.writeText(value)
-                        .then(() => {
-                            toastr.success('Resumen copiado al portapapeles.');
-                        })
-                        .catch(err => {
-                            toastr.error('Error al copiar el resumen.');
-                            console.error('Error al copiar:', err);
-                        });
-                });
-
-                cardBody.appendChild(summaryTitle);
-                cardBody.appendChild(summaryText);
-                cardBody.appendChild(copyButton);
-                card.appendChild(cardBody);
-                sugerenciasContainer.appendChild(card);
+            const tarjeta = crearTarjeta(key);
+            if (tarjeta) {
+                tarjeta.actualizar(value, true);
+                sugerenciasContainer.appendChild(tarjeta.card);
             }
         }
 
@@ -172,6 +200,24 @@ document.addEventListener('DOMContentLoaded', () => {
         resultSection.style.display = 'block';
     }
 
+    // Escuchar sugerencias parciales mientras el modelo las genera
+    socket.on('sugerencia_parcial', (data) => {
+        // Llega solo el texto nuevo ('delta'); 'valor' reemplaza el texto completo del campo
+        const { campo, delta, valor, completo } = data;
+        if (!tarjetasParciales[campo]) {
+            const tarjeta = crearTarjeta(campo);
+            if (!tarjeta) {
+                return;
+            }
+            tarjetasParciales[campo] = tarjeta;
+            sugerenciasContainer.appendChild(tarjeta.card);
+            resultSection.style.display = 'block';
+        }
+        const tarjeta = tarjetasParciales[campo];
+        tarjeta.texto = valor !== undefined ? valor : (tarjeta.texto || '') + delta;
+        tarjeta.actualizar(tarjeta.texto, completo);
+    });
+
     // Escuchar eventos de progreso
     socket.on('progreso', (data) => {
         console.log('Evento progreso recibido:', data);
@@ -0,0 +1,19 @@
+import pytest
+from flask import Flask
+
+from modules.models import db
+
+
+@pytest.fixture
+def app():
+    """
+    Aplicación mínima con SQLite en memoria y las tablas del modelo creadas.
+    """
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
@@ -0,0 +1,74 @@
+import os
+import time
+
+import pytest
+
+from modules.audio_cache import CacheAudio, calcular_sha256
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return CacheAudio(directorio=str(tmp_path), max_bytes=250, edad_minima=60)
+
+
+def escribir(cache, nombre, tamano):
+    ruta = os.path.join(cache.directorio, nombre)
+    with open(ruta, 'wb') as archivo:
+        archivo.write(b'x' * tamano)
+    return ruta
+
+
+def envejecer(cache, nombre, segundos):
+    instante = time.time() - segundos
+    os.utime(os.path.join(cache.directorio, nombre), (instante, instante))
+
+
+def test_guardar_y_obtener(cache):
+    ruta = escribir(cache, 'abc.webm', 100)
+    cache.guardar('abc', ruta, 'Título', 12.5, idioma='es')
+    entrada = cache.obtener('abc')
+    assert entrada['ruta'] == ruta
+    assert entrada['titulo'] == 'Título'
+    assert entrada['bytes'] == 100
+    assert entrada['idioma'] == 'es'
+    assert entrada['sha256'] == calcular_sha256(ruta)
+
+
+def test_archivo_alterado_invalida_la_entrada(cache):
+    ruta = escribir(cache, 'abc.webm', 100)
+    cache.guardar('abc', ruta, 'Título', None)
+    escribir(cache, 'abc.webm', 50)
+    assert cache.obtener('abc') is None
+    assert not os.path.exists(ruta)
+    assert not os.path.exists(os.path.join(cache.directorio, 'abc.json'))
+
+
+def test_desaloja_los_menos_usados(cache):
+    cache.max_bytes = 1000
+    for indice, video_id in enumerate(('viejo', 'medio', 'usado')):
+        cache.guardar(video_id, escribir(cache, f'{video_id}.webm', 100), video_id, None)
+        envejecer(cache, f'{video_id}.json', 3600 - indice * 60)
+    # Un acceso renueva la entrada más antigua
+    cache.obtener('viejo')
+    envejecer(cache, 'viejo.json', 120)
+
+    cache.max_bytes = 250
+    assert cache.desalojar() == 100
+    assert cache.obtener('medio') is None
+    assert cache.obtener('viejo') is not None
+    assert cache.obtener('usado') is not None
+
+
+def test_no_desaloja_audios_recientes(cache):
+    for video_id in ('a', 'b', 'c'):
+        cache.guardar(video_id, escribir(cache, f'{video_id}.webm', 100), video_id, None)
+    assert cache.desalojar() == 0
+    assert all(cache.obtener(video_id) for video_id in ('a', 'b', 'c'))
+
+
+def test_archivos_sin_metadatos_cuentan_en_el_presupuesto(cache):
+    huerfano = escribir(cache, 'resto.webm.part', 200)
+    envejecer(cache, 'resto.webm.part', 3600)
+    cache.guardar('nuevo', escribir(cache, 'nuevo.webm', 100), 'nuevo', None)
+    assert not os.path.exists(huerfano)
+    assert cache.obtener('nuevo') is not None
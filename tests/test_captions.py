@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from modules.captions import (
+    SubtitulosInvalidos, evaluar_subtitulos, parsear_json3, parsear_srv3, parsear_vtt, unir_segmentos
+)
+
+
+def test_parsear_vtt():
+    contenido = (
+        "WEBVTT\n"
+        "Kind: captions\n\n"
+        "1\n00:00:01.000 --> 00:00:03.500 align:start\n<c>Hola</c> &amp; adiós\n\n"
+        "01:00:02,250 --> 01:00:04,000\nsegunda\nlínea\n"
+    )
+    assert parsear_vtt(contenido) == [
+        (1.0, 3.5, 'Hola & adiós'),
+        (3602.25, 3604.0, 'segunda\nlínea'),
+    ]
+
+
+def test_parsear_vtt_sin_cabecera():
+    with pytest.raises(SubtitulosInvalidos):
+        parsear_vtt("00:00:01.000 --> 00:00:02.000\nhola")
+
+
+def test_parsear_srv3():
+    contenido = '<timedtext><body><p t="1000" d="2500"><s>Hola</s><s> mundo</s></p><p t="4000" d="10"> </p></body></timedtext>'
+    assert parsear_srv3(contenido) == [(1.0, 3.5, 'Hola mundo')]
+
+
+def test_parsear_srv3_invalido():
+    with pytest.raises(SubtitulosInvalidos):
+        parsear_srv3('<timedtext><p>')
+
+
+def test_parsear_json3():
+    contenido = json.dumps({'events': [
+        {'tStartMs': 500, 'dDurationMs': 1500, 'segs': [{'utf8': 'Hola'}, {'utf8': ' mundo'}]},
+        {'tStartMs': 2000, 'dDurationMs': 100, 'segs': [{'utf8': '\n'}]},
+        {'tStartMs': 3000},
+    ]})
+    assert parsear_json3(contenido) == [(0.5, 2.0, 'Hola mundo')]
+
+
+def test_parsear_json3_invalido():
+    with pytest.raises(SubtitulosInvalidos):
+        parsear_json3('[1, 2]')
+
+
+def test_unir_segmentos_quita_anotaciones_y_repeticiones():
+    segmentos = [
+        (0, 1, '[Música]'),
+        (1, 2, 'hola a  todos'),
+        (2, 3, 'hola a todos\nbienvenidos [Aplausos]'),
+        (3, 4, 'bienvenidos'),
+    ]
+    assert unir_segmentos(segmentos) == 'hola a todos bienvenidos'
+
+
+@pytest.mark.parametrize('segmentos, texto, duracion, esperado', [
+    ([], '', 60, 'vacios'),
+    ([(0, 20, 'x')], ' '.join(['palabra'] * 100), 60, 'cobertura'),
+    ([(0, 60, 'x')], ' '.join(['palabra'] * 10), 60, 'densidad'),
+    ([(0, 60, 'x')], ' '.join(['palabra'] * 100), 60, None),
+    ([(0, 5, 'x')], 'pocas palabras', None, None),
+])
+def test_evaluar_subtitulos(segmentos, texto, duracion, esperado):
+    assert evaluar_subtitulos(segmentos, texto, duracion, min_palabras_minuto=40, min_cobertura=0.6) == esperado
@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+from modules.json_incremental import ExtractorCamposJSON
+
+
+def alimentar_por_caracter(texto):
+    extractor = ExtractorCamposJSON()
+    eventos = []
+    for caracter in texto:
+        eventos.extend(extractor.alimentar(caracter))
+    return extractor, eventos
+
+
+def test_campos_completos_y_parciales():
+    extractor = ExtractorCamposJSON()
+    assert extractor.alimentar('Aquí tienes:\n```json\n{"Título Opción 1": "Ho') == [('Título Opción 1', 'Ho', False)]
+    assert extractor.alimentar('la", "n": 3, "Resumen": "x"') == [
+        ('Título Opción 1', 'Hola', True),
+        ('Resumen', 'x', True),
+    ]
+    assert extractor.campos == {'Título Opción 1': 'Hola', 'Resumen': 'x'}
+    assert extractor.estado == ExtractorCamposJSON.ESPERANDO_CLAVE
+    extractor.alimentar('}')
+    assert extractor.estado == ExtractorCamposJSON.FIN
+
+
+@pytest.mark.parametrize('valor', [
+    'comillas "dentro" y barra \\ suelta',
+    'ruta C:\\dir\\',
+    'dos barras \\\\',
+    'acento é y ñ',
+    'salto\nde línea',
+    '\\u no es escape',
+])
+def test_parciales_son_prefijos_del_valor_final(valor):
+    extractor, eventos = alimentar_por_caracter(json.dumps({'k': valor}, ensure_ascii=True))
+    assert extractor.campos == {'k': valor}
+    for campo, parcial, completo in eventos:
+        assert campo == 'k'
+        assert valor.startswith(parcial), (parcial, valor)
+    assert eventos[-1] == ('k', valor, True)
+
+
+def test_escape_unicode_incompleto_no_se_muestra():
+    extractor = ExtractorCamposJSON()
+    assert extractor.alimentar('{"k": "a\\u00') == [('k', 'a', False)]
+    assert extractor.alimentar('e9') == [('k', 'aé', False)]
+
+
+def test_barra_escapada_al_final_se_conserva():
+    extractor = ExtractorCamposJSON()
+    assert extractor.alimentar('{"k": "a\\\\') == [('k', 'a\\', False)]
+    assert extractor.alimentar('\\') == [('k', 'a\\', False)]
+    assert extractor.alimentar('n') == [('k', 'a\\\n', False)]
@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func
+
+from modules import pagination
+from modules.models import db, Video
+from modules.pagination import (
+    codificar_cursor, contar_videos_aproximado, decodificar_cursor, listar_videos, paginar_busqueda
+)
+from modules.search import buscar_videos
+
+
+@pytest.fixture
+def videos(app, monkeypatch):
+    monkeypatch.setattr(pagination, '_total_videos', {})
+    inicio = datetime(2024, 1, 1)
+    # Varios videos por minuto, para que el desempate por video_id importe
+    for i in range(23):
+        db.session.add(Video(
+            video_id=f'video{i:06d}', url_video=f'https://www.youtube.com/watch?v=video{i:06d}',
+            title1='gato' if i % 2 else 'perro', title2='t2', title3='t3', summary='resumen',
+            created_at=inicio + timedelta(minutes=i // 3)))
+    db.session.commit()
+    orden = db.session.query(Video.video_id).order_by(Video.created_at.desc(), Video.video_id.desc())
+    return [video_id for (video_id,) in orden]
+
+
+def recorrer(paginar, **kwargs):
+    paginas = [paginar(**kwargs)]
+    while paginas[-1].siguiente:
+        paginas.append(paginar(despues=paginas[-1].siguiente['despues'], **kwargs))
+    return paginas
+
+
+def ids(pagina):
+    return [video.video_id for video in pagina.items]
+
+
+def test_cursor_ida_y_vuelta():
+    posicion = (0.25, datetime(2024, 5, 1, 12, 30, 15, 123), 'abcdefghijk')
+    assert decodificar_cursor(codificar_cursor(posicion)) == posicion
+
+
+@pytest.mark.parametrize('cursor', ['no-es-base64!', codificar_cursor(['sin fecha'])])
+def test_cursor_invalido(cursor):
+    with pytest.raises(ValueError):
+        decodificar_cursor(cursor)
+
+
+def test_listado_avanza_sin_repetir_ni_saltar(videos):
+    paginas = recorrer(listar_videos, por_pagina=4)
+    assert [video_id for pagina in paginas for video_id in ids(pagina)] == videos
+    assert paginas[0].anterior is None
+    assert paginas[-1].siguiente is None
+    assert all(pagina.total_aproximado == len(videos) for pagina in paginas)
+
+
+def test_listado_retrocede(videos):
+    paginas = recorrer(listar_videos, por_pagina=4)
+    for previa, actual in zip(paginas, paginas[1:]):
+        atras = listar_videos(antes=actual.anterior['antes'], por_pagina=4)
+        assert ids(atras) == ids(previa)
+    primera = listar_videos(antes=paginas[1].anterior['antes'], por_pagina=4)
+    assert primera.anterior is None
+
+
+def test_busqueda_por_cursor(videos):
+    consulta, relevancia = buscar_videos('gato')
+    assert relevancia is None
+    paginas = recorrer(lambda **kwargs: paginar_busqueda(consulta, relevancia, 'gato', **kwargs), por_pagina=5)
+    encontrados = [video_id for pagina in paginas for video_id in ids(pagina)]
+    assert encontrados == [video_id for video_id in videos if int(video_id[-2:]) % 2]
+    assert paginas[1].anterior['search'] == 'gato'
+    assert paginas[0].siguiente == {'search': 'gato', 'despues': paginas[0].siguiente['despues']}
+
+
+def test_busqueda_con_relevancia(videos):
+    # Relevancia con empates, como ts_rank_cd: el cursor la incluye y desempata por fecha e ID
+    relevancia = func.length(Video.title1) * 1.0
+    paginar = lambda **kwargs: paginar_busqueda(Video.query, relevancia, 'x', **kwargs)
+    paginas = recorrer(paginar, por_pagina=4)
+    encontrados = [video_id for pagina in paginas for video_id in ids(pagina)]
+    assert sorted(encontrados) == sorted(videos)
+    assert encontrados[:len(videos) // 2 + 1] == [v for v in videos if int(v[-2:]) % 2 == 0]
+    atras = paginar(antes=paginas[2].anterior['antes'], por_pagina=4)
+    assert ids(atras) == ids(paginas[1])
+    with pytest.raises(ValueError):
+        listar_videos(despues=paginas[1].siguiente['despues'])
+
+
+def test_total_se_reutiliza(videos):
+    assert contar_videos_aproximado() == len(videos)
+    db.session.add(Video(video_id='nuevo000001', url_video='https://www.youtube.com/watch?v=nuevo000001',
+                         title1='a', title2='b', title3='c', summary='d'))
+    db.session.commit()
+    assert contar_videos_aproximado() == len(videos)
+    pagination._total_videos.clear()
+    assert contar_videos_aproximado() == len(videos) + 1
@@ -0,0 +1,80 @@
+import pytest
+
+from modules.result_cache import AlmacenCompartido, CacheSugerencias
+
+
+class Reloj:
+    def __init__(self):
+        self.ahora = 1000.0
+
+    def __call__(self):
+        return self.ahora
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    reloj = Reloj()
+    monkeypatch.setattr('modules.result_cache.time.monotonic', reloj)
+    return reloj
+
+
+class Cargas:
+    def __init__(self, valores):
+        self.valores = valores
+        self.llamadas = []
+
+    def de(self, video_id):
+        def cargar():
+            self.llamadas.append(video_id)
+            return self.valores.get(video_id)
+        return cargar
+
+
+def test_acierto_hasta_que_expira(reloj):
+    cache = CacheSugerencias(max_entradas=10, ttl=60)
+    cargas = Cargas({'a': {'Resumen': '1'}})
+    assert cache.obtener('a', cargas.de('a')) == {'Resumen': '1'}
+    reloj.ahora += 59
+    assert cache.obtener('a', cargas.de('a')) == {'Resumen': '1'}
+    assert cargas.llamadas == ['a']
+    reloj.ahora += 2
+    cache.obtener('a', cargas.de('a'))
+    assert cargas.llamadas == ['a', 'a']
+    assert (cache.aciertos, cache.fallos) == (1, 2)
+
+
+def test_lru_desaloja_el_menos_usado(reloj):
+    cache = CacheSugerencias(max_entradas=2, ttl=60)
+    cargas = Cargas({'a': 1, 'b': 2, 'c': 3})
+    cache.obtener('a', cargas.de('a'))
+    cache.obtener('b', cargas.de('b'))
+    cache.obtener('a', cargas.de('a'))
+    cache.obtener('c', cargas.de('c'))
+    assert list(cache._entradas) == ['a', 'c']
+    cache.obtener('b', cargas.de('b'))
+    assert cargas.llamadas == ['a', 'b', 'c', 'b']
+
+
+def test_no_guarda_videos_inexistentes(reloj):
+    cache = CacheSugerencias(max_entradas=10, ttl=60)
+    cargas = Cargas({})
+    assert cache.obtener('x', cargas.de('x')) is None
+    assert cache.obtener('x', cargas.de('x')) is None
+    assert cargas.llamadas == ['x', 'x']
+
+
+def test_guardar_reemplaza_e_invalidar_elimina(reloj, tmp_path):
+    almacen = AlmacenCompartido(str(tmp_path / 'cache.sqlite3'), ttl=3600)
+    cache = CacheSugerencias(max_entradas=10, ttl=60, almacen=almacen)
+    cache.guardar('a', {'Resumen': 'nuevo'})
+    assert cache.obtener('a', Cargas({}).de('a')) == {'Resumen': 'nuevo'}
+
+    # Otro proceso lo encuentra en el almacén compartido sin ir a la base de datos
+    otro = CacheSugerencias(max_entradas=10, ttl=60, almacen=almacen)
+    cargas = Cargas({})
+    assert otro.obtener('a', cargas.de('a')) == {'Resumen': 'nuevo'}
+    assert cargas.llamadas == []
+
+    cache.invalidar('a')
+    assert almacen.obtener('a') is None
+    assert cache.obtener('a', Cargas({}).de('a')) is None
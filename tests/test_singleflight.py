@@ -0,0 +1,80 @@
+import pytest
+
+from modules.models import db, Job
+from modules.singleflight import RegistroEnVuelo
+
+URL = 'https://www.youtube.com/watch?v=abcdefghijk'
+OTRA_URL = 'https://www.youtube.com/watch?v=zyxwvutsrqp'
+
+
+def creador(url, session_id, creados):
+    def crear_trabajo():
+        job = Job(url_video=url, session_id=session_id, status=Job.STATUS_PENDING)
+        db.session.add(job)
+        db.session.commit()
+        creados.append(job)
+        return job
+    return crear_trabajo
+
+
+@pytest.mark.parametrize('local', [True, False])
+def test_solicitud_repetida_se_adjunta(app, local):
+    registro = RegistroEnVuelo(local=local)
+    creados = []
+    assert registro.adquirir(URL, 's1', creador(URL, 's1', creados)) == ('s1', True)
+    assert registro.adquirir(URL, 's2', creador(URL, 's2', creados)) == ('s1', False)
+    assert len(creados) == 1
+    assert registro.sala_de('s2') == ('s1' if local else 's2')
+
+
+def test_liberar_permite_un_trabajo_nuevo(app):
+    registro = RegistroEnVuelo()
+    creados = []
+    registro.adquirir(URL, 's1', creador(URL, 's1', creados))
+    registro.adquirir(URL, 's2', creador(URL, 's2', creados))
+    creados[0].status = Job.STATUS_DONE
+    db.session.commit()
+    registro.liberar(URL)
+    assert registro.sala_de('s2') == 's2'
+    assert registro.adquirir(URL, 's3', creador(URL, 's3', creados)) == ('s3', True)
+
+
+def test_trabajo_activo_en_la_tabla_tras_reinicio(app):
+    db.session.add(Job(url_video=URL, session_id='previa', status=Job.STATUS_RUNNING))
+    db.session.commit()
+    registro = RegistroEnVuelo()
+    creados = []
+    assert registro.adquirir(URL, 's1', creador(URL, 's1', creados)) == ('previa', False)
+    assert creados == []
+
+
+def test_indice_unico_resuelve_la_carrera(app):
+    # Otro proceso inserta el trabajo justo antes que este
+    def crear_tras_otro():
+        db.session.add(Job(url_video=URL, session_id='otro', status=Job.STATUS_PENDING))
+        db.session.commit()
+        return creador(URL, 's1', [])()
+
+    registro = RegistroEnVuelo(local=False)
+    assert registro.adquirir(URL, 's1', crear_tras_otro) == ('otro', False)
+    assert Job.query.filter_by(url_video=URL).count() == 1
+
+
+def test_adquirir_varios(app):
+    db.session.add(Job(url_video=URL, session_id='previa', status=Job.STATUS_PENDING))
+    db.session.commit()
+    registro = RegistroEnVuelo()
+
+    def crear_trabajos(libres):
+        jobs = [Job(url_video=url, session_id=f's-{indice}', status=Job.STATUS_PENDING)
+                for indice, url in enumerate(libres)]
+        db.session.add_all(jobs)
+        db.session.commit()
+        return jobs
+
+    jobs, en_curso = registro.adquirir_varios([URL, OTRA_URL], crear_trabajos)
+    assert [job.url_video for job in jobs] == [OTRA_URL]
+    assert en_curso == [URL]
+    jobs, en_curso = registro.adquirir_varios([URL, OTRA_URL], crear_trabajos)
+    assert jobs == []
+    assert en_curso == [URL, OTRA_URL]
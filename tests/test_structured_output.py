@@ -0,0 +1,51 @@
+import json
+
+import pytest
+
+from modules.structured_output import (
+    MAX_CARACTERES_TITULO, Sugerencias, SugerenciasInvalidas, extraer_json, parsear_sugerencias, validar_sugerencias
+)
+
+VALIDAS = {
+    'Título Opción 1': 'Uno',
+    'Título Opción 2': 'Dos',
+    'Título Opción 3': 'Tres',
+    'Resumen': 'Un resumen.',
+}
+
+
+def test_parsear_sugerencias_en_bloque_de_codigo():
+    texto = 'Claro, aquí va:\n```json\n' + json.dumps(VALIDAS, ensure_ascii=False) + '\n```'
+    assert parsear_sugerencias(texto) == Sugerencias('Uno', 'Dos', 'Tres', 'Un resumen.')
+
+
+def test_claves_sin_acentos_y_espacios():
+    datos = {'titulo opcion 1': ' Uno ', 'TITULO  Opción 2': 'Dos', 'Título Opcion 3': 'Tres', 'resumen': 'R'}
+    assert validar_sugerencias(datos) == Sugerencias('Uno', 'Dos', 'Tres', 'R')
+
+
+def test_errores_de_esquema():
+    datos = dict(VALIDAS, **{'Título Opción 2': 'x' * (MAX_CARACTERES_TITULO + 1), 'Resumen': 3})
+    with pytest.raises(SugerenciasInvalidas) as error:
+        validar_sugerencias(datos)
+    assert 'Título Opción 2' in str(error.value)
+    assert 'Resumen' in str(error.value)
+
+
+def test_extraer_json_salta_llaves_que_no_son_objetos():
+    assert extraer_json('usa {llaves} así: {"a": "b"}') == {'a': 'b'}
+
+
+def test_extraer_json_recupera_objeto_sin_cerrar():
+    assert extraer_json('{"Resumen": "completo", "Título Opción 1": "a medi') == {'Resumen': 'completo'}
+
+
+def test_extraer_json_sin_objeto():
+    with pytest.raises(SugerenciasInvalidas):
+        extraer_json('No puedo ayudarte con eso.')
+
+
+def test_a_dict_usa_las_claves_del_frontend():
+    sugerencias = Sugerencias('Uno', 'Dos', 'Tres', 'Un resumen.')
+    assert sugerencias.a_dict() == VALIDAS
+    assert json.loads(sugerencias.a_json()) == VALIDAS
@@ -0,0 +1,59 @@
+import io
+import json
+
+import pytest
+
+from modules.transcriber import leer_salida_transcripcion, limpiar_texto
+
+
+def salida_transcribe(texto, palabras=200):
+    items = [{'start_time': str(i), 'end_time': str(i + 1), 'type': 'pronunciation',
+              'alternatives': [{'confidence': '0.9', 'content': 'palabra'}]} for i in range(palabras)]
+    return json.dumps({
+        'jobName': 'transcripcion-abc',
+        'results': {
+            'transcripts': [{'transcript': texto}],
+            'items': items,
+            'audio_segments': [{'start_time': '0.0', 'end_time': '1.5', 'transcript': texto}],
+        },
+        'status': 'COMPLETED',
+    }, ensure_ascii=False).encode('utf-8')
+
+
+class FlujoContado(io.BytesIO):
+    def __init__(self, datos):
+        super().__init__(datos)
+        self.leidos = 0
+
+    def read(self, n=-1):
+        bloque = super().read(n)
+        self.leidos += len(bloque)
+        return bloque
+
+
+@pytest.mark.parametrize('tamano_bloque', [1, 7, 64, 64 * 1024])
+def test_lee_texto_con_escapes_y_acentos_en_cualquier_bloque(tamano_bloque):
+    texto = 'Él dijo "hola" \\ y [se fue] {rápido} — ñandú'
+    salida = leer_salida_transcripcion(io.BytesIO(salida_transcribe(texto)), tamano_bloque=tamano_bloque)
+    assert salida == {'texto': texto, 'segmentos': None}
+
+
+def test_deja_de_leer_al_cerrar_transcripts():
+    datos = salida_transcribe('texto corto', palabras=5000)
+    flujo = FlujoContado(datos)
+    leer_salida_transcripcion(flujo, tamano_bloque=1024)
+    assert flujo.leidos < len(datos) // 10
+
+
+def test_segmentos_lee_tiempos():
+    salida = leer_salida_transcripcion(io.BytesIO(salida_transcribe('hola')), segmentos=True)
+    assert salida == {'texto': 'hola', 'segmentos': [(0.0, 1.5, 'hola')]}
+
+
+def test_sin_transcripts_lanza_error():
+    with pytest.raises(ValueError):
+        leer_salida_transcripcion(io.BytesIO(b'{"results": {"items": []}}'))
+
+
+def test_limpiar_texto():
+    assert limpiar_texto('  ¡Hola,   señor!\n¿Qué tal?  ') == 'Hola señor Qué tal'
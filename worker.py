@@ -0,0 +1,56 @@
+# worker.py
+"""
+Este script procesa los trabajos de la cola en un proceso separado de los servidores web,
+para escalar la capacidad de procesamiento y la web de forma independiente.
+No atiende clientes: los eventos 'progreso' y 'resultado' se publican en la cola de mensajes
+(SOCKETIO_MESSAGE_QUEUE) y los entrega el servidor web al que está conectado cada cliente.
+Los servidores web se ejecutan con ROL_PROCESO=web para que no procesen trabajos ellos mismos.
+Si se define PUERTO_METRICAS, expone /metrics en ese puerto para Prometheus.
+Dependencias:
+- eventlet
+- Flask
+- Flask-SocketIO
+- El cliente del broker de la cola de mensajes (p. ej. redis)
+Uso:
+    ROL_PROCESO=worker SOCKETIO_MESSAGE_QUEUE=redis://localhost:6379/0 python worker.py
+"""
+
+import eventlet
+eventlet.monkey_patch()
+
+import os
+import logging
+import eventlet.wsgi
+
+try:
+    from app import app, socketio, cola_trabajos
+    from modules.message_queue import ROL_PROCESO, URL_COLA_MENSAJES
+    from modules.metrics import registro
+except ImportError as e:
+    print(f"Error importing app or socketio: {e}")
+    raise
+
+logger = logging.getLogger(__name__)
+
+def servir_metricas(environ, start_response):
+    if environ['PATH_INFO'] != '/metrics':
+        start_response('404 Not Found', [('Content-Type', 'text/plain; charset=utf-8')])
+        return [b'']
+    cuerpo = registro.exponer().encode('utf-8')
+    start_response('200 OK', [('Content-Type', 'text/plain; version=0.0.4; charset=utf-8'),
+                              ('Content-Length', str(len(cuerpo)))])
+    return [cuerpo]
+
+if __name__ == '__main__':
+    if ROL_PROCESO != 'worker':
+        logger.warning(f"worker.py se ejecuta con ROL_PROCESO={ROL_PROCESO}; usa ROL_PROCESO=worker "
+                       f"para que los eventos solo se publiquen en la cola de mensajes.")
+    if not URL_COLA_MENSAJES:
+        logger.warning("Sin SOCKETIO_MESSAGE_QUEUE los clientes no recibirán los eventos de este worker.")
+    puerto_metricas = os.getenv('PUERTO_METRICAS')
+    if puerto_metricas:
+        eventlet.spawn(eventlet.wsgi.server, eventlet.listen(('0.0.0.0', int(puerto_metricas))),
+                       servir_metricas, log_output=False)
+    cola_trabajos.iniciar()
+    while True:
+        socketio.sleep(3600)